@@ -1,11 +1,18 @@
-from flask import Flask, render_template, request
+from flask import Flask, render_template, request, jsonify
 import mlflow
-import pandas as pd
+import numpy as np
 import logging
 import time
 from prometheus_client import Counter, Histogram, generate_latest, CollectorRegistry, CONTENT_TYPE_LATEST
 import warnings
 import os
+from src.features.build_features import FeatureEncoder
+from src.model.compiled_forest import CompiledForest
+from src.serving.artifact_cache import ModelArtifactCache
+from src.serving.batching import MicroBatcher
+from src.serving.instrumentation import RequestMetrics
+from src.serving.model_manager import LoadedModel, ModelManager
+from src.serving.prediction_cache import PredictionCache
 
 warnings.filterwarnings("ignore")
 
@@ -25,6 +32,21 @@ mlflow.set_tracking_uri("http://localhost:5000")
 
 
 MODEL_NAME = "my_model_v2"
+ENCODER_FILE = "encoder.json"  # logged inside the model artifact by model_evaluation
+# Array-backed forest logged by model_evaluation: a directory of .npy blocks that is
+# memory-mapped, or the .npz archive of versions logged before it
+COMPILED_MODEL_PATHS = ("compiled_forest", "compiled_forest.npz")
+
+# "compiled" serves the array-backed forest; "pyfunc" keeps the generic MLflow wrapper
+MODEL_RUNTIME = os.getenv("MODEL_RUNTIME", "compiled")
+
+# Local cache of downloaded model artifacts, so restarts skip the download and
+# can still start from the last known model when the tracking server is down
+artifact_cache = ModelArtifactCache(
+    os.getenv("MODEL_CACHE_DIR", os.path.expanduser("~/.cache/asthama_app/models")),
+    max_size_bytes=int(os.getenv("MODEL_CACHE_MAX_BYTES", str(2 * 1024 ** 3))),
+    verify=os.getenv("MODEL_CACHE_VERIFY", "full")
+)
 
 # ======================================================
 # Flask App Initialization
@@ -44,6 +66,8 @@ REQUEST_LATENCY = Histogram(
 PREDICTION_COUNT = Counter(
     "model_prediction_count", "Number of predictions per class", ["prediction"], registry=registry
 )
+# Per-stage latency (parse, encode, predict, render), failed-request latency and in-flight requests
+REQUEST_METRICS = RequestMetrics(registry=registry)
 
 # ======================================================
 # Load Model from MLflow Registry
@@ -55,35 +79,146 @@ def get_latest_model_version(model_name):
         latest_version = client.get_latest_versions(model_name, stages=["None"])
     return latest_version[0].version if latest_version else None
 
-model_version = get_latest_model_version(MODEL_NAME)
-if not model_version:
-    raise RuntimeError(f"❌ No model version found for '{MODEL_NAME}' in MLflow registry!")
 
-model_uri = f"models:/{MODEL_NAME}/{model_version}"
-logger.info(f"🔄 Loading model from: {model_uri}")
-model = mlflow.pyfunc.load_model(model_uri)
-logger.info("✅ Model loaded successfully.")
+def resolve_model_version():
+    """Latest registry version, or the most recently used cached one if the registry is unreachable."""
+    try:
+        return get_latest_model_version(MODEL_NAME)
+    except Exception as e:
+        cached = artifact_cache.latest(MODEL_NAME)
+        if cached is None:
+            raise
+        logger.warning(f"⚠️ Model registry unreachable ({e}), using cached version {cached.version}")
+        return cached.version
+
+
+def fetch_model_artifacts(version):
+    """Local path of a version's artifacts, served from the artifact cache when possible."""
+    model_uri = f"models:/{MODEL_NAME}/{version}"
+    try:
+        run_id = mlflow.MlflowClient().get_model_version(MODEL_NAME, version).run_id
+    except Exception as e:
+        cached = artifact_cache.find(MODEL_NAME, version)
+        if cached is None:
+            raise
+        logger.warning(f"⚠️ Model registry unreachable ({e}), using cached artifacts for version {version}")
+        return cached.path
+
+    entry = artifact_cache.fetch(
+        MODEL_NAME, version, run_id,
+        download=lambda dst_dir: mlflow.artifacts.download_artifacts(artifact_uri=model_uri, dst_path=dst_dir)
+    )
+    return entry.path
+
 
-# Try to get input schema (optional)
-try:
-    input_schema = model.metadata.get_input_schema()
-    logger.info(f"📊 Model input schema: {[f.name for f in input_schema]}")
-except Exception as e:
-    logger.warning("⚠️ Could not load model input schema from MLflow.")
-    input_schema = None
+def load_model_runtime(local_model_path):
+    """Load the compiled forest when available, compiling the sklearn model if it was not logged."""
+    if MODEL_RUNTIME == "compiled":
+        for name in COMPILED_MODEL_PATHS:
+            compiled_path = os.path.join(local_model_path, name)
+            if os.path.exists(compiled_path):
+                return CompiledForest.load(compiled_path)
+        try:
+            return CompiledForest.from_sklearn(mlflow.sklearn.load_model(local_model_path))
+        except Exception as e:
+            logger.warning(f"⚠️ Could not compile the model ({e}), serving it through mlflow.pyfunc.")
+
+    model = mlflow.pyfunc.load_model(local_model_path)
+
+    # Try to get input schema (optional)
+    try:
+        input_schema = model.metadata.get_input_schema()
+        logger.info(f"📊 Model input schema: {[f.name for f in input_schema]}")
+    except Exception as e:
+        logger.warning("⚠️ Could not load model input schema from MLflow.")
+    return model
+
+
+def load_model_version(version):
+    """Load one registry version together with its feature encoder."""
+    logger.info(f"🔄 Loading model from: models:/{MODEL_NAME}/{version}")
+    local_model_path = fetch_model_artifacts(version)
+    model = load_model_runtime(local_model_path)
+    logger.info("✅ Model loaded successfully.")
+
+    encoder_path = os.path.join(local_model_path, ENCODER_FILE)
+    if os.path.exists(encoder_path):
+        encoder = FeatureEncoder.load(encoder_path)
+    else:
+        logger.warning("⚠️ No feature encoder logged with this model, using the default feature layout.")
+        encoder = FeatureEncoder.default()
+
+    return LoadedModel(version=str(version), model=model, encoder=encoder)
+
+
+# The active model is swapped atomically when a new Production version is
+# promoted; MODEL_RELOAD_INTERVAL=0 disables the background registry polling.
+model_manager = ModelManager(
+    MODEL_NAME,
+    resolve_version=resolve_model_version,
+    load_version=load_model_version,
+    poll_interval=float(os.getenv("MODEL_RELOAD_INTERVAL", "60")),
+    registry=registry
+)
+model_manager.load_initial()
+
+# Upper bound on the number of records accepted by /predict/batch
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10000"))
 
 # ======================================================
-# Expected Columns (match training time)
+# Optional micro-batching of concurrent /predict calls
 # ======================================================
-EXPECTED_COLUMNS = [
-    "Age","BMI","Family_History","Air_Pollution_Level","Physical_Activity_Level",
-    "Occupation_Type","Medication_Adherence","Number_of_ER_Visits",
-    "Peak_Expiratory_Flow","FeNO_Level",
-    "Gender_Female","Gender_Male","Gender_Other",
-    "Smoking_Status_Current","Smoking_Status_Former","Smoking_Status_Never",
-    "Allergies_Dust","Allergies_Multiple","Allergies_Pets","Allergies_Pollen",
-    "Comorbidities_Both","Comorbidities_Diabetes","Comorbidities_Hypertension"
-]
+MICRO_BATCHING = os.getenv("MICRO_BATCHING", "false").lower() in ("1", "true", "yes")
+
+batcher = None
+if MICRO_BATCHING:
+    batcher = MicroBatcher(
+        lambda data, active: active.model.predict(data),
+        max_batch_size=int(os.getenv("MICRO_BATCH_MAX_SIZE", "64")),
+        max_wait_ms=float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "2")),
+        timeout=float(os.getenv("MICRO_BATCH_TIMEOUT", "5")),
+        registry=registry
+    )
+
+
+def predict_rows(active, data):
+    """Score a feature matrix with the given model snapshot, micro-batched when enabled."""
+    if batcher is not None:
+        return batcher.predict(data, active)
+    return active.model.predict(data)
+
+# ======================================================
+# Prediction cache for repeated submissions
+# ======================================================
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))  # 0 disables the cache
+
+prediction_cache = None
+if PREDICTION_CACHE_SIZE > 0:
+    prediction_cache = PredictionCache(
+        max_entries=PREDICTION_CACHE_SIZE,
+        ttl_seconds=float(os.getenv("PREDICTION_CACHE_TTL", "300")),
+        registry=registry
+    )
+    model_manager.add_swap_listener(lambda old, new: prediction_cache.clear())
+
+
+def predict_cached(active, data, predict_fn):
+    """Score a feature matrix, computing only the rows missing from the prediction cache."""
+    if prediction_cache is None:
+        return np.asarray(predict_fn(data))
+
+    predictions, keys = prediction_cache.get_many(active.version, data)
+    missing = [i for i, prediction in enumerate(predictions) if prediction is None]
+    if missing:
+        fresh = np.asarray(predict_fn(data[missing])).tolist()
+        prediction_cache.put_many([keys[i] for i in missing], fresh)
+        for i, prediction in zip(missing, fresh):
+            predictions[i] = prediction
+    return np.asarray(predictions)
+
+
+def format_prediction(prediction):
+    return "✅ No Asthma" if prediction == 0 else "😷 Has Asthma"
 
 # ======================================================
 # Routes
@@ -99,57 +234,110 @@ def home():
 @app.route("/predict", methods=["POST"])
 def predict():
     REQUEST_COUNT.labels(method="POST", endpoint="/predict").inc()
-    start_time = time.time()
+
+    # Use one model snapshot for the whole request, even if a swap happens meanwhile
+    active = model_manager.current
+    timer = REQUEST_METRICS.timer("/predict", active.version)
 
     try:
-        air_pollution_map = {"Low": 0, "Moderate": 1, "High": 2}
-        physical_activity_map = {"Sedentary": 0, "Moderate": 1, "Active": 2}
-        occupation_type_map = {'Indoor': 0, 'Outdoor': 1}
-        
         # Collect form data
-        data = pd.DataFrame([{
-    "Age": float(request.form["Age"]),
-    "BMI": float(request.form["BMI"]),
-    "Family_History": int(request.form["Family_History"]),
-    "Air_Pollution_Level": air_pollution_map[request.form["Air_Pollution_Level"]],
-    "Physical_Activity_Level": physical_activity_map[request.form["Physical_Activity_Level"]],
-    "Occupation_Type": occupation_type_map[request.form["Occupation_Type"]],
-    "Medication_Adherence": int(request.form["Medication_Adherence"]),
-    "Number_of_ER_Visits": int(request.form["Number_of_ER_Visits"]),
-    "Peak_Expiratory_Flow": float(request.form["Peak_Expiratory_Flow"]),
-    "FeNO_Level": float(request.form["FeNO_Level"]),
-    "Gender": request.form["Gender"],
-    "Smoking_Status": request.form["Smoking_Status"],
-    "Allergies": request.form["Allergies"],
-    "Comorbidities": request.form["Comorbidities"]
-}])
-
-        data = pd.get_dummies(data)
-
-# Drop any accidental columns named like the target
-        if 'Has_Asthma' in data.columns:
-          data = data.drop(columns=['Has_Asthma'])
-
-        data = data.reindex(columns=EXPECTED_COLUMNS, fill_value=0)
+        form = request.form
+        timer.mark("parse")
+        data = active.encoder.transform_record(form)
+        timer.mark("encode")
 
         # Predict
-        prediction = model.predict(data)[0]
-        result = "✅ No Asthma" if prediction == 0 else "😷 Has Asthma"
+        prediction = predict_cached(active, data, lambda rows: predict_rows(active, rows))[0]
+        result = format_prediction(prediction)
+        timer.mark("predict")
 
-        PREDICTION_COUNT.labels(prediction=str(prediction)).inc()
-        REQUEST_LATENCY.labels(endpoint="/predict").observe(time.time() - start_time)
+        response = render_template("index.html", result=result)
+        timer.mark("render")
 
-        return render_template("index.html", result=result)
+        PREDICTION_COUNT.labels(prediction=str(prediction)).inc()
+        REQUEST_LATENCY.labels(endpoint="/predict").observe(timer.finish())
+        return response
 
     except Exception as e:
         logger.error(f"❌ Prediction failed: {e}")
+        timer.finish(failed=True)
         return render_template("index.html", result=f"Error: {str(e)}")
 
+@app.route("/predict/batch", methods=["POST"])
+def predict_batch():
+    """
+    Score many patient records in one vectorized pass.
+
+    Accepts a JSON list of records (or {"records": [...]}) and returns one
+    entry per record, in input order. Records that fail validation get an
+    "error" entry instead of a prediction; the rest of the batch is still scored.
+    """
+    REQUEST_COUNT.labels(method="POST", endpoint="/predict/batch").inc()
+    active = model_manager.current
+    timer = REQUEST_METRICS.timer("/predict/batch", active.version)
+
+    payload = request.get_json(silent=True)
+    records = payload.get("records") if isinstance(payload, dict) else payload
+    timer.mark("parse")
+    if not isinstance(records, list):
+        timer.finish(failed=True)
+        return jsonify({"error": "Expected a JSON list of records or {\"records\": [...]}"}), 400
+    if len(records) > MAX_BATCH_SIZE:
+        timer.finish(failed=True)
+        return jsonify({"error": f"Batch of {len(records)} records exceeds the limit of {MAX_BATCH_SIZE}"}), 413
+
+    data, row_index, errors = active.encoder.transform_records(records)
+    results = [None] * len(records)
+    for i, error in errors.items():
+        results[i] = {"index": i, "error": error}
+    timer.mark("encode")
+
+    if row_index:
+        try:
+            predictions = predict_cached(active, data, active.model.predict)
+        except Exception as e:
+            logger.error(f"❌ Batch prediction failed: {e}")
+            timer.finish(failed=True)
+            return jsonify({"error": f"Prediction failed: {str(e)}"}), 500
+
+        for i, prediction in zip(row_index, predictions.tolist()):
+            results[i] = {"index": i, "prediction": prediction, "result": format_prediction(prediction)}
+
+        classes, counts = np.unique(predictions, return_counts=True)
+        for prediction, count in zip(classes.tolist(), counts.tolist()):
+            PREDICTION_COUNT.labels(prediction=str(prediction)).inc(count)
+    timer.mark("predict")
+
+    response = jsonify({
+        "model_version": active.version,
+        "count": len(records),
+        "errors": len(errors),
+        "predictions": results
+    })
+    timer.mark("render")
+    REQUEST_LATENCY.labels(endpoint="/predict/batch").observe(timer.finish())
+    return response
+
 @app.route("/metrics")
 def metrics():
     """Expose Prometheus metrics."""
     return generate_latest(registry), 200, {"Content-Type": CONTENT_TYPE_LATEST}
 
+# ======================================================
+# Background Services
+# ======================================================
+def start_background_services():
+    """Start the registry watcher and the micro-batcher threads of this process."""
+    model_manager.start()
+    if batcher is not None:
+        batcher.start()
+
+
+# Threads do not survive fork(), so the multi-worker launcher (serve.py) sets
+# DEFER_BACKGROUND_SERVICES and starts them in every worker instead
+if os.getenv("DEFER_BACKGROUND_SERVICES", "false").lower() not in ("1", "true", "yes"):
+    start_background_services()
+
 # ======================================================
 # Main Entry Point
 # ======================================================
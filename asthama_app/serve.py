@@ -0,0 +1,221 @@
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+# Handlers are configured when the app module is imported
+logger = logging.getLogger("asthama_app.serve")
+
+
+def default_workers() -> int:
+    """One worker per core this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+
+def memory_mb(pid) -> dict:
+    """
+    Resident (RSS), proportional (PSS) and private memory of a process.
+
+    PSS splits every shared page between the processes that map it, so summing
+    it across workers gives the real footprint of the copy-on-write model.
+    """
+    usage = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as file:
+            for line in file:
+                key, _, value = line.partition(":")
+                if key in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                    usage[key] = int(value.split()[0]) / 1024
+    except OSError:
+        return {}
+    return {
+        "rss": usage.get("Rss"), "pss": usage.get("Pss"),
+        "private": usage.get("Private_Clean", 0) + usage.get("Private_Dirty", 0)
+    }
+
+
+def import_service():
+    """Import the Flask app module; this loads the model."""
+    # Background threads are started by the caller (in every worker, after the fork)
+    os.environ.setdefault("DEFER_BACKGROUND_SERVICES", "true")
+    try:
+        from asthama_app import app as service
+    except ImportError:
+        # Docker image layout: app.py sits next to this file
+        import app as service
+    return service
+
+
+def bind_socket(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(service, host, port, fd, ready_fd):
+    """Serve requests on the inherited listening socket until terminated."""
+    from werkzeug.serving import make_server
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    service.start_background_services()
+    server = make_server(host, port, service.app, threaded=True, fd=fd)
+    os.write(ready_fd, b"1")
+    os.close(ready_fd)
+    server.serve_forever()
+
+
+class Launcher:
+    """
+    Load the model once, then fork workers that share it copy-on-write.
+
+    gc.freeze() moves everything allocated during start-up into the permanent
+    generation, so garbage collections in the workers never write to the
+    object headers of the loaded model and its pages stay shared.
+    """
+
+    def __init__(self, host, port, workers):
+        self.host = host
+        self.port = port
+        self.n_workers = workers
+        self.workers = {}
+        self.stopping = False
+
+    def load(self):
+        start = time.perf_counter()
+        self.service = import_service()
+        self.load_seconds = time.perf_counter() - start
+        active = self.service.model_manager.current
+        logger.info(f"Loaded model v{active.version} in {self.load_seconds:.2f}s (parent pid {os.getpid()})")
+
+        self.sock = bind_socket(self.host, self.port)
+        gc.collect()
+        gc.freeze()
+
+    def spawn(self, index):
+        ready_read, ready_write = os.pipe()
+        start = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_read)
+            code = 0
+            try:
+                run_worker(self.service, self.host, self.port, self.sock.fileno(), ready_write)
+            except SystemExit as e:
+                code = e.code or 0
+            except Exception:
+                logger.exception(f"Worker {index} crashed")
+                code = 1
+            finally:
+                os._exit(code)
+
+        os.close(ready_write)
+        ready = os.read(ready_read, 1)  # returns once the worker is serving (or b"" if it died)
+        os.close(ready_read)
+        if not ready:
+            _, status = os.waitpid(pid, 0)
+            raise RuntimeError(f"Worker {index} (pid {pid}) exited with status {status} before it was ready")
+        self.workers[pid] = index
+        logger.info(f"Worker {index} (pid {pid}) ready in {time.perf_counter() - start:.3f}s")
+        return pid
+
+    def report_memory(self):
+        parent = memory_mb(os.getpid())
+        if not parent:
+            return
+        logger.info(f"Parent pid {os.getpid()}: rss {parent['rss']:.1f} MB, pss {parent['pss']:.1f} MB")
+        total_pss = parent["pss"]
+        for pid, index in sorted(self.workers.items(), key=lambda item: item[1]):
+            usage = memory_mb(pid)
+            if usage:
+                total_pss += usage["pss"]
+                logger.info(f"Worker {index} (pid {pid}): rss {usage['rss']:.1f} MB, "
+                            f"pss {usage['pss']:.1f} MB, private {usage['private']:.1f} MB")
+        logger.info(f"Total pss of parent and {len(self.workers)} workers: {total_pss:.1f} MB")
+
+    def stop(self, *_):
+        self.stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def reap(self):
+        """Wait for every remaining worker to exit."""
+        while self.workers:
+            try:
+                pid, _ = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            self.workers.pop(pid, None)
+
+    def run(self):
+        start = time.perf_counter()
+        self.load()
+        try:
+            for index in range(self.n_workers):
+                self.spawn(index)
+        except RuntimeError:
+            # A worker that cannot start will not start on retry either
+            self.stop()
+            self.reap()
+            self.sock.close()
+            raise
+        logger.info(f"Serving on http://{self.host}:{self.port} with {self.n_workers} workers "
+                    f"(startup {time.perf_counter() - start:.2f}s)")
+        self.report_memory()
+
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            index = self.workers.pop(pid, None)
+            if index is not None and not self.stopping:
+                logger.warning(f"Worker {index} (pid {pid}) exited with status {status}, restarting it")
+                try:
+                    self.spawn(index)
+                except RuntimeError as e:
+                    logger.error(f"{e}; stopping the remaining workers")
+                    self.stop()
+        self.sock.close()
+        logger.info("All workers stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the asthma prediction app with several worker processes.")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "0")),
+                        help="number of worker processes (default: one per available core)")
+    args = parser.parse_args()
+
+    workers = args.workers or default_workers()
+    if not hasattr(os, "fork"):
+        logger.warning("fork() is not available on this platform, serving from a single process")
+        service = import_service()
+        service.start_background_services()
+        service.app.run(host=args.host, port=args.port, threaded=True)
+        return
+
+    Launcher(args.host, args.port, workers).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.features.build_features import BASE_COLUMNS, ONEHOT_COLUMNS
+
+warnings.filterwarnings("ignore")
+
+FORM_COLUMNS = BASE_COLUMNS + ONEHOT_COLUMNS
+
+# Metrics compared against the baseline, and the direction that counts as a regression
+COMPARED_METRICS = {
+    "throughput_rps": "lower",
+    "p50_ms": "higher",
+    "p95_ms": "higher",
+    "p99_ms": "higher",
+}
+
+
+def load_records(data_path, limit=2000):
+    """Raw patient records, as the form and /predict/batch receive them."""
+    df = pd.read_csv(data_path, usecols=FORM_COLUMNS, nrows=limit, keep_default_na=False, dtype=str)
+    return df.to_dict(orient="records")
+
+
+def parse_mix(mix):
+    """'single:0.8,batch:0.2' -> {'single': 0.8, 'batch': 0.2}"""
+    weights = {}
+    for part in mix.split(","):
+        kind, weight = part.split(":")
+        if kind not in ("single", "batch"):
+            raise ValueError(f"Unknown payload kind {kind!r}, expected 'single' or 'batch'")
+        weights[kind] = float(weight)
+    return weights
+
+
+def rss_mb(pid=None):
+    """Current resident set size of a process, from /proc."""
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class InProcessClient:
+    """Send requests through Flask's test client: no sockets, measures the app itself."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def single(self, record):
+        response = self.client.post("/predict", data=record)
+        return response.status_code
+
+    def batch(self, records):
+        response = self.client.post("/predict/batch", json=records)
+        return response.status_code
+
+
+class SocketClient:
+    """Send requests over one keep-alive HTTP connection to a running server."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.connection = http.client.HTTPConnection(host, port, timeout=60)
+
+    def _post(self, path, body, content_type):
+        try:
+            self.connection.request("POST", path, body=body, headers={"Content-Type": content_type})
+            response = self.connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            # The server closed the keep-alive connection; retry once on a fresh one
+            self.connection.close()
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            self.connection.request("POST", path, body=body, headers={"Content-Type": content_type})
+            response = self.connection.getresponse()
+        response.read()
+        return response.status
+
+    def single(self, record):
+        return self._post("/predict", urlencode(record), "application/x-www-form-urlencoded")
+
+    def batch(self, records):
+        return self._post("/predict/batch", json.dumps(records), "application/json")
+
+    def close(self):
+        self.connection.close()
+
+
+def start_local_server(app):
+    """Serve the app on an ephemeral local port in a background thread."""
+    from werkzeug.serving import make_server
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def run_scenario(make_client, records, concurrency, n_requests, mix, batch_size, seed=0):
+    """
+    Drive n_requests requests from `concurrency` threads, each with its own
+    client, and collect per-request latencies.
+    """
+    kinds, weights = zip(*mix.items())
+    per_worker = [n_requests // concurrency + (i < n_requests % concurrency) for i in range(concurrency)]
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        client = make_client()
+        latencies, failures, rows = {kind: [] for kind in kinds}, 0, 0
+        try:
+            for _ in range(per_worker[index]):
+                kind = rng.choices(kinds, weights)[0]
+                start = time.perf_counter()
+                if kind == "single":
+                    status = client.single(rng.choice(records))
+                    n_rows = 1
+                else:
+                    status = client.batch(rng.sample(records, batch_size))
+                    n_rows = batch_size
+                latencies[kind].append(time.perf_counter() - start)
+                rows += n_rows
+                failures += status != 200
+        finally:
+            if hasattr(client, "close"):
+                client.close()
+        return latencies, failures, rows
+
+    # One warm-up request per payload kind, outside the timed window
+    warm_client = make_client()
+    if "single" in mix:
+        warm_client.single(records[0])
+    if "batch" in mix:
+        warm_client.batch(records[:batch_size])
+    if hasattr(warm_client, "close"):
+        warm_client.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(worker, range(concurrency)))
+    wall = time.perf_counter() - start
+
+    all_latencies = np.array([lat for outcome in outcomes for values in outcome[0].values() for lat in values]) * 1000
+    result = {
+        "requests": int(len(all_latencies)),
+        "failures": int(sum(outcome[1] for outcome in outcomes)),
+        "wall_seconds": wall,
+        "throughput_rps": len(all_latencies) / wall,
+        "rows_per_second": sum(outcome[2] for outcome in outcomes) / wall,
+        "p50_ms": float(np.percentile(all_latencies, 50)),
+        "p95_ms": float(np.percentile(all_latencies, 95)),
+        "p99_ms": float(np.percentile(all_latencies, 99)),
+    }
+    for kind in kinds:
+        values = np.array([lat for outcome in outcomes for lat in outcome[0][kind]]) * 1000
+        if len(values):
+            result[f"{kind}_p50_ms"] = float(np.percentile(values, 50))
+            result[f"{kind}_p99_ms"] = float(np.percentile(values, 99))
+    return result
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    Regressions of every scenario present in both runs: throughput lower, or
+    latency higher, than the baseline by more than `tolerance` (a fraction).
+    Returns them with the number of scenarios compared.
+    """
+    regressions, compared = [], 0
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        if reference.get("prediction_cache_size") != result["prediction_cache_size"]:
+            print(f"  {name:<40} skipped: baseline recorded with prediction_cache_size="
+                  f"{reference.get('prediction_cache_size')}, this run with {result['prediction_cache_size']}")
+            continue
+        compared += 1
+        for metric, bad_direction in COMPARED_METRICS.items():
+            if metric not in reference or not reference[metric]:
+                continue
+            change = result[metric] / reference[metric] - 1
+            worse = change > tolerance if bad_direction == "higher" else change < -tolerance
+            print(f"  {name:<40} {metric:<15} {reference[metric]:>10.2f} -> {result[metric]:>10.2f} "
+                  f"({change:+.0%}){'  REGRESSION' if worse else ''}")
+            if worse:
+                regressions.append((name, metric, reference[metric], result[metric]))
+    return regressions, compared
+
+
+def benchmark_app(modes, concurrency_levels, mixes, n_requests, batch_size, data_path, url=None, server_pid=None,
+                  prediction_cache_size=0):
+    """
+    Load-test the asthma prediction service in-process and over a local socket,
+    for every combination of concurrency and payload mix.
+
+    The records are drawn from a fixed pool, so with the prediction cache on
+    most requests after the first pass are cache hits. The app started here
+    therefore runs with prediction_cache_size entries (0, no cache, by
+    default), and every result records that size so runs with different
+    cache modes are not compared.
+    """
+    records = load_records(data_path)
+    results = {}
+
+    app = None
+    if "inprocess" in modes or ("socket" in modes and url is None):
+        # Read by the app at import time
+        os.environ["PREDICTION_CACHE_SIZE"] = str(prediction_cache_size)
+        from asthama_app.app import app
+
+    server = None
+    if "socket" in modes:
+        if url is None:
+            server = start_local_server(app)
+            host, port = "127.0.0.1", server.server_port
+        else:
+            host, port = url.replace("http://", "").rstrip("/").split(":")
+            port = int(port)
+
+    try:
+        for mode in modes:
+            if mode == "inprocess":
+                make_client = lambda: InProcessClient(app)
+            else:
+                make_client = lambda: SocketClient(host, port)
+            # The serving process is this one, unless benchmarking a remote server
+            remote = mode == "socket" and url is not None
+            for concurrency in concurrency_levels:
+                for mix_name in mixes:
+                    name = f"{mode}/c{concurrency}/{mix_name}"
+                    result = run_scenario(make_client, records, concurrency, n_requests, parse_mix(mix_name), batch_size)
+                    result["server_rss_mb"] = rss_mb(server_pid) if (server_pid or not remote) else None
+                    # Unknown for a server started elsewhere
+                    result["prediction_cache_size"] = None if remote else prediction_cache_size
+                    results[name] = result
+                    rss = f"{result['server_rss_mb']:.0f} MB" if result["server_rss_mb"] else "n/a"
+                    print(f"{name:<40} {result['throughput_rps']:>8.1f} req/s  p50 {result['p50_ms']:>7.2f} ms  "
+                          f"p95 {result['p95_ms']:>7.2f} ms  p99 {result['p99_ms']:>7.2f} ms  rss {rss}"
+                          f"{'  FAILURES: %d' % result['failures'] if result['failures'] else ''}")
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=benchmark_app.__doc__)
+    parser.add_argument("--modes", default="inprocess,socket", help="comma separated: inprocess, socket")
+    parser.add_argument("--concurrency", default="1,4")
+    parser.add_argument("--mix", action="append", default=None,
+                        help="payload mix such as 'single:0.9,batch:0.1' (repeatable)")
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--batch-size", type=int, default=64, help="records per /predict/batch request")
+    parser.add_argument("--data", default="data2/raw/synthetic_asthma_dataset.csv")
+    parser.add_argument("--url", default=None, help="benchmark an already running server instead of a local one")
+    parser.add_argument("--server-pid", type=int, default=None, help="pid of the --url server, to report its memory")
+    parser.add_argument("--prediction-cache", type=int, default=0,
+                        help="PREDICTION_CACHE_SIZE of the app started here (0 disables the cache)")
+    parser.add_argument("--baseline", default="reports/app_benchmark_baseline.json")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="overwrite the baseline with this run")
+    parser.add_argument("--output", default=None, help="optional JSON file for the results")
+    args = parser.parse_args()
+
+    results = benchmark_app(
+        modes=args.modes.split(","),
+        concurrency_levels=[int(level) for level in args.concurrency.split(",")],
+        mixes=args.mix or ["single:1", "single:0.9,batch:0.1"],
+        n_requests=args.requests,
+        batch_size=args.batch_size,
+        data_path=args.data,
+        url=args.url,
+        server_pid=args.server_pid,
+        prediction_cache_size=args.prediction_cache
+    )
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+
+    if any(result["failures"] for result in results.values()):
+        print("❌ Some requests failed")
+        sys.exit(1)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=4)
+        print(f"✅ Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        print(f"Comparing against {args.baseline} (tolerance {args.tolerance:.0%}):")
+        regressions, compared = compare_to_baseline(results, baseline, args.tolerance)
+        if not compared:
+            print("No scenario of this run is comparable with the baseline")
+        elif regressions:
+            print(f"❌ {len(regressions)} metric(s) regressed beyond {args.tolerance:.0%}")
+            sys.exit(1)
+        else:
+            print("✅ No regressions")
+    else:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
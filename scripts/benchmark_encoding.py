@@ -0,0 +1,98 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import OneHotEncoder
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.features.build_features import FeatureEncoder, ONEHOT_COLUMNS
+
+
+def refit_and_concat(df):
+    """The original doing_onehotencoding: refit per column, drop + concat each time."""
+    encoder = OneHotEncoder(sparse_output=False, handle_unknown='ignore')
+    for col in ONEHOT_COLUMNS:
+        if col in df.columns:
+            encoded = encoder.fit_transform(df[[col]])
+            encoded_df = pd.DataFrame(encoded, columns=encoder.get_feature_names_out([col]), index=df.index)
+            df = pd.concat([df.drop(columns=[col]), encoded_df], axis=1)
+    return df
+
+
+def compare_per_category(encoder):
+    """One vectorised comparison per (column, category) into one block."""
+    def encode(df):
+        cols = [col for col in ONEHOT_COLUMNS if col in df.columns]
+        names = [f'{col}_{cat}' for col in cols for cat in encoder.categories[col]]
+        block = np.zeros((len(df), len(names)), dtype=np.float64)
+        offset = 0
+        for col in cols:
+            values = df[col].to_numpy()
+            for cat in encoder.categories[col]:
+                block[:, offset] = values == cat
+                offset += 1
+        return pd.concat([df.drop(columns=cols), pd.DataFrame(block, columns=names, index=df.index)], axis=1)
+    return encode
+
+
+def best_of(fn, df, repeat):
+    timings, result = [], None
+    for _ in range(repeat):
+        frame = df.copy()
+        start = time.perf_counter()
+        result = fn(frame)
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings), result
+
+
+def benchmark_encoding(data_path, scales, repeat):
+    """
+    Time one-hot encoding of synthetic_asthma_dataset.csv tiled 1x/10x/100x:
+    the original refit-and-concat loop, per-category comparisons, and the
+    single-pass FeatureEncoder.encode_onehot, checking they produce the same frame.
+    """
+    raw = pd.read_csv(data_path).drop(columns=['Patient_ID', 'Asthma_Control_Level'])
+    encoder = FeatureEncoder.fit(raw)
+    raw = encoder.fill_missing(raw)
+    methods = {
+        'refit_concat': refit_and_concat,
+        'per_category': compare_per_category(encoder),
+        'single_pass': encoder.encode_onehot,
+    }
+
+    results = []
+    print(f"{'rows':>9} " + " ".join(f"{name + ' ms':>16}" for name in methods) + f" {'speed-up':>9}")
+    for scale in scales:
+        df = pd.concat([raw] * scale, ignore_index=True) if scale > 1 else raw
+        result = {'scale': scale, 'rows': len(df)}
+        expected = None
+        for name, method in methods.items():
+            result[f'{name}_ms'], encoded = best_of(method, df, repeat)
+            if expected is None:
+                expected = encoded
+            else:
+                # The single pass emits uint8 indicators, the others float64
+                pd.testing.assert_frame_equal(encoded, expected, check_dtype=False)
+        result['speedup'] = result['refit_concat_ms'] / result['single_pass_ms']
+        results.append(result)
+        print(f"{len(df):>9} " + " ".join(f"{result[name + '_ms']:>16.1f}" for name in methods)
+              + f" {result['speedup']:>8.1f}x")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=benchmark_encoding.__doc__)
+    parser.add_argument('--data', default='data2/raw/synthetic_asthma_dataset.csv')
+    parser.add_argument('--scales', default='1,10,100')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=None, help='optional JSON file for the results')
+    args = parser.parse_args()
+
+    results = benchmark_encoding(args.data, [int(scale) for scale in args.scales.split(',')], args.repeat)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=4)
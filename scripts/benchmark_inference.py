@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+import pickle
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+import mlflow.pyfunc
+import mlflow.sklearn
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.model.compiled_forest import CompiledForest
+
+warnings.filterwarnings("ignore")
+
+
+def time_calls(predict, X, repeat):
+    """Latency of `repeat` predict calls, in milliseconds."""
+    predict(X)  # warm-up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predict(X)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.array(timings)
+
+
+def benchmark_inference(model_path, data_path, batch_sizes, repeat):
+    """
+    Compare the mlflow.pyfunc path the app used to serve with the compiled
+    forest it serves now, on the same inputs, and check they agree exactly.
+    """
+    with open(model_path, 'rb') as file:
+        clf = pickle.load(file)
+    X = pd.read_csv(data_path)
+    X_array = X.to_numpy(dtype=np.float64)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        mlflow.sklearn.save_model(
+            clf, os.path.join(tmp, "model"), serialization_format=mlflow.sklearn.SERIALIZATION_FORMAT_CLOUDPICKLE
+        )
+        pyfunc_model = mlflow.pyfunc.load_model(os.path.join(tmp, "model"))
+
+        start = time.perf_counter()
+        compiled = CompiledForest.from_sklearn(clf)
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        if not np.array_equal(clf.predict_proba(X), compiled.predict_proba(X_array)):
+            raise AssertionError("Compiled forest probabilities differ from scikit-learn")
+        if not np.array_equal(np.asarray(pyfunc_model.predict(X)), compiled.predict(X_array)):
+            raise AssertionError("Compiled forest predictions differ from the pyfunc model")
+        print(f"✅ Predictions identical on {len(X)} rows (compiled in {compile_ms:.1f} ms, "
+              f"{compiled.n_trees} trees, {compiled.n_nodes} nodes)")
+
+        results = []
+        print(f"{'batch':>7} {'pyfunc p50 ms':>14} {'compiled p50 ms':>16} {'speed-up':>9}")
+        for batch_size in batch_sizes:
+            rows = np.resize(np.arange(len(X)), batch_size)
+            pyfunc_ms = time_calls(pyfunc_model.predict, X.iloc[rows], repeat)
+            compiled_ms = time_calls(compiled.predict, X_array[rows], repeat)
+            result = {
+                "batch_size": batch_size,
+                "pyfunc_p50_ms": float(np.median(pyfunc_ms)),
+                "pyfunc_p95_ms": float(np.percentile(pyfunc_ms, 95)),
+                "compiled_p50_ms": float(np.median(compiled_ms)),
+                "compiled_p95_ms": float(np.percentile(compiled_ms, 95)),
+            }
+            result["speedup_p50"] = result["pyfunc_p50_ms"] / result["compiled_p50_ms"]
+            results.append(result)
+            print(f"{batch_size:>7} {result['pyfunc_p50_ms']:>14.3f} {result['compiled_p50_ms']:>16.3f} "
+                  f"{result['speedup_p50']:>8.1f}x")
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=benchmark_inference.__doc__)
+    parser.add_argument("--model", default="models/model.pkl")
+    parser.add_argument("--data", default="splited_data/x_test.csv")
+    parser.add_argument("--batch-sizes", default="1,8,64,512,4096")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output", default=None, help="optional JSON file for the results")
+    args = parser.parse_args()
+
+    results = benchmark_inference(
+        args.model, args.data, [int(size) for size in args.batch_sizes.split(",")], args.repeat
+    )
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.data.columnar import EXTENSIONS, read_frame, write_frame
+from src.features.build_features import TARGET_COLUMN, apply_schema
+
+# Columns read by a stage that only needs a few of them (outlier bounds plus the target)
+PRUNED_COLUMNS = ['Age', 'BMI', 'Peak_Expiratory_Flow', 'FeNO_Level', TARGET_COLUMN]
+
+
+def best_of(fn, repeat):
+    """Fastest of `repeat` calls in milliseconds, and the last result."""
+    timings, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings), result
+
+
+def benchmark_interchange(data_path, scale, repeat, formats):
+    """
+    Time the stage-boundary file formats on the preprocessed data: write,
+    full read, and a read of only a few columns, plus file size and the
+    memory Arrow allocates for the read (zero when the file is memory-mapped).
+    """
+    df = apply_schema(pd.read_csv(data_path))
+    if scale > 1:
+        df = pd.concat([df] * scale, ignore_index=True)
+    print(f"{len(df)} rows x {df.shape[1]} columns")
+
+    results = []
+    print(f"{'format':>8} {'size MB':>8} {'write ms':>9} {'read ms':>9} {'pruned ms':>10} {'arrow alloc MB':>15}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in formats:
+            path = os.path.join(tmp, 'frame' + EXTENSIONS[fmt])
+            write_ms, _ = best_of(lambda: write_frame(df, path), repeat)
+
+            before = pa.total_allocated_bytes()
+            read_ms, loaded = best_of(lambda: read_frame(path), repeat)
+            allocated = pa.total_allocated_bytes() - before
+            if not np.array_equal(loaded.to_numpy(dtype=float), df.to_numpy(dtype=float)):
+                raise AssertionError(f'{fmt} round trip changed the data')
+            del loaded
+
+            pruned_ms, _ = best_of(lambda: read_frame(path, columns=PRUNED_COLUMNS), repeat)
+            result = {
+                'format': fmt,
+                'size_mb': os.path.getsize(path) / 1024 ** 2,
+                'write_ms': write_ms,
+                'read_ms': read_ms,
+                'pruned_read_ms': pruned_ms,
+                'arrow_allocated_mb': allocated / 1024 ** 2,
+            }
+            results.append(result)
+            print(f"{fmt:>8} {result['size_mb']:>8.1f} {write_ms:>9.1f} {read_ms:>9.1f} {pruned_ms:>10.1f} "
+                  f"{result['arrow_allocated_mb']:>15.1f}")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=benchmark_interchange.__doc__)
+    parser.add_argument('--data', default='data_for_github/preprocessed_data.csv')
+    parser.add_argument('--scale', type=int, default=10, help='tile the data this many times')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--formats', default='csv,parquet,arrow')
+    parser.add_argument('--output', default=None, help='optional JSON file for the results')
+    args = parser.parse_args()
+
+    results = benchmark_interchange(args.data, args.scale, args.repeat, args.formats.split(','))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=4)
@@ -0,0 +1,110 @@
+import argparse
+import json
+import multiprocessing
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.model.compiled_forest import CompiledForest
+
+FORMATS = ('pickle', 'npz', 'blocks')
+
+
+def memory_mb() -> dict:
+    """Anonymous and file-backed RSS, and the proportional set size (shared pages split between their users)."""
+    memory = {}
+    with open('/proc/self/status', 'r') as file:
+        for line in file:
+            if line.startswith(('RssAnon:', 'RssFile:')):
+                memory[line.split(':')[0]] = int(line.split()[1]) / 1024
+    with open('/proc/self/smaps_rollup', 'r') as file:
+        for line in file:
+            if line.startswith('Pss:'):
+                memory['Pss'] = int(line.split()[1]) / 1024
+    return memory
+
+
+def load(fmt, path):
+    if fmt == 'pickle':
+        with open(path, 'rb') as file:
+            return pickle.load(file)
+    return CompiledForest.load(path)
+
+
+def measure(fmt, path, X, barrier, results):
+    """One serving process: load the model, score X, then report while every worker still holds it."""
+    import sklearn.ensemble  # noqa: F401  imported up front so only the model itself is measured
+
+    before = memory_mb()
+    start = time.perf_counter()
+    model = load(fmt, path)
+    load_ms = (time.perf_counter() - start) * 1000
+    model.predict_proba(X)
+    barrier.wait()
+    after = memory_mb()
+    results.put({
+        'format': fmt, 'load_ms': load_ms,
+        **{f'{name.lower()}_mb': after[name] - before[name] for name in ('RssAnon', 'RssFile', 'Pss')}
+    })
+    barrier.wait()
+
+
+def benchmark_model_load(model_path, workers, rows):
+    """
+    Load the pickled forest, the compiled forest as an .npz archive, and
+    the compiled forest as memory-mapped .npy blocks, each in `workers`
+    fresh processes at once, and report the load time and the memory each
+    process gained. Memory-mapped blocks show up as file-backed RSS that
+    the processes share (Pss falls with the number of workers) instead of
+    private anonymous memory.
+    """
+    with open(model_path, 'rb') as file:
+        clf = pickle.load(file)
+    X = np.random.default_rng(0).normal(size=(rows, clf.n_features_in_))
+    context = multiprocessing.get_context('spawn')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        compiled = CompiledForest.from_sklearn(clf)
+        paths = {'pickle': model_path, 'npz': os.path.join(tmp, 'compiled_forest.npz'),
+                 'blocks': os.path.join(tmp, 'compiled_forest')}
+        compiled.save(paths['npz'])
+        compiled.save(paths['blocks'])
+        print(f"{compiled.n_trees} trees, {compiled.n_nodes} nodes; {workers} worker processes per format")
+
+        summary = []
+        print(f"{'format':>8} {'load ms':>9} {'RssAnon MB':>11} {'RssFile MB':>11} {'Pss MB':>8}")
+        for fmt in FORMATS:
+            barrier, results = context.Barrier(workers), context.Queue()
+            processes = [context.Process(target=measure, args=(fmt, paths[fmt], X, barrier, results))
+                         for _ in range(workers)]
+            for process in processes:
+                process.start()
+            measured = [results.get() for _ in processes]
+            for process in processes:
+                process.join()
+            result = {name: float(np.median([m[name] for m in measured]))
+                      for name in ('load_ms', 'rssanon_mb', 'rssfile_mb', 'pss_mb')}
+            result['format'] = fmt
+            summary.append(result)
+            print(f"{fmt:>8} {result['load_ms']:>9.2f} {result['rssanon_mb']:>11.2f} "
+                  f"{result['rssfile_mb']:>11.2f} {result['pss_mb']:>8.2f}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=benchmark_model_load.__doc__)
+    parser.add_argument("--model", default="models/model.pkl")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=1000, help="rows scored after loading, to page the model in")
+    parser.add_argument("--output", default=None, help="optional JSON file for the results")
+    args = parser.parse_args()
+
+    results = benchmark_model_load(args.model, args.workers, args.rows)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
@@ -1,43 +1,452 @@
+import fnmatch
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
 import boto3
 import pandas as pd
-import logging
+from botocore.config import Config
 from src.logger import logging
-from io import StringIO
 
 # # Configure logging
 # logging.basicConfig(level=logging.INFO)
 # logger = logging.getLogger(__name__)
 
+# Objects are downloaded as ranged GETs of this size, several at a time
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_MAX_WORKERS = 8
+# Objects transferred at once by the bulk operations
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_CACHE_DIR = os.path.join('data', 'external', 's3_cache')
+STREAM_CHUNK_SIZE = 256 * 1024
+
+
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def shared_client(aws_access_key, aws_secret_key, region_name, endpoint_url, max_pool_connections):
+    """
+    One boto3 client per configuration, shared by every s3_operations instance.
+
+    Clients are thread-safe and each owns a connection pool, so sharing one
+    reuses warm keep-alive connections instead of opening new ones.
+    """
+    config_key = (aws_access_key, aws_secret_key, region_name, endpoint_url, max_pool_connections)
+    with _CLIENTS_LOCK:
+        if config_key not in _CLIENTS:
+            # Creating clients is not thread-safe on the default session
+            _CLIENTS[config_key] = boto3.session.Session().client(
+                's3',
+                aws_access_key_id=aws_access_key,
+                aws_secret_access_key=aws_secret_key,
+                region_name=region_name,
+                endpoint_url=endpoint_url,
+                config=Config(
+                    max_pool_connections=max_pool_connections,
+                    tcp_keepalive=True,
+                    retries={'max_attempts': 5, 'mode': 'standard'}
+                )
+            )
+        return _CLIENTS[config_key]
+
+
+class ObjectTransfer:
+    """Timing, size and retry counts of one object fetched or uploaded."""
+
+    def __init__(self, key, operation):
+        self.key = key
+        self.operation = operation
+        self.bytes = 0
+        self.requests = 0
+        self.retries = 0
+        self.seconds = 0.0
+        self.cached = False
+        self.error = None
+        self._lock = threading.Lock()
+
+    def record(self, response, n_bytes=0):
+        """Count one S3 request (and the retries botocore needed for it)."""
+        with self._lock:
+            self.requests += 1
+            self.retries += response.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+            self.bytes += n_bytes
+
+    def as_dict(self) -> dict:
+        return {
+            'key': self.key, 'operation': self.operation, 'bytes': self.bytes, 'requests': self.requests,
+            'retries': self.retries, 'seconds': self.seconds, 'cached': self.cached, 'error': self.error
+        }
+
+
+def transfer_summary(transfers) -> dict:
+    """Totals over a bulk operation."""
+    seconds = [transfer.seconds for transfer in transfers]
+    return {
+        'objects': len(transfers),
+        'bytes': sum(transfer.bytes for transfer in transfers),
+        'requests': sum(transfer.requests for transfer in transfers),
+        'retries': sum(transfer.retries for transfer in transfers),
+        'cached': sum(transfer.cached for transfer in transfers),
+        'failed': sum(transfer.error is not None for transfer in transfers),
+        'max_object_seconds': max(seconds, default=0.0),
+    }
+
+
+def part_ranges(size, part_size):
+    """(start, end) byte ranges, end inclusive, covering an object of this size."""
+    return [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+
+
+class RangedReader(io.RawIOBase):
+    """
+    Read-only file object over an S3 object, fetched as ranged GETs in parallel.
+
+    At most `prefetch` parts are in flight or buffered at a time and they are
+    handed out in order, so pandas can parse the first part while the next
+    ones download and memory stays bounded by prefetch * part_size.
+    """
+
+    def __init__(self, fetch_part, ranges, executor, prefetch):
+        self._fetch_part = fetch_part
+        self._ranges = deque(ranges)
+        self._executor = executor
+        self._pending = deque()
+        self._prefetch = max(1, prefetch)
+        self._buffer = memoryview(b'')
+        self._fill()
+
+    def _fill(self):
+        while self._ranges and len(self._pending) < self._prefetch:
+            self._pending.append(self._executor.submit(self._fetch_part, *self._ranges.popleft()))
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._buffer:
+            if not self._pending:
+                return 0
+            self._buffer = memoryview(self._pending.popleft().result())
+            self._fill()
+        n = min(len(buffer), len(self._buffer))
+        buffer[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    def close(self):
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        self._ranges.clear()
+        super().close()
+
+
 class s3_operations:
-    def __init__(self, bucket_name, aws_access_key, aws_secret_key, region_name="us-east-1"):
+    def __init__(self, bucket_name, aws_access_key, aws_secret_key, region_name="us-east-1",
+                 endpoint_url=None, cache_dir=DEFAULT_CACHE_DIR, part_size=DEFAULT_PART_SIZE,
+                 max_workers=DEFAULT_MAX_WORKERS, max_concurrency=DEFAULT_MAX_CONCURRENCY):
         """
         Initialize the s3_operations class with AWS credentials and S3 bucket details.
+        :param endpoint_url: S3-compatible endpoint instead of AWS (e.g. a local stand-in)
+        :param cache_dir: local cache of downloaded objects, validated by ETag; None disables it
+        :param part_size: bytes per ranged GET
+        :param max_workers: ranged GETs in flight at once
+        :param max_concurrency: objects transferred at once by the bulk operations
         """
         self.bucket_name = bucket_name
-        self.s3_client = boto3.client(
-            's3',
-            aws_access_key_id=aws_access_key,
-            aws_secret_access_key=aws_secret_key,
-            region_name=region_name
+        self.cache_dir = cache_dir
+        self.part_size = part_size
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+        # Enough pooled connections for every part and object thread at once
+        self.s3_client = shared_client(
+            aws_access_key, aws_secret_key, region_name, endpoint_url, max_workers + max_concurrency
         )
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='s3-part')
+        # Separate pool: object tasks wait on part tasks, sharing one pool could deadlock
+        self._object_executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='s3-object')
+        self.last_transfers = []
         logging.info("Data Ingestion from S3 bucket initialized")
 
-    def fetch_file_from_s3(self, file_key):
+    def close(self):
+        """Shut down the part and object thread pools; the shared client stays open for other instances."""
+        self._object_executor.shutdown(wait=True, cancel_futures=True)
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def head(self, file_key, transfer=None):
+        """Size and ETag of an object."""
+        response = self.s3_client.head_object(Bucket=self.bucket_name, Key=file_key)
+        if transfer is not None:
+            transfer.record(response)
+        return response['ContentLength'], response['ETag']
+
+    def list_objects(self, prefix='', pattern=None):
+        """
+        Keys, sizes and ETags of the objects under a prefix, in key order,
+        optionally only those whose key matches a glob pattern (e.g. '*.csv').
+        """
+        objects = []
+        for page in self.s3_client.get_paginator('list_objects_v2').paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for item in page.get('Contents', []):
+                if pattern is None or fnmatch.fnmatch(item['Key'], pattern):
+                    objects.append({'key': item['Key'], 'size': item['Size'], 'etag': item['ETag']})
+        return objects
+
+    def _fetch_part(self, file_key, etag, start, end, transfer=None) -> bytes:
+        # IfMatch makes every part come from the same version of the object
+        response = self.s3_client.get_object(
+            Bucket=self.bucket_name, Key=file_key, Range=f'bytes={start}-{end}', IfMatch=etag
+        )
+        data = response['Body'].read()
+        if transfer is not None:
+            transfer.record(response, len(data))
+        return data
+
+    def open_object(self, file_key, size=None, etag=None, transfer=None):
+        """Binary file object streaming the object through parallel ranged GETs."""
+        if size is None:
+            size, etag = self.head(file_key, transfer)
+        return io.BufferedReader(
+            RangedReader(
+                lambda start, end: self._fetch_part(file_key, etag, start, end, transfer),
+                part_ranges(size, self.part_size), self._executor, self.max_workers
+            ),
+            buffer_size=STREAM_CHUNK_SIZE
+        )
+
+    def _cache_paths(self, file_key):
+        path = os.path.join(self.cache_dir, self.bucket_name, *file_key.split('/'))
+        return path, path + '.meta.json'
+
+    def cached_path(self, file_key, etag):
+        """Path of the cached copy of an object if it is the version with this ETag, else None."""
+        if self.cache_dir is None:
+            return None
+        path, meta_path = self._cache_paths(file_key)
+        try:
+            with open(meta_path, 'r') as file:
+                meta = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+        if meta.get('etag') != etag or not os.path.exists(path) or os.path.getsize(path) != meta.get('size'):
+            return None
+        return path
+
+    def download_file(self, file_key, local_path=None, transfer=None):
+        """
+        Download an object with parallel ranged GETs, each written at its
+        offset into one pre-sized file. With no local_path it goes to the cache, and an unchanged
+        object (same ETag) is not downloaded again. Returns the local path.
+        """
+        size, etag = self.head(file_key, transfer)
+        if local_path is None:
+            cached = self.cached_path(file_key, etag)
+            if cached is not None:
+                logging.info(f"'{file_key}' unchanged (ETag {etag}), using cached {cached}")
+                if transfer is not None:
+                    transfer.cached = True
+                return cached
+            if self.cache_dir is None:
+                raise ValueError('download_file needs a local_path when the cache is disabled')
+            local_path, meta_path = self._cache_paths(file_key)
+        else:
+            meta_path = None
+
+        start_time = time.perf_counter()
+        directory = os.path.dirname(os.path.abspath(local_path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+        os.close(fd)
+        try:
+            with open(tmp_path, 'r+b') as file:
+                file.truncate(size)
+
+            def write_part(start, end):
+                data = self._fetch_part(file_key, etag, start, end, transfer)
+                # One handle per part: its file position is not shared with other threads
+                with open(tmp_path, 'r+b') as file:
+                    file.seek(start)
+                    file.write(data)
+
+            futures = [self._executor.submit(write_part, *r) for r in part_ranges(size, self.part_size)]
+            try:
+                for future in futures:
+                    future.result()
+            finally:
+                # No part may still hold the file open when it is renamed or removed
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+            os.replace(tmp_path, local_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if meta_path is not None:
+            with open(meta_path, 'w') as file:
+                json.dump({'etag': etag, 'size': size}, file)
+        seconds = time.perf_counter() - start_time
+        logging.info(f"Downloaded '{file_key}' ({size / 1024 ** 2:.1f} MB) in {seconds:.2f}s "
+                     f"with {len(part_ranges(size, self.part_size))} ranged GETs")
+        return local_path
+
+    def fetch_file_from_s3(self, file_key, **read_csv_kwargs):
         """
         Fetches a CSV file from the S3 bucket and returns it as a Pandas DataFrame.
+
+        With a cache the object is downloaded once (re-validated by ETag on
+        every fetch) and parsed from disk; without one the ranged parts are
+        streamed straight into the CSV parser, so the object is never held
+        in memory as a whole.
         :param file_key: S3 file path (e.g., 'data/data.csv')
+        :param read_csv_kwargs: passed on to pandas.read_csv
         :return: Pandas DataFrame
         """
         try:
             logging.info(f"Fetching file '{file_key}' from S3 bucket '{self.bucket_name}'...")
-            obj = self.s3_client.get_object(Bucket=self.bucket_name, Key=file_key)
-            df = pd.read_csv(StringIO(obj['Body'].read().decode('utf-8')))
+            df = self._read_csv(file_key, None, read_csv_kwargs)
             logging.info(f"Successfully fetched and loaded '{file_key}' from S3 that has {len(df)} records.")
             return df
         except Exception as e:
             logging.exception(f"❌ Failed to fetch '{file_key}' from S3: {e}")
             return None
 
+    def _read_csv(self, file_key, transfer, read_csv_kwargs) -> pd.DataFrame:
+        if self.cache_dir is not None:
+            return pd.read_csv(self.download_file(file_key, transfer=transfer), **read_csv_kwargs)
+        with self.open_object(file_key, transfer=transfer) as stream:
+            return pd.read_csv(stream, **read_csv_kwargs)
+
+    def _fetch_object(self, file_key, read_csv_kwargs):
+        transfer = ObjectTransfer(file_key, 'fetch')
+        start = time.perf_counter()
+        try:
+            return transfer, self._read_csv(file_key, transfer, read_csv_kwargs)
+        except Exception as e:
+            transfer.error = str(e)
+            raise
+        finally:
+            transfer.seconds = time.perf_counter() - start
+
+    def _bounded(self, tasks, ordered):
+        """
+        Run zero-argument tasks on the object pool with at most
+        max_concurrency pending, yielding their results in task order or as
+        they complete. The remaining tasks are not started after a failure.
+        """
+        tasks = iter(tasks)
+        pending = deque()
+        try:
+            while True:
+                for task in tasks:
+                    pending.append(self._object_executor.submit(task))
+                    if len(pending) >= self.max_concurrency:
+                        break
+                if not pending:
+                    return
+                if ordered:
+                    yield pending.popleft().result()
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pending.remove(future)
+                        yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def iter_frames(self, file_keys, ordered=True, **read_csv_kwargs):
+        """
+        Fetch many CSV objects concurrently (at most max_concurrency at a
+        time) and yield (transfer, DataFrame) pairs, in key order or, with
+        ordered=False, as soon as each object is loaded. Raises on the first
+        object that cannot be fetched.
+        """
+        self.last_transfers = []
+        for transfer, df in self._bounded(
+            (lambda key=key: self._fetch_object(key, read_csv_kwargs) for key in file_keys), ordered
+        ):
+            self.last_transfers.append(transfer)
+            logging.info(f"Fetched '{transfer.key}': {len(df)} records, {transfer.bytes / 1024 ** 2:.1f} MB "
+                         f"in {transfer.seconds:.2f}s ({transfer.requests} requests, {transfer.retries} retries"
+                         f"{', cached' if transfer.cached else ''})")
+            yield transfer, df
+
+    def fetch_many(self, file_keys, concat=True, **read_csv_kwargs):
+        """
+        Fetch many CSV objects concurrently. Returns one DataFrame with the
+        objects concatenated in key order, or a {key: DataFrame} dict with
+        concat=False. Per-object metrics are left in last_transfers.
+        """
+        try:
+            frames = {transfer.key: df for transfer, df in self.iter_frames(file_keys, **read_csv_kwargs)}
+            logging.info(f"Bulk fetch from '{self.bucket_name}': {transfer_summary(self.last_transfers)}")
+            if not concat:
+                return frames
+            return pd.concat(frames.values(), ignore_index=True) if frames else pd.DataFrame()
+        except Exception as e:
+            logging.error(f"Bulk fetch from '{self.bucket_name}' failed: {e}")
+            raise
+
+    def fetch_prefix(self, prefix, pattern='*.csv', concat=True, **read_csv_kwargs):
+        """Fetch every CSV object under a prefix, e.g. the shards of a daily export."""
+        keys = [item['key'] for item in self.list_objects(prefix, pattern)]
+        logging.info(f"{len(keys)} objects under '{prefix}' in '{self.bucket_name}'")
+        return self.fetch_many(keys, concat=concat, **read_csv_kwargs)
+
+    def _upload_object(self, local_path, file_key):
+        transfer = ObjectTransfer(file_key, 'upload')
+        start = time.perf_counter()
+        try:
+            with open(local_path, 'rb') as file:
+                response = self.s3_client.put_object(Bucket=self.bucket_name, Key=file_key, Body=file)
+            transfer.record(response, os.path.getsize(local_path))
+            return transfer
+        except Exception as e:
+            transfer.error = str(e)
+            raise
+        finally:
+            transfer.seconds = time.perf_counter() - start
+
+    def upload_many(self, files):
+        """
+        Upload {local_path: key} concurrently, at most max_concurrency at a
+        time, one PUT per file. Returns the per-object transfers.
+        """
+        try:
+            files = list(files.items())
+            transfers = list(self._bounded(
+                (lambda path=path, key=key: self._upload_object(path, key) for path, key in files), ordered=False
+            ))
+            self.last_transfers = transfers
+            logging.info(f"Bulk upload to '{self.bucket_name}': {transfer_summary(transfers)}")
+            return transfers
+        except Exception as e:
+            logging.error(f"Bulk upload to '{self.bucket_name}' failed: {e}")
+            raise
+
+    def upload_directory(self, local_dir, prefix='', pattern='*'):
+        """Upload the files of a directory tree under a key prefix, keeping their relative paths."""
+        files = {}
+        for root, _, names in os.walk(local_dir):
+            for name in fnmatch.filter(names, pattern):
+                path = os.path.join(root, name)
+                files[path] = prefix + os.path.relpath(path, local_dir).replace(os.sep, '/')
+        return self.upload_many(dict(sorted(files.items(), key=lambda item: item[1])))
+
 # Example usage
 # if __name__ == "__main__":
 #     # Replace these with your actual AWS credentials and S3 details
@@ -46,8 +455,8 @@ class s3_operations:
 #     AWS_SECRET_KEY = "AWS_SECRET_KEY"
 #     FILE_KEY = "data.csv"  # Path inside S3 bucket
 
-#     data_ingestion = s3_operations(BUCKET_NAME, AWS_ACCESS_KEY, AWS_SECRET_KEY)
-#     df = data_ingestion.fetch_file_from_s3(FILE_KEY)
+#     with s3_operations(BUCKET_NAME, AWS_ACCESS_KEY, AWS_SECRET_KEY) as data_ingestion:
+#         df = data_ingestion.fetch_file_from_s3(FILE_KEY)
 
 #     if df is not None:
 #         print(f"Data fetched with {len(df)} records..")  # Display first few rows of the fetched DataFrame
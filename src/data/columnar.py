@@ -0,0 +1,225 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+import yaml
+from src.logger import logging
+from src.features.build_features import FEATURE_DTYPES, ONEHOT_DTYPE, apply_schema
+from src.data.partitions import is_partitioned, partition_files
+
+
+# File format of the intermediate files between pipeline stages
+DEFAULT_FORMAT = 'arrow'
+EXTENSIONS = {'arrow': '.arrow', 'parquet': '.parquet', 'csv': '.csv'}
+
+# Column types of the preprocessed data, from the declared compact dtypes; any other column is a one-hot indicator
+COLUMN_TYPES = {col: pa.from_numpy_dtype(np.dtype(dtype)) for col, dtype in FEATURE_DTYPES.items()}
+ONEHOT_TYPE = pa.from_numpy_dtype(np.dtype(ONEHOT_DTYPE))
+
+
+def interchange_format(params_path='params.yaml') -> str:
+    """Format configured under interchange.format in params.yaml (arrow if unset)."""
+    try:
+        with open(params_path, 'r') as file:
+            params = yaml.safe_load(file) or {}
+        fmt = params.get('interchange', {}).get('format', DEFAULT_FORMAT)
+    except FileNotFoundError:
+        fmt = DEFAULT_FORMAT
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Unknown interchange format '{fmt}', expected one of {sorted(EXTENSIONS)}")
+    return fmt
+
+
+def data_file(directory, stem, fmt=DEFAULT_FORMAT) -> str:
+    """Path of an intermediate file, e.g. data_file('data/raw', 'preprocessed_data', 'arrow')."""
+    return os.path.join(directory, stem + EXTENSIONS[fmt])
+
+
+def dataset_path(directory, stem, fmt=DEFAULT_FORMAT) -> str:
+    """The partitioned dataset directory/stem written by incremental runs if there is one, else the single file."""
+    partitioned = os.path.join(directory, stem)
+    return partitioned if is_partitioned(partitioned) else data_file(directory, stem, fmt)
+
+
+def file_format(path) -> str:
+    for fmt, extension in EXTENSIONS.items():
+        if path.endswith(extension):
+            return fmt
+    raise ValueError(f'Cannot tell the format of {path} from its extension')
+
+
+def frame_schema(columns) -> pa.Schema:
+    """Arrow schema of a preprocessed frame with these columns, in this order."""
+    return pa.schema([pa.field(col, COLUMN_TYPES.get(col, ONEHOT_TYPE), nullable=False) for col in columns])
+
+
+def to_table(df: pd.DataFrame, schema=None) -> pa.Table:
+    """Convert a frame to Arrow, enforcing the schema (raises on missing values or lossy casts)."""
+    schema = schema or frame_schema(df.columns)
+    return pa.Table.from_pandas(apply_schema(df), schema=schema, preserve_index=False)
+
+
+def memory_usage(df: pd.DataFrame) -> tuple:
+    """Bytes a frame takes in memory, and what the same cells would take as float64."""
+    return int(df.memory_usage(index=False, deep=True).sum()), df.size * 8
+
+
+class MemoryTally:
+    """
+    Memory of the frames a stage handles (one frame, or the sum over its
+    chunks), logged next to the size of the same cells as float64.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.rows = 0
+        self.bytes = 0
+        self.float64_bytes = 0
+
+    def add(self, df: pd.DataFrame) -> pd.DataFrame:
+        in_memory, as_float64 = memory_usage(df)
+        self.rows += len(df)
+        self.bytes += in_memory
+        self.float64_bytes += as_float64
+        return df
+
+    def log(self):
+        logging.info('%s: %d rows, %.2f MB in memory (%.2f MB as float64, %.1fx)', self.label, self.rows,
+                     self.bytes / 1024 ** 2, self.float64_bytes / 1024 ** 2, self.float64_bytes / max(self.bytes, 1))
+
+
+def log_memory(label, df: pd.DataFrame) -> pd.DataFrame:
+    """Log the memory of one frame; returns it for chaining."""
+    tally = MemoryTally(label)
+    tally.add(df)
+    tally.log()
+    return df
+
+
+class FrameWriter:
+    """
+    Write a preprocessed frame to an intermediate file, possibly in several
+    chunks; the format follows the file extension.
+
+    Arrow files are written uncompressed so readers can memory-map them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.format = file_format(path)
+        self.schema = None
+        self.n_rows = 0
+        self._writer = None
+
+    def write(self, df: pd.DataFrame):
+        if self.format == 'csv':
+            first = self.n_rows == 0
+            df.to_csv(self.path, mode='w' if first else 'a', header=first, index=False)
+            self.n_rows += len(df)
+            return
+        table = to_table(df, self.schema)
+        if self._writer is None:
+            self.schema = table.schema
+            if self.format == 'arrow':
+                self._writer = ipc.new_file(self.path, self.schema)
+            else:
+                self._writer = pq.ParquetWriter(self.path, self.schema)
+        self._writer.write_table(table)
+        self.n_rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_frame(df: pd.DataFrame, path: str) -> None:
+    """Write a whole frame to an intermediate file."""
+    try:
+        with FrameWriter(path) as writer:
+            writer.write(df)
+        logging.info('Frame with %d rows written to %s', len(df), path)
+    except Exception as e:
+        logging.error('Error occurred while writing %s: %s', path, e)
+        raise
+
+
+def read_table(path: str, columns=None) -> pa.Table:
+    """
+    Read an intermediate file as an Arrow table, only the requested columns.
+
+    Arrow files are memory-mapped: selecting columns costs nothing and the
+    data is paged in lazily from the OS cache. A partitioned dataset
+    directory reads as the concatenation of its partitions (zero-copy).
+    Files written with other column types (e.g. float64 before the compact
+    schema) are cast to the declared types.
+    """
+    if is_partitioned(path):
+        files = partition_files(path)
+        if not files:
+            raise ValueError(f'Partitioned dataset {path} has no partitions')
+        return pa.concat_tables([read_table(file_path, columns) for file_path in files])
+    fmt = file_format(path)
+    if fmt == 'arrow':
+        table = ipc.open_file(pa.memory_map(path, 'r')).read_all()
+        table = table if columns is None else table.select(columns)
+    elif fmt == 'parquet':
+        table = pq.read_table(path, columns=columns, memory_map=True)
+    else:
+        raise ValueError(f'{path} is not a columnar file')
+    schema = frame_schema(table.column_names)
+    return table if table.schema.equals(schema) else table.cast(schema)
+
+
+def iter_frames(path: str, chunk_size: int, columns=None):
+    """Iterate over an intermediate file (or partitioned dataset) in frames of at most chunk_size rows."""
+    if is_partitioned(path):
+        for file_path in partition_files(path):
+            yield from iter_frames(file_path, chunk_size, columns)
+        return
+    fmt = file_format(path)
+    if fmt == 'csv':
+        for chunk in pd.read_csv(path, usecols=columns, chunksize=chunk_size):
+            yield apply_schema(chunk)
+        return
+    if fmt == 'parquet':
+        batches = pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=chunk_size, columns=columns)
+    else:
+        batches = read_table(path, columns).to_batches(max_chunksize=chunk_size)
+    for batch in batches:
+        yield batch.to_pandas(split_blocks=True)
+
+
+def read_frame(path: str, columns=None) -> pd.DataFrame:
+    """Read an intermediate file (or partitioned dataset) into pandas, only the requested columns."""
+    try:
+        if is_partitioned(path):
+            files = partition_files(path)
+            if files and file_format(files[0]) == 'csv':
+                df = pd.concat([read_frame(file_path, columns) for file_path in files], ignore_index=True)
+            else:
+                df = read_table(path, columns).to_pandas(split_blocks=True)
+        elif file_format(path) == 'csv':
+            df = apply_schema(pd.read_csv(path, usecols=columns))
+            if columns is not None:
+                df = df[list(columns)]
+        else:
+            # split_blocks keeps numeric columns zero-copy views of the Arrow buffers
+            df = read_table(path, columns).to_pandas(split_blocks=True)
+        logging.info('Data loaded from %s', path)
+        return df
+    except FileNotFoundError:
+        logging.error('File not found: %s', path)
+        raise
+    except Exception as e:
+        logging.error('Unexpected error occurred while reading %s: %s', path, e)
+        raise
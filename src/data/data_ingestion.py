@@ -3,34 +3,41 @@ import numpy as np
 import pandas as pd
 pd.set_option('future.no_silent_downcasting', True)
 
+import glob
 import os
+import shutil
+from collections import Counter
 from sklearn.model_selection import train_test_split
 import yaml
 from src.logger import logging
-from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder
-
-# def load_params(params_path: str) -> dict:
-#     """Load parameters from a YAML file."""
-#     try:
-#         with open(params_path, 'r') as file:
-#             params = yaml.safe_load(file)
-#         logging.debug('Parameters retrieved from %s', params_path)
-#         return params
-#     except FileNotFoundError:
-#         logging.error('File not found: %s', params_path)
-#         raise
-#     except yaml.YAMLError as e:
-#         logging.error('YAML error: %s', e)
-#         raise
-#     except Exception as e:
-#         logging.error('Unexpected error: %s', e)
-#         raise
+from src.features.build_features import FeatureEncoder, ONEHOT_COLUMNS, apply_schema
+from src.data.columnar import EXTENSIONS, FrameWriter, MemoryTally, data_file, interchange_format, log_memory
+from src.data.partitions import PartitionedDataset, file_signature, row_fingerprints, row_keys, signature_unchanged
+
+DROP_COLUMNS = ['Patient_ID', 'Asthma_Control_Level']
+
+def load_params(params_path: str) -> dict:
+    """Load parameters from a YAML file."""
+    try:
+        with open(params_path, 'r') as file:
+            params = yaml.safe_load(file)
+        logging.debug('Parameters retrieved from %s', params_path)
+        return params
+    except FileNotFoundError:
+        logging.error('File not found: %s', params_path)
+        raise
+    except yaml.YAMLError as e:
+        logging.error('YAML error: %s', e)
+        raise
+    except Exception as e:
+        logging.error('Unexpected error: %s', e)
+        raise
 
 def load_data(data_url):
     try:
         logging.info('loading data ........')
         df = pd.read_csv(data_url)
-        df.drop(columns=['Patient_ID', 'Asthma_Control_Level'], inplace=True)
+        df.drop(columns=DROP_COLUMNS, inplace=True)
         logging.info('dataloading completed !!')
         return df
     except Exception as e:
@@ -38,55 +45,61 @@ def load_data(data_url):
         raise
 
 
-def preprocessing_first(df):
-    try:
-        logging.info('preprocessing ..........')
-        df['Allergies'] = df['Allergies'].fillna(df['Allergies'].mode()[0])
-        df['Comorbidities'] = df['Comorbidities'].fillna(df['Comorbidities'].mode()[0])
+def read_chunks(data_url, chunk_size, columns=None):
+    """Iterate over the raw CSV in DataFrames of at most chunk_size rows."""
+    usecols = columns if columns is not None else (lambda col: col not in DROP_COLUMNS)
+    return pd.read_csv(data_url, usecols=usecols, chunksize=chunk_size)
 
-        return df
+
+def collect_category_counts(data_url, chunk_size):
+    """First pass: value counts of the categorical columns, reading only those columns."""
+    try:
+        logging.info('collecting category counts .........')
+        counts = {col: Counter() for col in ONEHOT_COLUMNS}
+        n_rows = 0
+        for chunk in read_chunks(data_url, chunk_size, columns=ONEHOT_COLUMNS):
+            for col in ONEHOT_COLUMNS:
+                counts[col].update(chunk[col].value_counts().to_dict())
+            n_rows += len(chunk)
+        logging.info(f'category counts collected over {n_rows} rows')
+        return counts
     except Exception as e:
         logging.error(f'The error is {e}')
         raise
 
 
-def doing_onehotencoding(df):
+def fit_encoder(df):
     try:
-        logging.info('doing one hot encoding .........')
-        cols = ['Gender', 'Smoking_Status', 'Allergies', 'Comorbidities']
-        encoder = OneHotEncoder(sparse_output=False, handle_unknown='ignore')  # <-- fix here
+        logging.info('fitting feature encoder .........')
+        return FeatureEncoder.fit(df)
+    except Exception as e:
+        logging.error(f'The error is {e}')
+        raise
 
-        for col in cols:
-            if col in df.columns:
-                encoded = encoder.fit_transform(df[[col]])
-                encoded_cols = encoder.get_feature_names_out([col])
-                encoded_df = pd.DataFrame(encoded, columns=encoded_cols, index=df.index)
-                df = pd.concat([df.drop(columns=[col]), encoded_df], axis=1)
 
-        return df
+def preprocessing_first(df, encoder):
+    try:
+        logging.info('preprocessing ..........')
+        return encoder.fill_missing(df)
     except Exception as e:
         logging.error(f'The error is {e}')
         raise
 
 
-
-def doing_ordinalencoding(df): 
+def doing_onehotencoding(df, encoder):
     try:
-        logging.info("Starting manual ordinal encoding...")
+        logging.info('doing one hot encoding .........')
+        return encoder.encode_onehot(df)
+    except Exception as e:
+        logging.error(f'The error is {e}')
+        raise
 
-        ordinal_maps = {
-            'Air_Pollution_Level': {'Low': 0, 'Moderate': 1, 'High': 2},
-            'Physical_Activity_Level': {'Sedentary': 0, 'Moderate': 1, 'Active': 2},
-            'Occupation_Type': {'Indoor': 0, 'Outdoor': 1}
-        }
 
-        for col, mapping in ordinal_maps.items():
-            if col in df.columns:
-                df[col] = df[col].map(mapping)
-                logging.info(f"Encoded column: {col}")
-            else:
-                logging.warning(f"Column '{col}' not found in DataFrame. Skipping.")
 
+def doing_ordinalencoding(df, encoder):
+    try:
+        logging.info("Starting manual ordinal encoding...")
+        df = encoder.encode_ordinal(df)
         logging.info("Manual ordinal encoding completed successfully.")
         return df
 
@@ -95,11 +108,13 @@ def doing_ordinalencoding(df):
         raise
 
 
-def preprocessing(df):
+def preprocessing(df, encoder):
     try:
-        df = preprocessing_first(df)
-        df = doing_onehotencoding(df)
-        df = doing_ordinalencoding(df)
+        df = preprocessing_first(df, encoder)
+        df = doing_onehotencoding(df, encoder)
+        df = doing_ordinalencoding(df, encoder)
+        # Narrowest safe dtype per column (uint8 indicators and codes, int16 counts, float32 measurements)
+        df = apply_schema(df)
         logging.info('preprocessing completed !!!!')
         return df
     except Exception as e:
@@ -107,23 +122,183 @@ def preprocessing(df):
         raise
 
 
-def save_data(df, data_path):
+def save_data(df, data_path, fmt='arrow'):
     try:
         logging.info('saving data ..............')
         raw_data_path = os.path.join(data_path, 'raw')
         os.makedirs(raw_data_path, exist_ok=True)
-        df.to_csv(os.path.join(raw_data_path, "preprocessed_data.csv"), index=False)
+        # A full run replaces any partitioned dataset left by incremental runs
+        shutil.rmtree(os.path.join(raw_data_path, 'preprocessed_data'), ignore_errors=True)
+        with FrameWriter(data_file(raw_data_path, 'preprocessed_data', fmt)) as writer:
+            writer.write(df)
         logging.info(f'Data saved successfully at {raw_data_path}')
     except Exception as e:
         logging.error(f'Unexpected error occurred while saving the data: {e}')
         raise
 
 
+def ingest_in_chunks(data_url, data_path, chunk_size, fmt='arrow', encoder=None):
+    """
+    Streaming ingestion: fit the encoder from a cheap first pass over the
+    categorical columns (skipped when a pinned encoder is given), then
+    preprocess and append the file chunk by chunk, so peak memory depends
+    on chunk_size rather than on the input size.
+    """
+    try:
+        if encoder is None:
+            encoder = FeatureEncoder.from_counts(collect_category_counts(data_url, chunk_size))
+        raw_data_path = os.path.join(data_path, 'raw')
+        os.makedirs(raw_data_path, exist_ok=True)
+        shutil.rmtree(os.path.join(raw_data_path, 'preprocessed_data'), ignore_errors=True)
+        raw_memory, encoded_memory = MemoryTally('ingestion input'), MemoryTally('ingestion output')
+        with FrameWriter(data_file(raw_data_path, 'preprocessed_data', fmt)) as writer:
+            for chunk in read_chunks(data_url, chunk_size):
+                chunk = preprocessing(raw_memory.add(chunk), encoder)
+                writer.write(encoded_memory.add(chunk))
+        raw_memory.log()
+        encoded_memory.log()
+        logging.info(f'streaming ingestion completed: {encoded_memory.rows} rows in chunks of {chunk_size}')
+        return encoder
+    except Exception as e:
+        logging.error(f'The error is {e}')
+        raise
+
+
+def input_row_keys(data_url, chunk_size):
+    """Key of every raw row, hashed from its text so it does not depend on inferred dtypes."""
+    chunks = pd.read_csv(data_url, dtype=str, keep_default_na=False, chunksize=chunk_size)
+    fingerprints = [row_fingerprints(chunk) for chunk in chunks]
+    return row_keys(np.concatenate(fingerprints) if fingerprints else np.empty(0, dtype=np.uint64))
+
+
+def ingest_incremental(input_paths, data_path, chunk_size, fmt='arrow', encoder=None):
+    """
+    Delta ingestion into the partitioned dataset data/raw/preprocessed_data/.
+
+    Unchanged input files (same size and mtime, or same SHA-256) are skipped
+    without being read. For a changed input, every row is keyed by a hash of
+    its raw text, and only rows whose keys are not yet in one of its
+    partitions are preprocessed and written as a new partition. If rows of
+    an input disappeared, its partitions are dropped and it is ingested
+    again. The encoder is frozen in the manifest by the first run, so every
+    partition has the same fill values and column layout; delete the
+    directory (or run without incremental) to refit it. A pinned encoder
+    that differs from the frozen one raises ValueError.
+    """
+    try:
+        dataset = PartitionedDataset(os.path.join(data_path, 'raw', 'preprocessed_data'), EXTENSIONS[fmt])
+        if dataset.extension != EXTENSIONS[fmt]:
+            logging.info(f'Interchange format changed to {fmt}, rebuilding all partitions')
+            for partition_id in list(dataset.partitions):
+                dataset.remove(partition_id)
+            dataset.inputs, dataset.extension = {}, EXTENSIONS[fmt]
+
+        if 'encoder' in dataset.meta:
+            frozen = FeatureEncoder(dataset.meta['encoder']['categories'], dataset.meta['encoder']['fill_values'])
+            if encoder is not None and encoder.to_dict() != frozen.to_dict():
+                raise ValueError(f'pinned_encoder differs from the encoder frozen in {dataset.directory}; '
+                                 'delete the directory to re-ingest with it')
+            encoder = frozen
+        elif encoder is None:
+            counts = {col: Counter() for col in ONEHOT_COLUMNS}
+            for path in input_paths:
+                for col, values in collect_category_counts(path, chunk_size).items():
+                    counts[col].update(values)
+            encoder = FeatureEncoder.from_counts(counts)
+        dataset.meta['encoder'] = encoder.to_dict()
+
+        for path in input_paths:
+            previous = dataset.inputs.get(path)
+            if previous is not None and signature_unchanged(path, previous['signature']):
+                logging.info(f'{path} unchanged, reusing partitions {previous["partitions"]}')
+                continue
+
+            keys = input_row_keys(path, chunk_size)
+            partition_ids = list(previous['partitions']) if previous is not None else []
+            known = np.concatenate([dataset.keys(pid) for pid in partition_ids] + [np.empty(0, dtype=np.uint64)])
+            if not np.isin(known, keys).all():
+                logging.info(f'Rows were removed from {path}, ingesting it again')
+                for partition_id in partition_ids:
+                    dataset.remove(partition_id)
+                partition_ids, known = [], np.empty(0, dtype=np.uint64)
+
+            is_new = ~np.isin(keys, known)
+            if is_new.any():
+                partition_id = dataset.new_partition()
+                offset, encoded_memory = 0, MemoryTally(f'ingestion output {partition_id}')
+                with FrameWriter(dataset.path(partition_id)) as writer:
+                    for chunk in read_chunks(path, chunk_size):
+                        mask = is_new[offset:offset + len(chunk)]
+                        offset += len(chunk)
+                        if mask.any():
+                            chunk = preprocessing(chunk if mask.all() else chunk[mask].copy(), encoder)
+                            writer.write(encoded_memory.add(chunk))
+                encoded_memory.log()
+                dataset.add(partition_id, {'input': path, 'rows': int(is_new.sum())}, keys=keys[is_new])
+                partition_ids.append(partition_id)
+                logging.info(f'Ingested {int(is_new.sum())} new rows of {path} into {partition_id}')
+            else:
+                logging.info(f'No new rows in {path}')
+            dataset.inputs[path] = {'signature': file_signature(path), 'partitions': partition_ids}
+
+        for path in [path for path in dataset.inputs if path not in input_paths]:
+            logging.info(f'{path} is no longer an input, dropping its partitions')
+            for partition_id in dataset.inputs.pop(path)['partitions']:
+                dataset.remove(partition_id)
+
+        dataset.save()
+        # The partitioned dataset replaces the single-file output of full runs
+        single_file = data_file(os.path.join(data_path, 'raw'), 'preprocessed_data', fmt)
+        if os.path.exists(single_file):
+            os.remove(single_file)
+        logging.info(f'incremental ingestion completed: {len(dataset.partitions)} partitions, '
+                     f'{sum(info["rows"] for info in dataset.partitions.values())} rows')
+        return encoder
+    except Exception as e:
+        logging.error(f'The error is {e}')
+        raise
+
+
+# data_url = r'C:\Users\sfed\Desktop\my-proj\china_cancer_patient_project\data2\raw\synthetic_asthma_dataset.csv'
+DATA_URL = r'https://raw.githubusercontent.com/sami540/china_cancer_patient_project/main/data2/raw/synthetic_asthma_dataset.csv'
+# An output of this stage: DVC deletes it before every run, so it cannot be pinned
+ENCODER_PATH = './models/encoder.json'
+
+
+def run(params, fmt, data_url=DATA_URL):
+    """
+    Run the stage with already loaded params. Returns the encoded frame,
+    which is also saved to data/raw (None when it was streamed to disk in
+    chunks or partitions), and the fitted encoder.
+    """
+    chunk_size = params['data_ingestion']['chunk_size']
+    # A pinned encoder keeps the fill values and one-hot vocabulary (and so the
+    # column layout) of an earlier run instead of refitting them on new data
+    pinned_encoder = params['data_ingestion'].get('pinned_encoder')
+    if pinned_encoder and os.path.abspath(pinned_encoder) == os.path.abspath(ENCODER_PATH):
+        raise ValueError(f'pinned_encoder cannot be {ENCODER_PATH}, which this stage rewrites; '
+                         'pin a committed copy such as models/pinned_encoder.json')
+    encoder = FeatureEncoder.load(pinned_encoder) if pinned_encoder else None
+    df = None
+
+    if params['data_ingestion'].get('incremental'):
+        # Local extracts (paths or globs), e.g. one file per daily refresh; the URL when none are listed
+        patterns = params['data_ingestion'].get('inputs') or [data_url]
+        inputs = [path for pattern in patterns for path in (sorted(glob.glob(pattern)) or [pattern])]
+        encoder = ingest_incremental(inputs, './data', chunk_size or 100000, fmt, encoder)
+    elif chunk_size:
+        encoder = ingest_in_chunks(data_url, './data', chunk_size, fmt, encoder)
+    else:
+        df = log_memory('ingestion input', load_data(data_url))
+        encoder = encoder or fit_encoder(df)
+        df = log_memory('ingestion output', preprocessing(df, encoder))
+        save_data(df, './data', fmt)
+    encoder.save(ENCODER_PATH)
+    return df, encoder
+
+
 def main():
-    # df = load_data(r'C:\Users\sfed\Desktop\my-proj\china_cancer_patient_project\data2\raw\synthetic_asthma_dataset.csv')
-    df = load_data(r'https://raw.githubusercontent.com/sami540/china_cancer_patient_project/main/data2/raw/synthetic_asthma_dataset.csv')
-    df = preprocessing(df)
-    save_data(df, './data')
+    run(load_params('params.yaml'), interchange_format())
 
 
 if __name__ == '__main__':
@@ -1,52 +1,199 @@
 from src.logger import logging
+from src.data.columnar import (
+    FrameWriter, MemoryTally, data_file, dataset_path, interchange_format, iter_frames, log_memory, read_frame
+)
+from src.data.outliers import OutlierFilter
+from src.data.partitions import PartitionedDataset, is_partitioned
 import pandas as pd
+import json
 import os
+import shutil
+import yaml
 
 pd.set_option('future.no_silent_downcasting', True)
 
+OUTLIER_COLUMNS = ['Age', 'BMI', 'Peak_Expiratory_Flow', 'FeNO_Level']
+# Rows below this value in any outlier column are dropped; the lower IQR bound is not used
+LOWER_LIMIT = 10
+
+def load_params(params_path: str) -> dict:
+    """Load parameters from a YAML file."""
+    try:
+        with open(params_path, 'r') as file:
+            params = yaml.safe_load(file)
+        logging.debug('Parameters retrieved from %s', params_path)
+        return params
+    except FileNotFoundError:
+        logging.error('File not found: %s', params_path)
+        raise
+    except yaml.YAMLError as e:
+        logging.error('YAML error: %s', e)
+        raise
+    except Exception as e:
+        logging.error('Unexpected error: %s', e)
+        raise
+
 def data_ingestion(url):
     try:
         logging.info('Gathering data for preprocessing...')
-        df = pd.read_csv(url)
+        df = read_frame(url)
         return df
     except Exception as e:
         logging.error(f'The error is {e}')
         raise
 
-def remove_outliers_iqr(df, columns):
+def remove_outliers_iqr(df, columns, lower_limit=LOWER_LIMIT):
+    """Fit the IQR bounds on the whole frame and filter it; returns the kept rows and the filter."""
     try:
         logging.info('Removing outliers...')
-        for col in columns:
-            if col in df.columns:
-                Q1 = df[col].quantile(0.25)
-                Q3 = df[col].quantile(0.75)
-                IQR = Q3 - Q1
-                lower_bound = Q1 - 1.5 * IQR
-                upper_bound = Q3 + 1.5 * IQR
-                df = df[(df[col] >= 10) & (df[col] <= upper_bound)]
-        return df
+        outlier_filter = OutlierFilter(columns, lower_limit=lower_limit).fit(df)
+        df = outlier_filter.transform(df)
+        outlier_filter.log_report()
+        return df, outlier_filter
+    except Exception as e:
+        logging.error(f'The error is {e}')
+        raise
+
+def remove_outliers_in_chunks(input_path, output_path, columns, chunk_size, sketch_k=200, lower_limit=LOWER_LIMIT):
+    """
+    Two passes over the file in chunks: quantile sketches of the outlier
+    columns (reading only those columns), then filter and write every chunk.
+    """
+    try:
+        logging.info('Removing outliers in chunks...')
+        outlier_filter = OutlierFilter(columns, lower_limit=lower_limit, sketch_k=sketch_k)
+        outlier_filter.fit_chunks(iter_frames(input_path, chunk_size, columns=columns))
+        input_memory, output_memory = MemoryTally('preprocessing input'), MemoryTally('preprocessing output')
+        with FrameWriter(output_path) as writer:
+            for chunk in iter_frames(input_path, chunk_size):
+                writer.write(output_memory.add(outlier_filter.transform(input_memory.add(chunk))))
+        input_memory.log()
+        output_memory.log()
+        outlier_filter.log_report()
+        return outlier_filter
+    except Exception as e:
+        logging.error(f'The error is {e}')
+        raise
+
+def remove_outliers_incremental(raw_dir, interim_dir, columns, chunk_size, lower_limit=LOWER_LIMIT):
+    """
+    Filter only the raw partitions that have no up-to-date interim partition
+    yet, and drop interim partitions whose raw partition is gone. The bounds
+    are frozen in the interim manifest by the first run, so every partition
+    is filtered the same way; delete interim_dir to refit them. Returns a
+    filter whose counts cover all partitions.
+    """
+    try:
+        logging.info('Removing outliers from new partitions...')
+        raw = PartitionedDataset(raw_dir)
+        interim = PartitionedDataset(interim_dir, raw.extension)
+        outlier_filter = OutlierFilter(columns, lower_limit=lower_limit)
+        if 'bounds' in interim.meta and interim.extension == raw.extension:
+            outlier_filter.bounds = {col: tuple(bounds) for col, bounds in interim.meta['bounds'].items()}
+        else:
+            for partition_id in list(interim.partitions):
+                interim.remove(partition_id)
+            interim.extension = raw.extension
+            outlier_filter.fit(read_frame(raw_dir, columns=columns))
+            interim.meta['bounds'] = {col: list(bounds) for col, bounds in outlier_filter.bounds.items()}
+
+        for partition_id, info in list(interim.partitions.items()):
+            source = raw.partitions.get(partition_id)
+            if source is None or source['created'] != info['source_created']:
+                interim.remove(partition_id)
+
+        os.makedirs(interim_dir, exist_ok=True)
+        for partition_id, source in raw.partitions.items():
+            if partition_id in interim.partitions:
+                continue
+            outlier_filter.reset_counts()
+            output_memory = MemoryTally(f'preprocessing output {partition_id}')
+            with FrameWriter(interim.path(partition_id)) as writer:
+                for chunk in iter_frames(raw.path(partition_id), chunk_size):
+                    writer.write(output_memory.add(outlier_filter.transform(chunk)))
+            output_memory.log()
+            interim.add(partition_id, {
+                'source_created': source['created'], 'rows': outlier_filter.n_rows,
+                'kept': outlier_filter.n_kept, 'dropped_by_column': outlier_filter.dropped_by_column
+            })
+            logging.info(f'Filtered {partition_id}: kept {outlier_filter.n_kept} of {outlier_filter.n_rows} rows')
+        interim.save()
+
+        # Report over every partition, not only the ones filtered in this run
+        outlier_filter.reset_counts()
+        for info in interim.partitions.values():
+            outlier_filter.n_rows += info['rows']
+            outlier_filter.n_kept += info['kept']
+            for col, dropped in info['dropped_by_column'].items():
+                outlier_filter.dropped_by_column[col] += dropped
+        outlier_filter.log_report()
+        return outlier_filter
     except Exception as e:
-        logging.error(f'The error is {e}')      
+        logging.error(f'The error is {e}')
         raise
 
-def save_data(df, data_path):
+def save_report(report, file_path):
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'w') as file:
+            json.dump(report, file, indent=4)
+        logging.info(f'Outlier report saved to {file_path}')
+    except Exception as e:
+        logging.error(f'Unexpected error occurred while saving the outlier report: {e}')
+        raise
+
+def save_data(df, data_path, fmt='arrow'):
     try:
         logging.info('Saving data...')
         interim_data_path = os.path.join(data_path, 'interim')  # Updated to match DVC output
         os.makedirs(interim_data_path, exist_ok=True)
-        df.to_csv(os.path.join(interim_data_path, "preprocessed_data_2.csv"), index=False)
+        # A full run replaces any partitioned dataset left by incremental runs
+        shutil.rmtree(os.path.join(interim_data_path, 'preprocessed_data_2'), ignore_errors=True)
+        with FrameWriter(data_file(interim_data_path, 'preprocessed_data_2', fmt)) as writer:
+            writer.write(df)
         logging.info(f'Data saved successfully at {interim_data_path}')
     except Exception as e:
         logging.error(f'Unexpected error occurred while saving the data: {e}')
         raise    
 
-def main():
-    df = data_ingestion('./data/raw/preprocessed_data.csv')
+def run(params, fmt, df=None):
+    """
+    Run the stage with already loaded params. df is the ingestion output
+    when it is still in memory (the in-memory path then skips reading
+    data/raw). Returns the filtered frame, also saved to data/interim
+    (None in chunked and incremental mode), and the outlier filter.
+    """
+    chunk_size = params.get('chunk_size', 0)
+    input_path = dataset_path('./data/raw', 'preprocessed_data', fmt)
+    filtered = None
     # df = data_ingestion(r'https://raw.githubusercontent.com/sami540/china_cancer_patient_project/main/data_for_github/preprocessed_data.csv')
-    cols = ['Age', 'BMI', 'Peak_Expiratory_Flow', 'FeNO_Level'] 
-    df = remove_outliers_iqr(df, cols)
-    save_data(df, './data')  # This will save to ./data/interim
+
+    if is_partitioned(input_path):
+        # Incremental ingestion: mirror its partitions
+        outlier_filter = remove_outliers_incremental(
+            input_path, './data/interim/preprocessed_data_2', OUTLIER_COLUMNS, chunk_size or 100000
+        )
+        single_file = data_file('./data/interim', 'preprocessed_data_2', fmt)
+        if os.path.exists(single_file):
+            os.remove(single_file)
+    elif chunk_size:
+        os.makedirs('./data/interim', exist_ok=True)
+        shutil.rmtree('./data/interim/preprocessed_data_2', ignore_errors=True)
+        outlier_filter = remove_outliers_in_chunks(
+            input_path, data_file('./data/interim', 'preprocessed_data_2', fmt), OUTLIER_COLUMNS,
+            chunk_size, sketch_k=params.get('sketch_k', 200)
+        )
+    else:
+        df = log_memory('preprocessing input', data_ingestion(input_path) if df is None else df)
+        filtered, outlier_filter = remove_outliers_iqr(df, OUTLIER_COLUMNS)
+        log_memory('preprocessing output', filtered)
+        save_data(filtered, './data', fmt)  # This will save to ./data/interim
+    save_report(outlier_filter.report(), 'reports/outliers.json')
     logging.info('Data preprocessing completed!')
+    return filtered, outlier_filter
+
+def main():
+    run(load_params('params.yaml').get('data_preprocessing', {}), interchange_format())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,169 @@
+import math
+
+import numpy as np
+import pandas as pd
+from src.logger import logging
+
+
+class QuantileSketch:
+    """
+    Mergeable approximate quantile sketch (KLL).
+
+    Values are kept in a stack of compactors; compactor h holds items of
+    weight 2**h. A full compactor is sorted and every other item (random
+    offset) is promoted to the next level, so memory stays O(k log(n/k))
+    however many values are added. Quantiles are answered with a normalised
+    rank error of roughly 1.7 / k with high probability (about 1% for the
+    default k=200), and sketches built on separate chunks can be merged
+    with the same guarantee. Until the first compaction the answers are
+    exact, and match pandas' linearly interpolated quantiles.
+    """
+
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.n = 0
+        self.compactors = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level) -> int:
+        depth = len(self.compactors) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.compactors):
+            items = self.compactors[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays at this level
+                keep, items = items[len(items) - len(items) % 2:], items[:len(items) - len(items) % 2]
+                promoted = items[self._rng.integers(2)::2]
+                self.compactors[level] = keep
+                self.compactors[level + 1] = np.concatenate([self.compactors[level + 1], promoted])
+            level += 1
+
+    def update(self, values):
+        """Add an array of values; missing values are ignored."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.compactors[0] = np.concatenate([self.compactors[0], values])
+            self.n += len(values)
+            self._compress()
+        return self
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """Fold another sketch (e.g. of a different chunk) into this one."""
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append(np.empty(0))
+        for level, items in enumerate(other.compactors):
+            self.compactors[level] = np.concatenate([self.compactors[level], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    @property
+    def n_retained(self) -> int:
+        return sum(len(items) for items in self.compactors)
+
+    def quantile(self, q):
+        """Approximate q-quantile(s), linearly interpolated between neighbouring ranks."""
+        if self.n == 0:
+            raise ValueError('Cannot take a quantile of an empty sketch')
+        values = np.concatenate(self.compactors)
+        weights = np.concatenate([np.full(len(items), 2 ** level) for level, items in enumerate(self.compactors)])
+        order = np.argsort(values, kind='stable')
+        values, last_rank = values[order], np.cumsum(weights[order]) - 1
+
+        position = np.asarray(q, dtype=np.float64) * (last_rank[-1])
+        lower = np.floor(position)
+        at_lower = values[np.searchsorted(last_rank, lower)]
+        at_upper = values[np.searchsorted(last_rank, np.ceil(position))]
+        result = at_lower + (at_upper - at_lower) * (position - lower)
+        return float(result) if np.ndim(result) == 0 else result
+
+
+class OutlierFilter:
+    """
+    IQR outlier filter over several columns at once.
+
+    The bounds of all columns are computed in one pass over the same data
+    (exactly with fit(), or with mergeable quantile sketches over chunks
+    with fit_chunks()), then one combined mask drops every row outside the
+    bounds of any column. Rows are therefore dropped independently of the
+    column order. A row is kept when lower <= value <= upper, where upper is
+    Q3 + whisker * IQR and lower is lower_limit when given (the pipeline's
+    historical floor of 10), else Q1 - whisker * IQR.
+    """
+
+    def __init__(self, columns, whisker=1.5, lower_limit=None, sketch_k=200):
+        self.columns = list(columns)
+        self.whisker = whisker
+        self.lower_limit = lower_limit
+        self.sketch_k = sketch_k
+        self.bounds = {}
+        self.reset_counts()
+
+    def reset_counts(self):
+        self.n_rows = 0
+        self.n_kept = 0
+        self.dropped_by_column = {col: 0 for col in self.columns}
+
+    def _set_bounds(self, quartiles):
+        for col, (q1, q3) in quartiles.items():
+            iqr = q3 - q1
+            lower = self.lower_limit if self.lower_limit is not None else q1 - self.whisker * iqr
+            self.bounds[col] = (lower, q3 + self.whisker * iqr)
+        return self
+
+    def fit(self, df: pd.DataFrame) -> 'OutlierFilter':
+        """Exact bounds from a whole frame, all columns in one quantile call."""
+        cols = [col for col in self.columns if col in df.columns]
+        quartiles = df[cols].quantile([0.25, 0.75])
+        return self._set_bounds({col: (quartiles.at[0.25, col], quartiles.at[0.75, col]) for col in cols})
+
+    def fit_chunks(self, chunks) -> 'OutlierFilter':
+        """Approximate bounds from an iterable of frames, one sketch per column."""
+        sketches = {}
+        for chunk in chunks:
+            for col in self.columns:
+                if col in chunk.columns:
+                    sketches.setdefault(col, QuantileSketch(self.sketch_k)).update(chunk[col].to_numpy())
+        return self._set_bounds({col: tuple(sketch.quantile([0.25, 0.75])) for col, sketch in sketches.items()})
+
+    def mask(self, df: pd.DataFrame) -> np.ndarray:
+        """Rows within the bounds of every column; counts the rows each column rejects."""
+        cols = list(self.bounds)
+        values = df[cols].to_numpy(dtype=np.float64)
+        lower = np.array([self.bounds[col][0] for col in cols])
+        upper = np.array([self.bounds[col][1] for col in cols])
+        in_range = (values >= lower) & (values <= upper)
+        keep = in_range.all(axis=1)
+
+        for col, rejected in zip(cols, (~in_range).sum(axis=0).tolist()):
+            self.dropped_by_column[col] += rejected
+        self.n_rows += len(df)
+        self.n_kept += int(keep.sum())
+        return keep
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df[self.mask(df)]
+
+    def report(self) -> dict:
+        """Bounds and row counts per column (a row can fall outside several columns)."""
+        columns = {
+            col: {
+                'lower': float(self.bounds[col][0]), 'upper': float(self.bounds[col][1]),
+                'dropped': self.dropped_by_column[col], 'kept': self.n_rows - self.dropped_by_column[col]
+            }
+            for col in self.bounds
+        }
+        return {'rows': self.n_rows, 'kept': self.n_kept, 'dropped': self.n_rows - self.n_kept, 'columns': columns}
+
+    def log_report(self):
+        report = self.report()
+        logging.info(f"Outlier filter kept {report['kept']} of {report['rows']} rows")
+        for col, info in report['columns'].items():
+            logging.info(f"  {col}: [{info['lower']:g}, {info['upper']:g}] kept {info['kept']}, dropped {info['dropped']}")
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from src.logger import logging
+
+
+MANIFEST_FILE = 'manifest.json'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Odd 64-bit constant used to mix the occurrence number of duplicate rows into their key
+_OCCURRENCE_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def row_fingerprints(df: pd.DataFrame) -> np.ndarray:
+    """64-bit content hash of every row (column values only, not the index)."""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy(dtype=np.uint64)
+
+
+def row_keys(fingerprints: np.ndarray) -> np.ndarray:
+    """
+    Unique key per row: the fingerprint mixed with how many identical rows
+    came before it, so exact duplicates stay distinct records.
+    """
+    occurrence = pd.Series(fingerprints).groupby(fingerprints).cumcount().to_numpy(dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        return fingerprints ^ (occurrence * _OCCURRENCE_MIX)
+
+
+def file_signature(path: str) -> dict:
+    """Size, modification time and SHA-256 of a local input file (None for URLs)."""
+    if not os.path.isfile(path):
+        return None
+    stat = os.stat(path)
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+
+
+def signature_unchanged(path: str, signature) -> bool:
+    """Cheap check first (size and mtime), then the content hash."""
+    if signature is None or not os.path.isfile(path):
+        return False
+    stat = os.stat(path)
+    if stat.st_size != signature['size']:
+        return False
+    if stat.st_mtime_ns == signature['mtime_ns']:
+        return True
+    return file_signature(path)['sha256'] == signature['sha256']
+
+
+def is_partitioned(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+
+def partition_files(directory: str) -> list:
+    """Data files of a partitioned dataset, in partition order."""
+    dataset = PartitionedDataset(directory)
+    return [dataset.path(partition_id) for partition_id in dataset.partitions]
+
+
+class PartitionedDataset:
+    """
+    A directory of partition files plus a manifest.
+
+    The manifest records, for every partition, where its rows came from and
+    how many there are, and keeps the statistics frozen by the first run
+    (meta) so later partitions are processed exactly like the earlier ones.
+    The row keys of each partition are stored next to it as .keys.npy.
+    """
+
+    def __init__(self, directory, extension='.arrow'):
+        self.directory = directory
+        self.extension = extension
+        self.meta = {}
+        self.inputs = {}
+        self.partitions = {}
+        self.next_id = 0
+
+        manifest_path = os.path.join(directory, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r') as file:
+                manifest = json.load(file)
+            self.extension = manifest['extension']
+            self.meta = manifest['meta']
+            self.inputs = manifest['inputs']
+            self.partitions = manifest['partitions']
+            self.next_id = manifest['next_id']
+
+    def path(self, partition_id) -> str:
+        return os.path.join(self.directory, partition_id + self.extension)
+
+    def keys_path(self, partition_id) -> str:
+        return os.path.join(self.directory, partition_id + '.keys.npy')
+
+    def new_partition(self) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        partition_id = f'part-{self.next_id:06d}'
+        self.next_id += 1
+        return partition_id
+
+    def add(self, partition_id, info: dict, keys=None):
+        info = dict(info, created=time.time())
+        if keys is not None:
+            np.save(self.keys_path(partition_id), np.sort(keys))
+        self.partitions[partition_id] = info
+
+    def keys(self, partition_id) -> np.ndarray:
+        path = self.keys_path(partition_id)
+        return np.load(path) if os.path.exists(path) else np.empty(0, dtype=np.uint64)
+
+    def remove(self, partition_id):
+        info = self.partitions.pop(partition_id, None)
+        for path in (self.path(partition_id), self.keys_path(partition_id)):
+            if os.path.exists(path):
+                os.remove(path)
+        logging.info(f'Removed partition {partition_id} from {self.directory}')
+        return info
+
+    def save(self):
+        """Write the manifest atomically."""
+        os.makedirs(self.directory, exist_ok=True)
+        manifest = {
+            'extension': self.extension, 'meta': self.meta, 'inputs': self.inputs,
+            'partitions': self.partitions, 'next_id': self.next_id
+        }
+        tmp_path = os.path.join(self.directory, MANIFEST_FILE + '.tmp')
+        with open(tmp_path, 'w') as file:
+            json.dump(manifest, file, indent=4)
+        os.replace(tmp_path, os.path.join(self.directory, MANIFEST_FILE))
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from sklearn.model_selection import train_test_split
+from src.logger import logging
+from src.features.build_features import TARGET_COLUMN
+from src.data.columnar import file_format, iter_frames, read_frame, read_table
+from src.data.partitions import PartitionedDataset, is_partitioned, partition_files
+
+SPLIT_META_FILE = 'split.json'
+SUBSETS = ('train', 'test')
+
+
+def target_digest(y: np.ndarray) -> str:
+    """SHA-256 of the target column, used to tell whether a split still matches its dataset."""
+    return hashlib.sha256(np.ascontiguousarray(y).tobytes()).hexdigest()
+
+
+def read_target(dataset: str) -> np.ndarray:
+    """The target column only (a zero-copy memory-mapped read for Arrow datasets)."""
+    if is_csv(dataset):
+        return read_frame(dataset, [TARGET_COLUMN])[TARGET_COLUMN].to_numpy()
+    return read_table(dataset, columns=[TARGET_COLUMN]).column(TARGET_COLUMN).to_numpy()
+
+
+def split_indices(n_rows, test_size, random_state, stratify=None):
+    """
+    Shuffled train and test row positions. Without stratify these are the
+    rows train_test_split picks for the frame itself, in the same order.
+    """
+    return train_test_split(np.arange(n_rows), test_size=test_size, random_state=random_state, stratify=stratify)
+
+
+def partition_ranges(dataset: str) -> dict:
+    """Row range [start, stop) and creation time of every partition, in the order read_table concatenates them."""
+    partitions = PartitionedDataset(dataset).partitions
+    ranges, start = {}, 0
+    for partition_id, info in partitions.items():
+        # Interim partitions hold only the rows the outlier filter kept
+        stop = start + info.get('kept', info['rows'])
+        ranges[partition_id] = {'start': start, 'stop': stop, 'created': info['created']}
+        start = stop
+    return ranges
+
+
+def partition_split_indices(ranges: dict, test_size, random_state, y=None):
+    """
+    Split every partition on its own with the same seed, so a partition's
+    rows keep their side of the split when later partitions are added.
+    """
+    train, test = [], []
+    for part in ranges.values():
+        stratify = None if y is None else y[part['start']:part['stop']]
+        train_idx, test_idx = split_indices(part['stop'] - part['start'], test_size, random_state, stratify)
+        train.append(train_idx + part['start'])
+        test.append(test_idx + part['start'])
+    return np.concatenate(train), np.concatenate(test)
+
+
+def save_split(dataset: str, split_dir: str, test_size=0.2, random_state=42, stratify=False, y=None,
+               by_partition=False) -> dict:
+    """
+    Split a dataset into train and test rows and save only the row positions
+    (train.npy, test.npy) plus split.json, instead of copies of the data.
+    Only the target column is read (or taken from y when the dataset is
+    already in memory), so re-splitting costs milliseconds. With
+    by_partition, a partitioned dataset is split partition by partition and
+    split.json records the row range of each one.
+    """
+    try:
+        start = time.perf_counter()
+        y = read_target(dataset) if y is None else np.asarray(y)
+        ranges = partition_ranges(dataset) if by_partition and is_partitioned(dataset) else None
+        if ranges is None:
+            train_idx, test_idx = split_indices(len(y), test_size, random_state, y if stratify else None)
+        else:
+            train_idx, test_idx = partition_split_indices(ranges, test_size, random_state, y if stratify else None)
+
+        os.makedirs(split_dir, exist_ok=True)
+        for subset, indices in zip(SUBSETS, (train_idx, test_idx)):
+            np.save(os.path.join(split_dir, subset + '.npy'), indices.astype(np.int64))
+        meta = {
+            'dataset': dataset,
+            'rows': int(len(y)),
+            'target_sha256': target_digest(y),
+            'test_size': test_size,
+            'random_state': random_state,
+            'stratify': bool(stratify),
+            'train_rows': int(len(train_idx)),
+            'test_rows': int(len(test_idx)),
+            'test_positive_rate': float(y[test_idx].mean()) if len(test_idx) else 0.0,
+        }
+        if ranges is not None:
+            meta['partitions'] = ranges
+        with open(os.path.join(split_dir, SPLIT_META_FILE), 'w') as file:
+            json.dump(meta, file, indent=4)
+        logging.info(f"Split {meta['rows']} rows into {meta['train_rows']} train / {meta['test_rows']} test "
+                     f"(stratify={meta['stratify']}) in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return meta
+    except Exception as e:
+        logging.error(f'Error occurred while splitting {dataset}: {e}')
+        raise
+
+
+def load_split_meta(split_dir: str) -> dict:
+    with open(os.path.join(split_dir, SPLIT_META_FILE), 'r') as file:
+        return json.load(file)
+
+
+def check_split(meta: dict, y: np.ndarray, source: str):
+    """Raise if the split was not made on this data (different row count or target column)."""
+    if len(y) != meta['rows'] or target_digest(y) != meta['target_sha256']:
+        raise ValueError(f'The split was made on a different version of {source}; split it again')
+
+
+def load_split_indices(split_dir: str, subset: str, dataset: str = None) -> np.ndarray:
+    """Memory-mapped row positions of one subset; with dataset given, checks the split was made on it."""
+    if subset not in SUBSETS:
+        raise ValueError(f"Unknown subset '{subset}', expected one of {SUBSETS}")
+    if dataset is not None:
+        check_split(load_split_meta(split_dir), read_target(dataset), dataset)
+    return np.load(os.path.join(split_dir, subset + '.npy'), mmap_mode='r')
+
+
+def take_subset(df: pd.DataFrame, split_dir: str, subset: str) -> pd.DataFrame:
+    """Rows of one subset from the dataset already loaded in memory, as load_subset returns them."""
+    check_split(load_split_meta(split_dir), df[TARGET_COLUMN].to_numpy(), 'the data in memory')
+    return df.iloc[load_split_indices(split_dir, subset)].reset_index(drop=True)
+
+
+def is_csv(dataset: str) -> bool:
+    """Whether a dataset (file or partitioned directory) is stored as CSV, which cannot be memory-mapped."""
+    files = partition_files(dataset) if is_partitioned(dataset) else [dataset]
+    return bool(files) and file_format(files[0]) == 'csv'
+
+
+def take_rows(dataset: str, indices, columns=None) -> pd.DataFrame:
+    """Rows at these positions, gathered from the memory-mapped dataset."""
+    if is_csv(dataset):
+        return read_frame(dataset, columns).iloc[indices].reset_index(drop=True)
+    return read_table(dataset, columns).take(pa.array(indices)).to_pandas(split_blocks=True)
+
+
+def iter_rows(dataset: str, indices, chunk_size: int, columns=None):
+    """
+    Frames of at most chunk_size of the rows at these positions. Columnar
+    datasets are gathered a chunk of positions at a time, in the given
+    order. A CSV dataset is read once, in chunk_size-row frames that keep
+    only their selected rows, so its rows come in file order.
+    """
+    indices = np.asarray(indices)
+    if is_csv(dataset):
+        wanted, offset = np.sort(indices), 0
+        for frame in iter_frames(dataset, chunk_size, columns):
+            start, stop = np.searchsorted(wanted, [offset, offset + len(frame)])
+            if stop > start:
+                yield frame.iloc[wanted[start:stop] - offset].reset_index(drop=True)
+            offset += len(frame)
+        return
+    for start in range(0, len(indices), chunk_size):
+        yield take_rows(dataset, indices[start:start + chunk_size], columns)
+
+
+def load_subset(dataset: str, split_dir: str, subset: str, columns=None) -> pd.DataFrame:
+    """
+    Rows of one subset, in split order, gathered from the memory-mapped
+    dataset: only the selected rows (and columns) are copied.
+    """
+    try:
+        df = take_rows(dataset, load_split_indices(split_dir, subset, dataset), columns)
+        logging.info(f'Loaded {len(df)} {subset} rows of {dataset}')
+        return df
+    except Exception as e:
+        logging.error(f'Error occurred while loading the {subset} split of {dataset}: {e}')
+        raise
@@ -0,0 +1,305 @@
+import json
+import math
+import numpy as np
+import pandas as pd
+from src.logger import logging
+
+
+TARGET_COLUMN = 'Has_Asthma'
+
+# Plain numeric and ordinal-encoded columns, in the order the pipeline emits them
+BASE_COLUMNS = [
+    'Age', 'BMI', 'Family_History', 'Air_Pollution_Level', 'Physical_Activity_Level',
+    'Occupation_Type', 'Medication_Adherence', 'Number_of_ER_Visits',
+    'Peak_Expiratory_Flow', 'FeNO_Level'
+]
+
+ORDINAL_MAPS = {
+    'Air_Pollution_Level': {'Low': 0, 'Moderate': 1, 'High': 2},
+    'Physical_Activity_Level': {'Sedentary': 0, 'Moderate': 1, 'Active': 2},
+    'Occupation_Type': {'Indoor': 0, 'Outdoor': 1}
+}
+
+ONEHOT_COLUMNS = ['Gender', 'Smoking_Status', 'Allergies', 'Comorbidities']
+
+# Columns whose missing values are filled with the training mode
+FILLNA_COLUMNS = ['Allergies', 'Comorbidities']
+
+# Raw values treated as missing (mirrors what pd.read_csv turns into NaN)
+MISSING_VALUES = {'', 'None', 'NA', 'N/A', 'NaN', 'nan', 'null', 'NULL'}
+
+# Vocabulary of the currently deployed model, used when no fitted encoder is available
+DEFAULT_CATEGORIES = {
+    'Gender': ['Female', 'Male', 'Other'],
+    'Smoking_Status': ['Current', 'Former', 'Never'],
+    'Allergies': ['Dust', 'Multiple', 'Pets', 'Pollen'],
+    'Comorbidities': ['Both', 'Diabetes', 'Hypertension']
+}
+DEFAULT_FILL_VALUES = {'Allergies': 'Dust', 'Comorbidities': 'Diabetes'}
+
+# Narrowest safe dtype of every encoded column; one-hot indicators are ONEHOT_DTYPE.
+# The measurements have at most 4 significant digits, well within float32.
+FEATURE_DTYPES = {
+    'Age': np.int16,
+    'BMI': np.float32,
+    'Family_History': np.uint8,
+    'Air_Pollution_Level': np.uint8,
+    'Physical_Activity_Level': np.uint8,
+    'Occupation_Type': np.uint8,
+    'Medication_Adherence': np.float32,
+    'Number_of_ER_Visits': np.int16,
+    'Peak_Expiratory_Flow': np.float32,
+    'FeNO_Level': np.float32,
+    TARGET_COLUMN: np.uint8,
+}
+ONEHOT_DTYPE = np.uint8
+# Dtype of the feature matrices given to the model; scikit-learn trees split on float32 anyway
+MATRIX_DTYPE = np.float32
+
+
+def is_missing(value) -> bool:
+    """Return True for None, NaN and the usual missing-value strings."""
+    if value is None:
+        return True
+    if isinstance(value, float):
+        return math.isnan(value)
+    return isinstance(value, str) and value.strip() in MISSING_VALUES
+
+
+def column_dtype(col) -> np.dtype:
+    return np.dtype(FEATURE_DTYPES.get(col, ONEHOT_DTYPE))
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cast an encoded frame to the declared column dtypes.
+
+    Raises ValueError instead of silently changing a value: missing values,
+    fractions or out-of-range numbers in an integer column, and numbers too
+    large for float32.
+    """
+    if all(df[col].dtype == column_dtype(col) for col in df.columns):
+        return df
+    columns = {}
+    for col in df.columns:
+        dtype = column_dtype(col)
+        values = df[col].to_numpy()
+        if values.dtype == dtype:
+            columns[col] = values
+            continue
+        with np.errstate(invalid='ignore', over='ignore'):
+            cast = values.astype(dtype)
+            if dtype.kind == 'f':
+                lossy = np.isinf(cast) & ~np.isinf(values.astype(np.float64))
+            else:
+                lossy = cast != values
+        if lossy.any():
+            example = values[np.flatnonzero(lossy)[0]]
+            raise ValueError(f"Column '{col}' cannot be stored as {dtype} without changing values (e.g. {example!r})")
+        columns[col] = cast
+    return pd.DataFrame(columns, index=df.index)
+
+
+class FeatureEncoder:
+    """
+    Fitted encoder that maps raw patient records onto the model's feature layout.
+
+    The layout is BASE_COLUMNS followed by one one-hot block per column in
+    ONEHOT_COLUMNS, in the category order learned by fit(). The same object is
+    used by the DVC pipeline (DataFrame in, DataFrame out) and by the Flask app
+    (records in, preallocated NumPy matrix out, no pandas involved).
+    """
+
+    def __init__(self, categories: dict, fill_values: dict):
+        self.categories = {col: list(categories[col]) for col in ONEHOT_COLUMNS}
+        self.fill_values = dict(fill_values)
+
+        self.feature_names = list(BASE_COLUMNS)
+        self._onehot_index = {}
+        for col in ONEHOT_COLUMNS:
+            offset = len(self.feature_names)
+            self._onehot_index[col] = {cat: offset + i for i, cat in enumerate(self.categories[col])}
+            self.feature_names.extend(f'{col}_{cat}' for cat in self.categories[col])
+
+    @property
+    def n_features(self) -> int:
+        return len(self.feature_names)
+
+    @classmethod
+    def fit(cls, df: pd.DataFrame) -> 'FeatureEncoder':
+        """Learn fill values and one-hot vocabularies from a raw DataFrame."""
+        fill_values = {col: df[col].mode()[0] for col in FILLNA_COLUMNS}
+        categories = {}
+        for col in ONEHOT_COLUMNS:
+            values = df[col].fillna(fill_values[col]) if col in fill_values else df[col]
+            categories[col] = sorted(values.unique().tolist())
+        logging.info('Feature encoder fitted with %d features', sum(map(len, categories.values())) + len(BASE_COLUMNS))
+        return cls(categories, fill_values)
+
+    @classmethod
+    def from_counts(cls, counts: dict) -> 'FeatureEncoder':
+        """
+        Fit from per-column value counts ({column: {value: count}}, missing
+        values excluded), e.g. accumulated chunk by chunk over a large file.
+        Gives the same encoder as fit() on the full DataFrame: ties for the
+        mode go to the smallest value, as with Series.mode().
+        """
+        fill_values = {}
+        for col in FILLNA_COLUMNS:
+            if not counts[col]:
+                raise ValueError(f"Column '{col}' has no values to take the mode of")
+            top = max(counts[col].values())
+            fill_values[col] = min(value for value, count in counts[col].items() if count == top)
+
+        categories = {}
+        for col in ONEHOT_COLUMNS:
+            values = set(counts[col])
+            if col in fill_values:
+                values.add(fill_values[col])
+            categories[col] = sorted(values)
+        logging.info('Feature encoder fitted with %d features', sum(map(len, categories.values())) + len(BASE_COLUMNS))
+        return cls(categories, fill_values)
+
+    @classmethod
+    def default(cls) -> 'FeatureEncoder':
+        return cls(DEFAULT_CATEGORIES, DEFAULT_FILL_VALUES)
+
+    # --------------------------------------------------------------
+    # DataFrame path (training pipeline)
+    # --------------------------------------------------------------
+    def fill_missing(self, df: pd.DataFrame) -> pd.DataFrame:
+        for col, value in self.fill_values.items():
+            if col in df.columns:
+                df[col] = df[col].fillna(value)
+        return df
+
+    def encode_ordinal(self, df: pd.DataFrame) -> pd.DataFrame:
+        for col, mapping in ORDINAL_MAPS.items():
+            if col in df.columns:
+                df[col] = df[col].map(mapping)
+            else:
+                logging.warning(f"Column '{col}' not found in DataFrame. Skipping.")
+        return df
+
+    def encode_onehot(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Replace the categorical columns with their one-hot blocks, appended at the end.
+
+        Every column is factorized once (one hashing pass), its few distinct
+        values are looked up in the fitted vocabulary, and all blocks are
+        filled with a single scatter into one preallocated matrix. Unknown
+        and missing values get no indicator (handle_unknown='ignore').
+        """
+        cols = [col for col in ONEHOT_COLUMNS if col in df.columns]
+        names = [f'{col}_{cat}' for col in cols for cat in self.categories[col]]
+        block = np.zeros((len(df), len(names)), dtype=ONEHOT_DTYPE)
+
+        row_starts = np.arange(len(df), dtype=np.intp) * len(names)
+        positions, offset = [], 0
+        for col in cols:
+            codes, uniques = pd.factorize(df[col])
+            # Vocabulary position of every distinct value; the trailing -1 catches missing values (code -1)
+            lookup = np.append(pd.Index(self.categories[col]).get_indexer(uniques), -1)
+            codes = lookup[codes]
+            known = codes >= 0
+            positions.append(row_starts[known] + offset + codes[known])
+            offset += len(self.categories[col])
+        if positions:
+            block.reshape(-1)[np.concatenate(positions)] = 1
+
+        encoded = pd.DataFrame(block, columns=names, index=df.index)
+        return pd.concat([df.drop(columns=cols), encoded], axis=1)
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Encode a raw DataFrame into the compact dtypes; the target is passed through."""
+        df = self.fill_missing(df)
+        df = self.encode_onehot(df)
+        return apply_schema(self.encode_ordinal(df))
+
+    # --------------------------------------------------------------
+    # Record path (serving hot path)
+    # --------------------------------------------------------------
+    def _encode_into(self, row: np.ndarray, record) -> None:
+        for j, col in enumerate(BASE_COLUMNS):
+            value = record[col]
+            mapping = ORDINAL_MAPS.get(col)
+            row[j] = mapping[value] if mapping is not None else float(value)
+
+        for col in ONEHOT_COLUMNS:
+            value = record.get(col)
+            if is_missing(value):
+                if col not in self.fill_values:
+                    raise ValueError(f"Missing value for '{col}'")
+                value = self.fill_values[col]
+            j = self._onehot_index[col].get(value)
+            # Unknown categories leave the block all zero (handle_unknown='ignore')
+            if j is not None:
+                row[j] = 1.0
+
+    def transform_records(self, records, dtype=MATRIX_DTYPE):
+        """
+        Encode an iterable of raw records (dicts or form mappings) into one matrix.
+
+        :return: (matrix, row_index, errors) where matrix holds one row per valid
+                 record, row_index maps those rows back to input positions and
+                 errors maps the positions of invalid records to a message.
+        """
+        records = list(records)
+        matrix = np.zeros((len(records), self.n_features), dtype=dtype)
+        row_index, errors = [], {}
+
+        for i, record in enumerate(records):
+            row = matrix[len(row_index)]
+            try:
+                self._encode_into(row, record)
+            except Exception as e:
+                row[:] = 0
+                errors[i] = f'Invalid record: {e!r}'
+            else:
+                row_index.append(i)
+
+        return matrix[:len(row_index)], row_index, errors
+
+    def transform_record(self, record, dtype=MATRIX_DTYPE) -> np.ndarray:
+        """Encode a single record into a (1, n_features) matrix, raising on invalid input."""
+        matrix = np.zeros((1, self.n_features), dtype=dtype)
+        self._encode_into(matrix[0], record)
+        return matrix
+
+    # --------------------------------------------------------------
+    # Persistence
+    # --------------------------------------------------------------
+    def to_dict(self) -> dict:
+        return {
+            'feature_names': self.feature_names,
+            'categories': self.categories,
+            'fill_values': self.fill_values
+        }
+
+    def save(self, file_path: str) -> None:
+        """Save the fitted encoder as JSON."""
+        try:
+            with open(file_path, 'w') as file:
+                json.dump(self.to_dict(), file, indent=4)
+            logging.info('Feature encoder saved to %s', file_path)
+        except Exception as e:
+            logging.error('Error occurred while saving the feature encoder: %s', e)
+            raise
+
+    @classmethod
+    def load(cls, file_path: str) -> 'FeatureEncoder':
+        """Load a fitted encoder saved with save()."""
+        try:
+            with open(file_path, 'r') as file:
+                info = json.load(file)
+            encoder = cls(info['categories'], info['fill_values'])
+            if encoder.feature_names != info['feature_names']:
+                raise ValueError(f'Feature layout in {file_path} does not match its categories')
+            logging.info('Feature encoder loaded from %s', file_path)
+            return encoder
+        except FileNotFoundError:
+            logging.error('File not found: %s', file_path)
+            raise
+        except Exception as e:
+            logging.error('Unexpected error occurred while loading the feature encoder: %s', e)
+            raise
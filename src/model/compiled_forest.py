@@ -0,0 +1,319 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import sklearn
+from sklearn.utils.fixes import parse_version
+from src.logger import logging
+
+
+# Rows evaluated together; bounds the (rows x trees) node-index working set
+DEFAULT_CHUNK_SIZE = 4096
+
+# Drop finished (row, tree) pairs from the working set once this share of them sit at a leaf
+COMPACT_FRACTION = 0.7
+
+
+# Lookup tables derived from the node table; the block format stores them too so a
+# memory-mapped load computes (and allocates) nothing
+DERIVED_TABLES = ('children_flat', 'feature_index', 'is_leaf')
+# Every array a saved forest may hold (feature_names and the derived tables are optional)
+ARRAY_NAMES = ('feature', 'threshold', 'children', 'missing_left', 'leaf_proba', 'roots', 'classes', 'meta',
+               'feature_names') + DERIVED_TABLES
+
+
+# From scikit-learn 1.4 tree_.value holds class fractions and predict_proba returns
+# them as is; older versions hold weighted counts and normalise at predict time
+TREE_VALUES_ARE_FRACTIONS = parse_version(sklearn.__version__) >= parse_version('1.4')
+
+
+def _index_dtype(max_value: int):
+    """Smallest signed integer dtype that can hold max_value."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if max_value <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def float32_floor(values: np.ndarray) -> np.ndarray:
+    """
+    Largest float32 not greater than each float64 value.
+
+    For any float32 x, x <= t holds exactly when x <= float32_floor(t), so split
+    thresholds can be stored and compared in float32 without changing a decision.
+    """
+    rounded = values.astype(np.float32)
+    over = rounded.astype(np.float64) > values
+    rounded[over] = np.nextafter(rounded[over], np.float32(-np.inf))
+    return rounded
+
+
+class CompiledForest:
+    """
+    A trained RandomForestClassifier flattened into contiguous NumPy arrays.
+
+    All trees share one node table (feature, threshold, children, missing_left)
+    plus a per-node class-probability table that is only read at leaves.
+    Leaves point to themselves, so a batch walks every tree level by level
+    with a handful of vectorised gathers per step. Inputs are cast to float32
+    as in scikit-learn, thresholds are stored as their float32 floor, and leaf
+    probabilities are normalised and summed in estimator order exactly as
+    RandomForestClassifier does, so predict() and predict_proba() match the
+    original estimator bit for bit.
+    """
+
+    def __init__(self, feature, threshold, children, missing_left, leaf_proba, roots,
+                 classes, n_features, max_depth, feature_names=None, derived=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.missing_left = missing_left
+        self.leaf_proba = leaf_proba
+        self.roots = roots
+        self.classes_ = classes
+        self.n_features_in_ = int(n_features)
+        self.max_depth = int(max_depth)
+        self.feature_names_in_ = None if feature_names is None else np.asarray(feature_names, dtype=object)
+
+        # Derived lookup tables used by the traversal loop
+        derived = derived or self.derived_tables()
+        self._children_flat = derived['children_flat']
+        self._feature = derived['feature_index']
+        self._is_leaf = derived['is_leaf']
+        self._has_missing_left = bool(self.missing_left.any())
+
+    def derived_tables(self) -> dict:
+        return {
+            'children_flat': self.children.reshape(-1).astype(np.intp),
+            'feature_index': self.feature.astype(np.intp),
+            'is_leaf': self.children[:, 0] == np.arange(len(self.children)),
+        }
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.threshold)
+
+    @classmethod
+    def from_sklearn(cls, forest) -> 'CompiledForest':
+        """Compile a fitted sklearn RandomForestClassifier (single output)."""
+        if getattr(forest, 'n_outputs_', 1) != 1:
+            raise ValueError('Only single-output forests can be compiled')
+
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        n_nodes = sum(tree.node_count for tree in trees)
+        node_dtype = _index_dtype(n_nodes)
+        n_classes = len(forest.classes_)
+
+        feature = np.zeros(n_nodes, dtype=_index_dtype(forest.n_features_in_))
+        threshold = np.zeros(n_nodes, dtype=np.float64)
+        children = np.zeros((n_nodes, 2), dtype=node_dtype)
+        missing_left = np.zeros(n_nodes, dtype=np.bool_)
+        leaf_proba = np.zeros((n_nodes, n_classes), dtype=np.float64)
+        roots = np.zeros(len(trees), dtype=node_dtype)
+
+        offset = 0
+        for t, tree in enumerate(trees):
+            count = tree.node_count
+            nodes = np.arange(offset, offset + count)
+            is_leaf = tree.children_left == -1
+            roots[t] = offset
+
+            feature[offset:offset + count] = np.where(is_leaf, 0, tree.feature)
+            threshold[offset:offset + count] = np.where(is_leaf, 0.0, tree.threshold)
+            children[offset:offset + count, 0] = np.where(is_leaf, nodes, tree.children_left + offset)
+            children[offset:offset + count, 1] = np.where(is_leaf, nodes, tree.children_right + offset)
+            if hasattr(tree, 'missing_go_to_left'):
+                missing_left[offset:offset + count] = tree.missing_go_to_left.astype(bool) & ~is_leaf
+
+            # Same leaf probabilities as DecisionTreeClassifier.predict_proba
+            proba = tree.value[:, 0, :n_classes].astype(np.float64)
+            if not TREE_VALUES_ARE_FRACTIONS:
+                normalizer = proba.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                proba /= normalizer
+            leaf_proba[offset:offset + count] = proba
+
+            offset += count
+
+        compiled = cls(
+            feature, float32_floor(threshold), children, missing_left, leaf_proba, roots,
+            classes=np.asarray(forest.classes_),
+            n_features=forest.n_features_in_,
+            max_depth=max(tree.max_depth for tree in trees),
+            feature_names=getattr(forest, 'feature_names_in_', None)
+        )
+        logging.info(f'Compiled forest: {compiled.n_trees} trees, {compiled.n_nodes} nodes, depth {compiled.max_depth}')
+        return compiled
+
+    def _validate(self, X) -> np.ndarray:
+        # sklearn trees evaluate on float32 inputs
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f'Expected a 2D input with {self.n_features_in_} features, got shape {X.shape}')
+        return X
+
+    def _apply_chunk(self, X: np.ndarray) -> np.ndarray:
+        n_rows, n_trees = len(X), self.n_trees
+        flat = X.reshape(-1)
+        check_missing = self._has_missing_left and bool(np.isnan(X).any())
+
+        # Tree-major layout keeps consecutive lookups inside one tree's nodes
+        node = np.repeat(self.roots.astype(np.intp), n_rows)
+        row_offset = np.tile(np.arange(n_rows, dtype=np.intp) * self.n_features_in_, n_trees)
+        leaves, position = None, None
+
+        for _ in range(self.max_depth):
+            values = np.take(flat, row_offset + np.take(self._feature, node))
+            go_right = ~(values <= np.take(self.threshold, node))
+            if check_missing:
+                go_right &= ~(np.isnan(values) & np.take(self.missing_left, node))
+            node = np.take(self._children_flat, 2 * node + go_right)
+
+            at_leaf = np.take(self._is_leaf, node)
+            n_done = np.count_nonzero(at_leaf)
+            if n_done == len(node):
+                break
+            if n_done > COMPACT_FRACTION * len(node):
+                if leaves is None:
+                    leaves, position = node.copy(), np.arange(len(node))
+                else:
+                    leaves[position[at_leaf]] = node[at_leaf]
+                active = ~at_leaf
+                node, row_offset, position = node[active], row_offset[active], position[active]
+
+        if leaves is None:
+            leaves = node
+        else:
+            leaves[position] = node
+        return leaves.reshape(n_trees, n_rows).T
+
+    def apply(self, X, chunk_size=DEFAULT_CHUNK_SIZE) -> np.ndarray:
+        """Global leaf index reached in every tree, shape (n_samples, n_trees)."""
+        X = self._validate(X)
+        if len(X) <= chunk_size:
+            return self._apply_chunk(X)
+        return np.concatenate([self._apply_chunk(X[i:i + chunk_size]) for i in range(0, len(X), chunk_size)])
+
+    def predict_proba(self, X, chunk_size=DEFAULT_CHUNK_SIZE) -> np.ndarray:
+        X = self._validate(X)
+        proba = np.empty((len(X), len(self.classes_)), dtype=np.float64)
+        for start in range(0, len(X), chunk_size):
+            leaves = self._apply_chunk(X[start:start + chunk_size])
+            out = np.zeros((len(leaves), len(self.classes_)), dtype=np.float64)
+            # Accumulate in estimator order, as RandomForestClassifier does
+            for t in range(self.n_trees):
+                out += self.leaf_proba[leaves[:, t]]
+            out /= self.n_trees
+            proba[start:start + len(leaves)] = out
+        return proba
+
+    def predict(self, X, chunk_size=DEFAULT_CHUNK_SIZE) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X, chunk_size), axis=1), axis=0)
+
+    # --------------------------------------------------------------
+    # Persistence
+    # --------------------------------------------------------------
+    def to_arrays(self) -> dict:
+        arrays = {
+            'feature': self.feature, 'threshold': self.threshold, 'children': self.children,
+            'missing_left': self.missing_left, 'leaf_proba': self.leaf_proba, 'roots': self.roots,
+            'classes': self.classes_,
+            'meta': np.array([self.n_features_in_, self.max_depth], dtype=np.int64)
+        }
+        if self.feature_names_in_ is not None:
+            arrays['feature_names'] = self.feature_names_in_.astype(str)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays) -> 'CompiledForest':
+        n_features, max_depth = (int(v) for v in arrays['meta'])
+        has_derived = all(name in arrays for name in DERIVED_TABLES)
+        derived = {name: arrays[name] for name in DERIVED_TABLES} if has_derived else None
+        return cls(
+            arrays['feature'], arrays['threshold'], arrays['children'], arrays['missing_left'],
+            arrays['leaf_proba'], arrays['roots'], arrays['classes'], n_features, max_depth,
+            feature_names=arrays['feature_names'] if 'feature_names' in arrays else None,
+            derived=derived
+        )
+
+    def save(self, path: str, compress=False) -> None:
+        """
+        Save the compiled arrays. A path ending in .npz is a single archive
+        (compressed with compress, which then has to be read into memory);
+        any other path is a directory of uncompressed .npy blocks, one per
+        array including the derived lookup tables, that load() memory-maps.
+        The directory is written next to path and then swapped in, so blocks
+        of an earlier save never mix with the new ones and processes that
+        still map them keep reading the old, unchanged files.
+        """
+        try:
+            if path.endswith('.npz'):
+                (np.savez_compressed if compress else np.savez)(path, **self.to_arrays())
+            else:
+                arrays = {**self.to_arrays(), **{'children_flat': self._children_flat,
+                                                 'feature_index': self._feature, 'is_leaf': self._is_leaf}}
+                self._replace_directory(path, arrays)
+            logging.info('Compiled forest saved to %s', path)
+        except Exception as e:
+            logging.error('Error occurred while saving the compiled forest: %s', e)
+            raise
+
+    @staticmethod
+    def _replace_directory(path: str, arrays: dict) -> None:
+        path = os.path.abspath(path)
+        parent, name = os.path.split(path)
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f'.{name}.staging-', dir=parent)
+        retired = None
+        try:
+            os.chmod(staging, 0o755)
+            for array_name, array in arrays.items():
+                np.save(os.path.join(staging, array_name + '.npy'), np.ascontiguousarray(array))
+            if os.path.exists(path):
+                # A directory cannot be renamed over a non-empty one: move the old blocks aside first
+                retired = tempfile.mkdtemp(prefix=f'.{name}.old-', dir=parent)
+                os.replace(path, os.path.join(retired, name))
+            os.replace(staging, path)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            if retired is not None and not os.path.exists(path):
+                os.replace(os.path.join(retired, name), path)
+            raise
+        finally:
+            if retired is not None:
+                # Unlinked files stay readable for processes that map them
+                shutil.rmtree(retired, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: str, mmap_mode='r') -> 'CompiledForest':
+        """
+        Load a compiled forest saved with save(). The blocks of a directory
+        are memory-mapped (mmap_mode=None reads them into memory instead):
+        loading only reads the .npy headers, the pages are read from the OS
+        page cache on first use, and every process that maps the same files
+        shares them. An .npz archive is always read into memory.
+        """
+        try:
+            if os.path.isdir(path):
+                # Only the arrays save() writes: stray files in the directory are ignored
+                arrays = {
+                    name: np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+                    for name in ARRAY_NAMES if os.path.exists(os.path.join(path, name + '.npy'))
+                }
+                compiled = cls.from_arrays(arrays)
+            else:
+                with np.load(path, allow_pickle=False) as data:
+                    compiled = cls.from_arrays({name: data[name] for name in data.files})
+            logging.info('Compiled forest loaded from %s', path)
+            return compiled
+        except FileNotFoundError:
+            logging.error('File not found: %s', path)
+            raise
+        except Exception as e:
+            logging.error('Unexpected error occurred while loading the compiled forest: %s', e)
+            raise
@@ -0,0 +1,264 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import yaml
+from scipy import stats
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import KFold, StratifiedKFold
+from src.logger import logging
+from src.features.build_features import TARGET_COLUMN
+from src.data.columnar import dataset_path, interchange_format, log_memory
+from src.data.splits import load_subset, take_subset
+from src.model.metrics import BinaryMetrics
+from src.model.search import BASE_PARAMS
+
+SPLIT_DIR = './splited_data/split'
+CACHE_DIR = '.cv_cache'
+REPORT_PATH = 'reports/cv_metrics.json'
+TRACKING_URI = "http://127.0.0.1:5000"
+EXPERIMENT_NAME = 'dvc-pipeline-cv'
+
+# The training matrix of the current worker process, memory-mapped once by _init_worker
+_shared = {}
+
+
+def load_params(params_path: str) -> dict:
+    """Load parameters from a YAML file."""
+    try:
+        with open(params_path, 'r') as file:
+            params = yaml.safe_load(file)
+        logging.debug('Parameters retrieved from %s', params_path)
+        return params
+    except FileNotFoundError:
+        logging.error('File not found: %s', params_path)
+        raise
+    except yaml.YAMLError as e:
+        logging.error('YAML error: %s', e)
+        raise
+
+
+def _digest(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else json.dumps(part, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def data_digest(x: np.ndarray, y: np.ndarray, columns) -> str:
+    """SHA-256 of the training matrix, its column names and the target."""
+    return _digest(list(columns), np.ascontiguousarray(x).tobytes(), np.ascontiguousarray(y).tobytes())
+
+
+def fold_key(digest: str, n_folds: int, random_state: int, stratify: bool) -> str:
+    return _digest(digest, {'folds': n_folds, 'random_state': random_state, 'stratify': bool(stratify)})[:16]
+
+
+def params_key(model_params: dict, n_bins: int, calibration_bins: int) -> str:
+    return _digest({'model': model_params, 'n_bins': n_bins, 'calibration_bins': calibration_bins})[:16]
+
+
+def load_folds(cache_dir: str, key: str, y: np.ndarray, n_folds=5, random_state=42, stratify=True) -> list:
+    """
+    Paths of the validation row positions of every fold (fold-<i>.npy),
+    made once per data hash, fold count, seed and stratification and then
+    read from cache_dir/folds/<key>.
+    """
+    fold_dir = os.path.join(cache_dir, 'folds', key)
+    paths = [os.path.join(fold_dir, f'fold-{fold}.npy') for fold in range(n_folds)]
+    if all(os.path.exists(path) for path in paths):
+        logging.info(f'Reusing the cached folds {key}')
+        return paths
+
+    splitter = (StratifiedKFold if stratify else KFold)(n_splits=n_folds, shuffle=True, random_state=random_state)
+    os.makedirs(os.path.dirname(fold_dir), exist_ok=True)
+    # Published with an atomic rename, so an interrupted run never leaves a partial fold set
+    staging_dir = tempfile.mkdtemp(prefix='.staging-', dir=os.path.dirname(fold_dir))
+    try:
+        for fold, (_, val_idx) in enumerate(splitter.split(np.zeros(len(y)), y)):
+            np.save(os.path.join(staging_dir, f'fold-{fold}.npy'), np.sort(val_idx).astype(np.int64))
+        shutil.rmtree(fold_dir, ignore_errors=True)
+        os.rename(staging_dir, fold_dir)
+    except Exception:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    logging.info(f'Saved {n_folds} folds of {len(y)} rows as {key}')
+    return paths
+
+
+def _init_worker(x_path, y_path):
+    _shared.update(x=np.load(x_path, mmap_mode='r'), y=np.load(y_path, mmap_mode='r'))
+
+
+def evaluate_fold(fold: int, val_path: str, model_params: dict, n_bins=1000, calibration_bins=10) -> dict:
+    """Fit on every row outside the fold and score the fold's rows with the streaming metrics engine."""
+    x, y = _shared['x'], _shared['y']
+    val_idx = np.load(val_path)
+    train_mask = np.ones(len(y), dtype=bool)
+    train_mask[val_idx] = False
+    start = time.perf_counter()
+    clf = RandomForestClassifier(**{**BASE_PARAMS, **model_params}, n_jobs=1).fit(x[train_mask], y[train_mask])
+    fit_seconds = time.perf_counter() - start
+    evaluator = BinaryMetrics(n_bins, calibration_bins, clf.classes_).update(y[val_idx], clf.predict_proba(x[val_idx]))
+    return {'fold': fold, 'fit_seconds': fit_seconds, 'metrics': evaluator.metrics()}
+
+
+def cross_validate(x, y, model_params: dict, n_folds=5, random_state=42, stratify=True, max_workers=None,
+                   cache_dir=CACHE_DIR, n_bins=1000, calibration_bins=10) -> list:
+    """
+    Per-fold results of k-fold cross-validation of the forest on (x, y).
+
+    The fold index sets are cached by data hash and seed, so they stay the
+    same when only the model parameters change, and each fold's result is
+    cached under the folds and the parameters: a rerun with parameters seen
+    before reuses their results and only the missing folds are fitted.
+    Those run across a process pool that memory-maps one copy of the
+    matrix, each fold fitting single-threaded.
+    """
+    try:
+        start = time.perf_counter()
+        columns = list(getattr(x, 'columns', []))
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        y = np.asarray(y)
+        digest = data_digest(x, y, columns)
+        key = fold_key(digest, n_folds, random_state, stratify)
+        fold_paths = load_folds(cache_dir, key, y, n_folds, random_state, stratify)
+
+        result_dir = os.path.join(cache_dir, 'results', key, params_key(model_params, n_bins, calibration_bins))
+        result_paths = [os.path.join(result_dir, f'fold-{fold}.json') for fold in range(n_folds)]
+        results = {}
+        for fold, path in enumerate(result_paths):
+            if os.path.exists(path):
+                with open(path, 'r') as file:
+                    results[fold] = json.load(file)
+        missing = [fold for fold in range(n_folds) if fold not in results]
+        logging.info(f'Cross-validation: {n_folds - len(missing)} of {n_folds} folds cached, fitting {missing}')
+
+        if missing:
+            max_workers = min(max_workers or os.cpu_count() or 1, len(missing))
+            shared_dir = tempfile.mkdtemp(prefix='cv-')
+            try:
+                x_path, y_path = os.path.join(shared_dir, 'x.npy'), os.path.join(shared_dir, 'y.npy')
+                np.save(x_path, x)
+                np.save(y_path, y)
+                with ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=(x_path, y_path)) as pool:
+                    futures = [pool.submit(evaluate_fold, fold, fold_paths[fold], model_params, n_bins,
+                                           calibration_bins) for fold in missing]
+                    for future in futures:
+                        result = future.result()
+                        results[result['fold']] = result
+            finally:
+                shutil.rmtree(shared_dir, ignore_errors=True)
+            os.makedirs(result_dir, exist_ok=True)
+            for fold in missing:
+                with open(result_paths[fold], 'w') as file:
+                    json.dump(results[fold], file, indent=4)
+
+        logging.info(f'Cross-validation of {n_folds} folds took {time.perf_counter() - start:.1f}s')
+        return [results[fold] for fold in range(n_folds)]
+    except Exception as e:
+        logging.error(f'Error occurred during cross-validation: {e}')
+        raise
+
+
+def aggregate(fold_results: list, confidence=0.95) -> dict:
+    """
+    Mean, standard deviation and Student-t confidence interval of the mean
+    of every metric over the folds.
+    """
+    n_folds = len(fold_results)
+    t = stats.t.ppf((1 + confidence) / 2, n_folds - 1) if n_folds > 1 else float('nan')
+    summary = {}
+    for name in fold_results[0]['metrics']:
+        if name == 'rows':
+            continue
+        values = np.array([result['metrics'][name] for result in fold_results], dtype=np.float64)
+        mean = float(values.mean())
+        std = float(values.std(ddof=1)) if n_folds > 1 else 0.0
+        half_width = float(t * std / np.sqrt(n_folds))
+        summary[name] = {'mean': mean, 'std': std, 'ci_low': mean - half_width, 'ci_high': mean + half_width}
+    return summary
+
+
+def save_report(summary: dict, fold_results: list, confidence: float, file_path: str) -> None:
+    """Save the aggregated metrics and the per-fold results to a JSON file."""
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'w') as file:
+            json.dump({'confidence': confidence, 'metrics': summary, 'folds': fold_results}, file, indent=4)
+        logging.info(f'Cross-validation report saved to {file_path}')
+    except Exception as e:
+        logging.error(f'Unexpected error occurred while saving the cross-validation report: {e}')
+        raise
+
+
+def log_cv(summary: dict, model_params: dict, cv_params: dict, tracking_uri=TRACKING_URI,
+           experiment_name=EXPERIMENT_NAME) -> str:
+    """Log the aggregated metrics and the parameters to one MLflow run with a single log_batch call."""
+    from mlflow.entities import Metric, Param
+    from mlflow.tracking import MlflowClient
+
+    client = MlflowClient(tracking_uri)
+    experiment = client.get_experiment_by_name(experiment_name)
+    experiment_id = experiment.experiment_id if experiment else client.create_experiment(experiment_name)
+    timestamp = int(time.time() * 1000)
+    metrics = [Metric(f'{name}_{stat}', value, timestamp, 0)
+               for name, values in summary.items() for stat, value in values.items() if np.isfinite(value)]
+    params = [Param(name, str(value)) for name, value in {**BASE_PARAMS, **model_params, **cv_params}.items()]
+    run = client.create_run(experiment_id, run_name='cross-validation')
+    client.log_batch(run.info.run_id, metrics=metrics, params=params)
+    client.set_terminated(run.info.run_id)
+    logging.info(f'Logged {len(metrics)} cross-validation metrics to MLflow run {run.info.run_id}')
+    return run.info.run_id
+
+
+def run(params, fmt, df=None):
+    """
+    Cross-validate the model_building forest on the training rows of the
+    split (the test rows stay held out); df is the preprocessed data when it
+    is still in memory. Returns the aggregated metrics.
+    """
+    cv = params.get('cross_validation', {})
+    building = params.get('model_building', {})
+    dataset = dataset_path('./data/interim', 'preprocessed_data_2', fmt)
+    train = load_subset(dataset, SPLIT_DIR, 'train') if df is None else take_subset(df, SPLIT_DIR, 'train')
+    x = log_memory('cross-validation features', train.drop(columns=[TARGET_COLUMN]))
+    model_params = {'n_estimators': building.get('n_estimators', 100), **cv.get('model_params', {})}
+    cv_params = {'folds': cv.get('folds', 5), 'cv_random_state': cv.get('random_state', 42),
+                 'stratify': cv.get('stratify', True)}
+
+    fold_results = cross_validate(
+        x, train[TARGET_COLUMN], model_params, cv_params['folds'], cv_params['cv_random_state'],
+        cv_params['stratify'], cv.get('max_workers') or None, cv.get('cache_dir', CACHE_DIR),
+        cv.get('n_bins', 1000), cv.get('calibration_bins', 10)
+    )
+    confidence = cv.get('confidence', 0.95)
+    summary = aggregate(fold_results, confidence)
+    save_report(summary, fold_results, confidence, REPORT_PATH)
+    logging.info(', '.join(f"{name} {summary[name]['mean']:.4f} "
+                           f"[{summary[name]['ci_low']:.4f}, {summary[name]['ci_high']:.4f}]"
+                           for name in ('accuracy', 'f1', 'roc_auc')))
+    if cv.get('log_to_mlflow', True):
+        try:
+            log_cv(summary, model_params, cv_params)
+        except Exception as e:
+            # The aggregated metrics are in the report either way
+            logging.error('Failed to log the cross-validation to MLflow: %s', e)
+    return summary
+
+
+def main():
+    try:
+        run(load_params('params.yaml'), interchange_format())
+    except Exception as e:
+        logging.error('Failed to complete the cross-validation: %s', e)
+        print(f"Error: {e}")
+
+
+if __name__ == '__main__':
+    main()
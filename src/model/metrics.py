@@ -0,0 +1,195 @@
+import numpy as np
+from src.logger import logging
+
+# Probabilities are clipped to [eps, 1 - eps] for the log loss
+LOG_LOSS_EPS = np.finfo(np.float64).eps
+
+
+def threshold_metrics(tp, fp, fn, tn) -> dict:
+    """
+    Metrics of one confusion matrix. A ratio with a zero denominator is 0,
+    as scikit-learn's zero_division default reports it.
+    """
+    def ratio(num, den):
+        return float(num / den) if den else 0.0
+
+    precision, recall = ratio(tp, tp + fp), ratio(tp, tp + fn)
+    specificity = ratio(tn, tn + fp)
+    mcc_den = np.sqrt(float(tp + fp) * float(tp + fn) * float(tn + fp) * float(tn + fn))
+    return {
+        'accuracy': ratio(tp + tn, tp + fp + fn + tn),
+        'precision': precision,
+        'recall': recall,
+        'f1': ratio(2 * tp, 2 * tp + fp + fn),
+        'specificity': specificity,
+        'balanced_accuracy': (recall + specificity) / 2,
+        'mcc': ratio(float(tp) * tn - float(fp) * fn, mcc_den),
+    }
+
+
+class BinaryMetrics:
+    """
+    Streaming evaluation of a binary classifier in one pass.
+
+    update() takes one chunk of targets and predict_proba outputs and adds
+    it to a single confusion matrix of the model's own predictions (the
+    class with the highest probability, as predict() picks it) and to
+    histograms of the positive-class probability of positive and negative
+    rows, plus the sum of the probabilities in every bin. Memory is
+    O(n_bins) however many rows are added, and accumulators of different
+    chunks can be merged.
+
+    The threshold metrics come from the confusion matrix and equal
+    scikit-learn's. ROC and precision-recall curves, their areas and the
+    reliability (calibration) curve come from the histograms, with the
+    thresholds at the bin edges: scores in one bin count as tied, so the
+    areas are those of the scores rounded down to 1 / n_bins. The Brier
+    score and log loss are accumulated exactly.
+    """
+
+    def __init__(self, n_bins=1000, calibration_bins=10, classes=(0, 1)):
+        if n_bins % calibration_bins:
+            raise ValueError('n_bins must be a multiple of calibration_bins')
+        self.n_bins = n_bins
+        self.calibration_bins = calibration_bins
+        self.classes = tuple(classes)
+        self.confusion = np.zeros((2, 2), dtype=np.int64)
+        self.positive_hist = np.zeros(n_bins, dtype=np.int64)
+        self.negative_hist = np.zeros(n_bins, dtype=np.int64)
+        self.proba_sum = np.zeros(n_bins, dtype=np.float64)
+        self.squared_error = 0.0
+        self.log_loss_sum = 0.0
+
+    @property
+    def n_rows(self) -> int:
+        return int(self.confusion.sum())
+
+    def update(self, y_true, proba):
+        """Add a chunk: the targets and the (n_rows, 2) predict_proba output for them."""
+        proba = np.asarray(proba, dtype=np.float64)
+        if proba.ndim != 2 or proba.shape[1] != 2:
+            raise ValueError(f'Expected (n_rows, 2) class probabilities, got shape {proba.shape}')
+        actual = np.asarray(y_true).ravel() == self.classes[1]
+        if len(actual) != len(proba):
+            raise ValueError(f'{len(actual)} targets for {len(proba)} predictions')
+        predicted = np.argmax(proba, axis=1) == 1
+        self.confusion += np.bincount(2 * actual + predicted, minlength=4).reshape(2, 2)
+
+        score = proba[:, 1]
+        bins = np.minimum((score * self.n_bins).astype(np.intp), self.n_bins - 1)
+        self.positive_hist += np.bincount(bins[actual], minlength=self.n_bins)
+        self.negative_hist += np.bincount(bins[~actual], minlength=self.n_bins)
+        self.proba_sum += np.bincount(bins, weights=score, minlength=self.n_bins)
+
+        self.squared_error += float(np.sum((score - actual) ** 2))
+        clipped = np.clip(score, LOG_LOSS_EPS, 1 - LOG_LOSS_EPS)
+        self.log_loss_sum -= float(np.sum(np.where(actual, np.log(clipped), np.log1p(-clipped))))
+        return self
+
+    def merge(self, other: 'BinaryMetrics') -> 'BinaryMetrics':
+        """Fold another accumulator (e.g. of a different chunk) into this one."""
+        if (other.n_bins, other.calibration_bins, other.classes) != (self.n_bins, self.calibration_bins, self.classes):
+            raise ValueError('Only accumulators with the same bins and classes can be merged')
+        self.confusion += other.confusion
+        self.positive_hist += other.positive_hist
+        self.negative_hist += other.negative_hist
+        self.proba_sum += other.proba_sum
+        self.squared_error += other.squared_error
+        self.log_loss_sum += other.log_loss_sum
+        return self
+
+    def _cumulative(self):
+        """True and false positives when scores from each bin edge up count as positive, highest edge first."""
+        tp = np.concatenate([[0], np.cumsum(self.positive_hist[::-1])])
+        fp = np.concatenate([[0], np.cumsum(self.negative_hist[::-1])])
+        thresholds = np.arange(self.n_bins, -1, -1) / self.n_bins
+        # Edges with an empty bin below them repeat the previous point
+        keep = np.concatenate([[True], (self.positive_hist[::-1] + self.negative_hist[::-1]) > 0])
+        return tp[keep], fp[keep], thresholds[keep]
+
+    def roc_curve(self) -> dict:
+        tp, fp, thresholds = self._cumulative()
+        return {
+            'fpr': (fp / max(fp[-1], 1)).tolist(),
+            'tpr': (tp / max(tp[-1], 1)).tolist(),
+            'thresholds': thresholds.tolist(),
+        }
+
+    def pr_curve(self) -> dict:
+        tp, fp, thresholds = self._cumulative()
+        tp, fp, thresholds = tp[1:], fp[1:], thresholds[1:]
+        return {
+            'precision': (tp / np.maximum(tp + fp, 1)).tolist(),
+            'recall': (tp / max(tp[-1], 1) if len(tp) else tp).tolist(),
+            'thresholds': thresholds.tolist(),
+        }
+
+    def roc_auc(self) -> float:
+        tp, fp, _ = self._cumulative()
+        if tp[-1] == 0 or fp[-1] == 0:
+            return float('nan')
+        # Trapezoids count a bin shared by both classes as half right, like tied scores
+        return float(np.sum((fp[1:] - fp[:-1]) * (tp[1:] + tp[:-1])) / (2 * tp[-1] * fp[-1]))
+
+    def average_precision(self) -> float:
+        """Precision at each threshold weighted by the recall it adds, as average_precision_score."""
+        tp, fp, _ = self._cumulative()
+        if tp[-1] == 0:
+            return float('nan')
+        precision = tp[1:] / (tp[1:] + fp[1:])
+        return float(np.sum(np.diff(tp) / tp[-1] * precision))
+
+    def calibration(self) -> dict:
+        """Mean predicted probability and share of positives per calibration bin (empty bins left out)."""
+        group = self.n_bins // self.calibration_bins
+        positives = self.positive_hist.reshape(-1, group).sum(axis=1)
+        counts = positives + self.negative_hist.reshape(-1, group).sum(axis=1)
+        proba_sum = self.proba_sum.reshape(-1, group).sum(axis=1)
+        filled = counts > 0
+        return {
+            'mean_predicted': (proba_sum[filled] / counts[filled]).tolist(),
+            'fraction_positive': (positives[filled] / counts[filled]).tolist(),
+            'count': counts[filled].tolist(),
+        }
+
+    def expected_calibration_error(self) -> float:
+        curve = self.calibration()
+        counts = np.asarray(curve['count'])
+        gaps = np.abs(np.asarray(curve['fraction_positive']) - np.asarray(curve['mean_predicted']))
+        return float(np.sum(counts * gaps) / max(counts.sum(), 1))
+
+    def at_threshold(self, threshold) -> dict:
+        """Threshold metrics when a score from the bin edge at or below threshold up counts as positive."""
+        edge = int(np.clip(np.floor(threshold * self.n_bins), 0, self.n_bins))
+        tp, fp = int(self.positive_hist[edge:].sum()), int(self.negative_hist[edge:].sum())
+        fn, tn = int(self.positive_hist[:edge].sum()), int(self.negative_hist[:edge].sum())
+        return threshold_metrics(tp, fp, fn, tn)
+
+    def metrics(self) -> dict:
+        """Every scalar metric, for metrics.json."""
+        if self.n_rows == 0:
+            raise ValueError('No rows have been evaluated')
+        (tn, fp), (fn, tp) = self.confusion.tolist()
+        return {
+            **threshold_metrics(tp, fp, fn, tn),
+            'roc_auc': self.roc_auc(),
+            'average_precision': self.average_precision(),
+            'brier': self.squared_error / self.n_rows,
+            'log_loss': self.log_loss_sum / self.n_rows,
+            'expected_calibration_error': self.expected_calibration_error(),
+            'rows': self.n_rows,
+        }
+
+    def curves(self) -> dict:
+        (tn, fp), (fn, tp) = self.confusion.tolist()
+        return {
+            'confusion_matrix': {'tn': tn, 'fp': fp, 'fn': fn, 'tp': tp},
+            'roc': self.roc_curve(),
+            'pr': self.pr_curve(),
+            'calibration': self.calibration(),
+        }
+
+    def log_report(self):
+        metrics = self.metrics()
+        logging.info(f"Evaluated {metrics['rows']} rows: accuracy {metrics['accuracy']:.4f}, "
+                     f"f1 {metrics['f1']:.4f}, ROC AUC {metrics['roc_auc']:.4f}, brier {metrics['brier']:.4f}")
@@ -1,18 +1,49 @@
 import numpy as np
 import pandas as pd
 import pickle
-from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 import yaml
 from src.logger import logging
+from src.features.build_features import FeatureEncoder, TARGET_COLUMN
+from src.model.compiled_forest import CompiledForest
+from src.model.search import BASE_PARAMS, log_search, save_search_report, search_hyperparameters
+from src.model.warm_start import (
+    forest_state, load_local_forest, load_registered_forest, save_forest_state, train_incremental
+)
+from src.data.columnar import dataset_path, interchange_format, log_memory, read_frame
+from src.data.partitions import is_partitioned
+from src.data.splits import load_subset, partition_ranges, save_split, take_subset
 import os
+import time
+
+SPLIT_DIR = './splited_data/split'
+SEARCH_REPORT = 'reports/search.json'
+MODEL_PATH = 'models/model.pkl'
+FOREST_STATE_PATH = 'models/forest_state.json'
+
+
+def load_params(params_path: str) -> dict:
+    """Load parameters from a YAML file."""
+    try:
+        with open(params_path, 'r') as file:
+            params = yaml.safe_load(file)
+        logging.debug('Parameters retrieved from %s', params_path)
+        return params
+    except FileNotFoundError:
+        logging.error('File not found: %s', params_path)
+        raise
+    except yaml.YAMLError as e:
+        logging.error('YAML error: %s', e)
+        raise
+    except Exception as e:
+        logging.error('Unexpected error: %s', e)
+        raise
 
 
 def load_data(file_path: str) -> pd.DataFrame:
-    """Load data from a CSV file."""
+    """Load data from an intermediate file (Arrow, Parquet or CSV)."""
     try:
-        df = pd.read_csv(file_path)
-        logging.info('Data loaded from %s', file_path)
+        df = read_frame(file_path)
         return df
     except pd.errors.ParserError as e:
         logging.error('Failed to parse the CSV file: %s', e)
@@ -21,38 +52,44 @@ def load_data(file_path: str) -> pd.DataFrame:
         logging.error('Unexpected error occurred while loading the data: %s', e)
         raise
 
-def split_data(df, test_size, random_state):
+def split_data(dataset, split_dir, test_size, random_state, stratify=False, df=None, by_partition=False):
+    """
+    Save the train/test split as row positions over the dataset (no copies
+    of the data) and return the training features and target, sliced from
+    df when the dataset is already in memory.
+    """
     try:
         logging.info('Splitting data ......')
-
-        # Split features and target
-        x = df.drop(columns=['Has_Asthma'])
-        y = df['Has_Asthma']
-        x_train, x_test, y_train, y_test = train_test_split(x, y, test_size=test_size, random_state=random_state)
-
-        # Ensure the folder exists
-        folder_path = os.path.join(os.getcwd(), 'splited_data')
-        os.makedirs(folder_path, exist_ok=True)
-
-        # Save the splits to CSV
-        x_train.to_csv(os.path.join(folder_path, 'x_train.csv'), index=False)
-        x_test.to_csv(os.path.join(folder_path, 'x_test.csv'), index=False)
-        y_train.to_csv(os.path.join(folder_path, 'y_train.csv'), index=False)
-        y_test.to_csv(os.path.join(folder_path, 'y_test.csv'), index=False)
-
-        logging.info(f'Data splits saved in {folder_path}')
-
-        return x_train, x_test, y_train, y_test
+        if df is None:
+            save_split(dataset, split_dir, test_size, random_state, stratify, by_partition=by_partition)
+            train = load_subset(dataset, split_dir, 'train')
+        else:
+            save_split(dataset, split_dir, test_size, random_state, stratify, y=df[TARGET_COLUMN].to_numpy())
+            train = take_subset(df, split_dir, 'train')
+        x_train = train.drop(columns=[TARGET_COLUMN])
+        y_train = train[TARGET_COLUMN]
+        logging.info(f'Data split saved in {split_dir}')
+        return x_train, y_train
 
     except Exception as e:
         logging.error(f'The error is {e}')
         raise
         
-def training_model(x_train, y_train):
+def check_feature_layout(x, encoder):
+    """Make sure the training columns match the layout the serving encoder produces."""
+    if list(x.columns) != encoder.feature_names:
+        raise ValueError(
+            f'Training columns {list(x.columns)} do not match the encoder layout {encoder.feature_names}'
+        )
+
+def training_model(x_train, y_train, n_jobs=None, **params):
+    """Fit the forest; n_jobs trees are built in parallel (-1 uses every core)."""
     try:
-     logging.info('Training model ...... ')
-     clf = RandomForestClassifier(n_estimators=100, random_state=42)
+     logging.info(f'Training model ({params or "default settings"}, n_jobs={n_jobs}) ...... ')
+     clf = RandomForestClassifier(**{**BASE_PARAMS, **params}, n_jobs=n_jobs)
      clf.fit(x_train, y_train)
+     # The saved and logged model must not carry the training host's parallelism into serving
+     clf.set_params(n_jobs=None)
      return clf
     except Exception as e:
         logging.error('The error is: %s', e)
@@ -69,20 +106,98 @@ def save_model(model, file_path: str) -> None:
         logging.error('Error occurred while saving the model: %s', e)
         raise
 
+def save_artifacts(clf, state):
+    save_model(clf, MODEL_PATH)
+    # Uncompressed .npy blocks the serving processes memory-map and share
+    CompiledForest.from_sklearn(clf).save('models/compiled_forest')
+    save_forest_state(state, FOREST_STATE_PATH)
+    logging.info('model saved successufullly !')
+
+
+def grow_current_model(params, dataset):
+    """
+    Incremental mode: split the partitioned dataset partition by partition
+    and grow the current model with the partitions it has not seen.
+    Returns the grown model, or None when it has to be trained from scratch.
+    """
+    incremental = params['incremental']
+    save_split(dataset, SPLIT_DIR, params.get('test_size', 0.2), params.get('random_state', 42),
+               params.get('stratify', False), by_partition=True)
+    if incremental.get('base', 'local') == 'registry':
+        try:
+            clf, state = load_registered_forest(stage=incremental.get('registry_stage', 'Production'))
+        except Exception as e:
+            logging.error('Failed to load the registered model, training from scratch: %s', e)
+            return None
+    else:
+        clf, state = load_local_forest(MODEL_PATH, FOREST_STATE_PATH)
+    if clf is None:
+        logging.info('No model to grow yet, training from scratch')
+        return None
+    clf, state = train_incremental(
+        clf, state, dataset, SPLIT_DIR, partition_ranges(dataset), incremental.get('new_trees', 20),
+        incremental.get('max_trees', 100), incremental.get('retire', 'oldest'), params.get('n_jobs')
+    )
+    if clf is not None:
+        save_artifacts(clf, state)
+    return clf
+
+
+def run(params, fmt, df=None):
+    """
+    Run the stage with already loaded params; df is the preprocessed data
+    when it is still in memory. Returns the trained model.
+    """
+    dataset = dataset_path('./data/interim', 'preprocessed_data_2', fmt)
+    incremental = params.get('incremental', {}).get('enabled', False)
+    if incremental and not is_partitioned(dataset):
+        logging.warning('Incremental training needs the partitioned data of incremental ingestion; training from scratch')
+    elif incremental:
+        clf = grow_current_model(params, dataset)
+        if clf is not None:
+            return clf
+    start = time.perf_counter()
+    # df = load_data(r'https://raw.githubusercontent.com/sami540/china_cancer_patient_project/main/data_for_github/preprocessed_data_2.csv')
+    x_train, y_train = split_data(
+        dataset, SPLIT_DIR, params.get('test_size', 0.2), params.get('random_state', 42), params.get('stratify', False),
+        df=df, by_partition=incremental
+    )
+    check_feature_layout(x_train, FeatureEncoder.load('./models/encoder.json'))
+    # The compact columns convert straight to the float32 matrix the forest trains on
+    log_memory('training features', x_train)
+    model_params = {'n_estimators': params.get('n_estimators', 100)}
+    search = params.get('search', {})
+    if search.get('enabled'):
+        scoring = search.get('scoring', 'roc_auc')
+        results = search_hyperparameters(
+            x_train, y_train, search.get('grid', {}), scoring, search.get('validation_size', 0.2),
+            params.get('random_state', 42), search.get('max_workers') or None
+        )
+        save_search_report(results, scoring, SEARCH_REPORT)
+        if search.get('log_to_mlflow', True):
+            try:
+                log_search(results, scoring)
+            except Exception as e:
+                # The ranked candidates are in the report either way
+                logging.error('Failed to log the search to MLflow: %s', e)
+        model_params.update(results[0]['params'])
+    clf = training_model(x_train, y_train, params.get('n_jobs'), **model_params)
+    # The trees' own seed; incremental runs derive each generation's seed from it
+    random_state = clf.get_params()['random_state']
+    partitions = partition_ranges(dataset) if incremental and is_partitioned(dataset) else None
+    save_artifacts(clf, forest_state(clf, partitions, random_state, {
+        'mode': 'full', 'new_rows': int(len(x_train)), 'trees_added': len(clf.estimators_), 'trees_retired': 0,
+        'seconds': time.perf_counter() - start,
+    }))
+    return clf
+
 def main():
     try:
-
-        df = load_data('./data/interim/preprocessed_data_2.csv')
-        # df = load_data(r'https://raw.githubusercontent.com/sami540/china_cancer_patient_project/main/data_for_github/preprocessed_data_2.csv')
-        x_train, x_test, y_train, y_test = split_data(df, 0.2, 42)
-        x_train, x_test, y_train, y_test = split_data(df, 0.2, 42)
-        clf = training_model(x_train, y_train)
-        save_model(clf, 'models/model.pkl')
-        logging.info('model saved successufullly !')
+        run(load_params('params.yaml').get('model_building', {}), interchange_format())
     except Exception as e:
         logging.error('Failed to complete the model building process: %s', e)
         print(f"Error: {e}")
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
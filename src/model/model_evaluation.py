@@ -2,18 +2,40 @@ import numpy as np
 import pandas as pd
 import pickle
 import json
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+import yaml
 import logging
 import mlflow
 import mlflow.sklearn
 import os
 from src.logger import logging
+from src.data.columnar import dataset_path, interchange_format
+from src.data.splits import check_split, iter_rows, load_split_indices, load_split_meta
+from src.features.build_features import TARGET_COLUMN
+from src.model.metrics import BinaryMetrics
 
 
+TRACKING_URI = "http://127.0.0.1:5000"
+SPLIT_DIR = './splited_data/split'
+CURVES_PATH = 'reports/curves.json'
+# Test rows scored at a time
+DEFAULT_CHUNK_SIZE = 50000
+mlflow.set_tracking_uri(TRACKING_URI)
 
-mlflow.set_tracking_uri("http://127.0.0.1:5000")
 
 
+def load_params(params_path: str) -> dict:
+    """Load parameters from a YAML file."""
+    try:
+        with open(params_path, 'r') as file:
+            params = yaml.safe_load(file)
+        logging.debug('Parameters retrieved from %s', params_path)
+        return params
+    except FileNotFoundError:
+        logging.error('File not found: %s', params_path)
+        raise
+    except yaml.YAMLError as e:
+        logging.error('YAML error: %s', e)
+        raise
 
 def load_model(file_path: str):
     """Load the trained model from a file."""
@@ -29,35 +51,35 @@ def load_model(file_path: str):
         logging.error('Unexpected error occurred while loading the model: %s', e)
         raise
 
-def load_data(file_path1, file_path2) -> pd.DataFrame:
-        try:
-         logging.info('Loading data for testing .....')
-         x_test = pd.read_csv(file_path1)
-         y_test = pd.read_csv(file_path2)
-         return x_test, y_test
-        except Exception as e:
-            logging.error(f'The error is {e}')
-            raise
-def model_evaluation(model, x_test, y_test):
+
+def evaluate_split(model, dataset, split_dir, chunk_size=DEFAULT_CHUNK_SIZE, n_bins=1000, calibration_bins=10,
+                   df=None) -> BinaryMetrics:
+    """
+    Score the test rows of the split chunk by chunk and accumulate their
+    metrics in one pass: only chunk_size rows are gathered from the
+    memory-mapped dataset (or sliced from df in memory) at a time, so memory
+    stays bounded however large the test set is. A CSV dataset is streamed
+    once instead, keeping the test rows of every chunk.
+    """
     try:
-     logging.info('evaluating model .......')
-     y_pred = model.predict(x_test)
-
-     accuracy = accuracy_score(y_test, y_pred)
-     precision = precision_score(y_test, y_pred)
-     recall = recall_score(y_test, y_pred)
-     f1 = f1_score(y_test, y_pred)
-
-     metrics_dict = {
-            'accuracy': accuracy,
-            'precision': precision,
-            'recall': recall,
-            'f1': f1
-        }
-     logging.info('Model evaluation metrics calculated')
-     return metrics_dict
+        logging.info('Evaluating the model on the test split .....')
+        if df is None:
+            indices = load_split_indices(split_dir, 'test', dataset)
+        else:
+            check_split(load_split_meta(split_dir), df[TARGET_COLUMN].to_numpy(), 'the data in memory')
+            indices = load_split_indices(split_dir, 'test')
+        evaluator = BinaryMetrics(n_bins, calibration_bins, model.classes_)
+        if df is None:
+            chunks = iter_rows(dataset, indices, chunk_size)
+        else:
+            chunks = (df.iloc[indices[start:start + chunk_size]] for start in range(0, len(indices), chunk_size))
+        for chunk in chunks:
+            evaluator.update(chunk[TARGET_COLUMN].to_numpy(), model.predict_proba(chunk.drop(columns=[TARGET_COLUMN])))
+        evaluator.log_report()
+        return evaluator
     except Exception as e:
-        logging.error(f'the error is {e}')
+        logging.error(f'Error occurred while evaluating the model on {dataset}: {e}')
+        raise
 
 
 def save_metrics(metrics: dict, file_path: str) -> None:
@@ -81,43 +103,64 @@ def save_model_info(run_id: str, model_path: str, file_path: str) -> None:
         logging.error('Error occurred while saving the model info: %s', e)
         raise
 
-def main():
+def run(fmt, clf=None, df=None, params=None):
+    """
+    Evaluate and log the model to MLflow. clf and df are the trained model
+    and the preprocessed data when they are still in memory. Returns the
+    metrics; errors are raised.
+    """
+    params = params or {}
+    # The registration stage points MLflow elsewhere; set ours again when both run in one process
+    mlflow.set_tracking_uri(TRACKING_URI)
     mlflow.set_experiment("dvc-pipeline")
     with mlflow.start_run() as run:
-        try:
-            logging.info('start evaluation')
-            clf = load_model('./models/model.pkl')              
-            x_test, y_test = load_data('./splited_data/x_test.csv', './splited_data/y_test.csv')            
-            # x_test, y_test = load_data(r'C:\Users\sfed\Desktop\my-proj\china_cancer_patient_project\splited_data\x_test.csv', r'C:\Users\sfed\Desktop\my-proj\china_cancer_patient_project\splited_data\y_test.csv')
-            
-           
-
-            metrics = model_evaluation(clf, x_test, y_test)
-            
-            save_metrics(metrics, 'reports/metrics.json')
-            
-            # Log metrics to MLflow
-            for metric_name, metric_value in metrics.items():
-                mlflow.log_metric(metric_name, metric_value)
-            
-            # Log model parameters to MLflow
-            if hasattr(clf, 'get_params'):
-                params = clf.get_params()
-                for param_name, param_value in params.items():
-                    mlflow.log_param(param_name, param_value)
-            
-            # Log model to MLflow
-            mlflow.sklearn.log_model(clf, "model")
-            
-            # Save model info
-            save_model_info(run.info.run_id, "model", 'reports/experiment_info.json')
-            
-            # Log the metrics file to MLflow
-            mlflow.log_artifact('reports/metrics.json')
-
-        except Exception as e:
-            logging.error('Failed to complete the model evaluation process: %s', e)
-            print(f"Error: {e}")
+        logging.info('start evaluation')
+        clf = load_model('./models/model.pkl') if clf is None else clf
+        # x_test, y_test = load_data(r'C:\Users\sfed\Desktop\my-proj\china_cancer_patient_project\splited_data\x_test.csv', r'C:\Users\sfed\Desktop\my-proj\china_cancer_patient_project\splited_data\y_test.csv')
+        evaluator = evaluate_split(
+            clf, dataset_path('./data/interim', 'preprocessed_data_2', fmt), SPLIT_DIR,
+            params.get('chunk_size', DEFAULT_CHUNK_SIZE), params.get('n_bins', 1000),
+            params.get('calibration_bins', 10), df
+        )
+        metrics = evaluator.metrics()
+
+        save_metrics(metrics, 'reports/metrics.json')
+        save_metrics(evaluator.curves(), CURVES_PATH)
+
+        # Log metrics to MLflow in one call
+        mlflow.log_metrics(metrics)
+
+        # Log model parameters to MLflow
+        if hasattr(clf, 'get_params'):
+            model_params = clf.get_params()
+            for param_name, param_value in model_params.items():
+                mlflow.log_param(param_name, param_value)
+
+        # Log model to MLflow, with the feature encoder and compiled forest stored inside the model artifact
+        mlflow.sklearn.log_model(clf, "model")
+        mlflow.log_artifact('./models/encoder.json', artifact_path="model")
+        mlflow.log_artifacts('./models/compiled_forest', artifact_path="model/compiled_forest")
+        # Lets an incremental run grow the registered model instead of the local one
+        if os.path.exists('./models/forest_state.json'):
+            mlflow.log_artifact('./models/forest_state.json', artifact_path="model")
+            with open('./models/forest_state.json', 'r') as file:
+                state = json.load(file)
+            mlflow.set_tags({'training_mode': state['last_run']['mode'], 'forest_generation': state['generation']})
+
+        # Save model info
+        save_model_info(run.info.run_id, "model", 'reports/experiment_info.json')
+
+        # Log the metrics file to MLflow
+        mlflow.log_artifact('reports/metrics.json')
+        mlflow.log_artifact(CURVES_PATH)
+        return metrics
+
+def main():
+    try:
+        run(interchange_format(), params=load_params('params.yaml').get('model_evaluation', {}))
+    except Exception as e:
+        logging.error('Failed to complete the model evaluation process: %s', e)
+        print(f"Error: {e}")
 
 if __name__ == '__main__':
     main()
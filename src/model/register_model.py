@@ -29,7 +29,8 @@ warnings.filterwarnings("ignore")
 
 # Below code block is for local use
 # -------------------------------------------------------------------------------------
-mlflow.set_tracking_uri("file://" + os.path.abspath("mlruns"))
+TRACKING_URI = "file://" + os.path.abspath("mlruns")
+mlflow.set_tracking_uri(TRACKING_URI)
 # -------------------------------------------------------------------------------------
 
 
@@ -68,13 +69,19 @@ def register_model(model_name: str, model_info: dict):
         logging.error('Error during model registration: %s', e)
         raise
 
+def run():
+    """Register the model logged by the evaluation stage; errors are raised."""
+    # The evaluation stage points MLflow elsewhere; set ours again when both run in one process
+    mlflow.set_tracking_uri(TRACKING_URI)
+    model_info_path = 'reports/experiment_info.json'
+    model_info = load_model_info(model_info_path)
+
+    model_name = "my_model_v2"
+    register_model(model_name, model_info)
+
 def main():
     try:
-        model_info_path = 'reports/experiment_info.json'
-        model_info = load_model_info(model_info_path)
-        
-        model_name = "my_model_v2"
-        register_model(model_name, model_info)
+        run()
     except Exception as e:
         logging.error('Failed to complete the model registration process: %s', e)
         print(f"Error: {e}")
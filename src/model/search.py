@@ -0,0 +1,200 @@
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import train_test_split
+from src.logger import logging
+from src.model.compiled_forest import CompiledForest
+
+TRACKING_URI = "http://127.0.0.1:5000"
+EXPERIMENT_NAME = 'dvc-pipeline-search'
+# Parameters every candidate starts from; the grid overrides them
+BASE_PARAMS = {'n_estimators': 100, 'random_state': 42}
+# Single rows timed per candidate for the serving latency
+LATENCY_ROWS = 200
+
+# The training matrix of the current worker process, memory-mapped once by _init_worker
+_shared = {}
+
+
+def expand_grid(grid: dict) -> list:
+    """Every combination of a {param: [values]} grid, as a list of parameter dicts."""
+    names = sorted(grid)
+    values = [grid[name] if isinstance(grid[name], list) else [grid[name]] for name in names]
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+
+def share_matrix(x, y, directory: str, validation_size=0.2, random_state=42):
+    """
+    Write the training matrix once as .npy files for the workers to memory-map.
+
+    Rows are reordered so the fitting rows come first and the (stratified)
+    validation rows last: both are then contiguous slices of the mapped file,
+    which scikit-learn uses in place instead of copying. Returns the paths of
+    the features and target and the number of fitting rows.
+    """
+    x = np.ascontiguousarray(x, dtype=np.float32)
+    y = np.asarray(y)
+    fit_idx, val_idx = train_test_split(
+        np.arange(len(y)), test_size=validation_size, random_state=random_state, stratify=y
+    )
+    order = np.concatenate([np.sort(fit_idx), np.sort(val_idx)])
+    x_path, y_path = os.path.join(directory, 'x.npy'), os.path.join(directory, 'y.npy')
+    np.save(x_path, x[order])
+    np.save(y_path, y[order])
+    return x_path, y_path, len(fit_idx)
+
+
+def _init_worker(x_path, y_path, n_fit):
+    x = np.load(x_path, mmap_mode='r')
+    y = np.load(y_path, mmap_mode='r')
+    _shared.update(x_fit=x[:n_fit], y_fit=y[:n_fit], x_val=x[n_fit:], y_val=y[n_fit:])
+
+
+def single_row_latency_ms(model, x, n_rows=LATENCY_ROWS) -> float:
+    """Median time to score one row, the way the serving app calls the model."""
+    timings = []
+    for row in x[:n_rows]:
+        row = row[np.newaxis]
+        start = time.perf_counter()
+        model.predict_proba(row)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def evaluate_candidate(params: dict, scoring: str) -> dict:
+    """
+    Fit one candidate on the shared fitting rows and score it on the
+    validation rows. The compiled forest comes back as arrays so its latency
+    can be timed after the pool is done, without other fits competing for
+    the cores.
+    """
+    x_fit, y_fit, x_val, y_val = (_shared[name] for name in ('x_fit', 'y_fit', 'x_val', 'y_val'))
+    start = time.perf_counter()
+    clf = RandomForestClassifier(**{**BASE_PARAMS, **params}, n_jobs=1).fit(x_fit, y_fit)
+    fit_seconds = time.perf_counter() - start
+    return {
+        'params': params,
+        'score': float(get_scorer(scoring)(clf, x_val, y_val)),
+        'fit_seconds': fit_seconds,
+        'compiled': CompiledForest.from_sklearn(clf).to_arrays(),
+    }
+
+
+def measure_latency(result: dict, x_val) -> dict:
+    """Replace the compiled arrays of a result with the latency of the forest the serving app scores with."""
+    compiled = CompiledForest.from_arrays(result.pop('compiled'))
+    start = time.perf_counter()
+    compiled.predict_proba(x_val)
+    result['batch_us_per_row'] = (time.perf_counter() - start) / len(x_val) * 1e6
+    result['latency_ms'] = single_row_latency_ms(compiled, x_val)
+    result['n_nodes'] = compiled.n_nodes
+    return result
+
+
+def rank_results(results: list) -> list:
+    """
+    Order candidates by score (highest first), faster single-row latency
+    breaking ties. Each gets its rank, latency_rank, and whether it is on the
+    score/latency Pareto front (no other candidate is both as good and faster).
+    """
+    ranked = sorted(results, key=lambda r: (-r['score'], r['latency_ms']))
+    latency_ranks = {id(r): rank for rank, r in enumerate(sorted(ranked, key=lambda r: r['latency_ms']), 1)}
+    for rank, result in enumerate(ranked, 1):
+        result['rank'] = rank
+        result['latency_rank'] = latency_ranks[id(result)]
+        result['pareto'] = not any(
+            other['score'] >= result['score'] and other['latency_ms'] < result['latency_ms'] for other in ranked
+        )
+    return ranked
+
+
+def search_hyperparameters(x_train, y_train, grid: dict, scoring='roc_auc', validation_size=0.2,
+                           random_state=42, max_workers=None) -> list:
+    """
+    Evaluate every grid candidate across a process pool and return them ranked.
+
+    The training matrix is written once and memory-mapped by every worker, so
+    the workers share its pages instead of each receiving a pickled copy.
+    Each candidate fits single-threaded; the pool runs max_workers of them
+    at once (all cores by default).
+    """
+    try:
+        candidates = expand_grid(grid)
+        max_workers = min(max_workers or os.cpu_count() or 1, len(candidates))
+        logging.info(f'Searching {len(candidates)} candidates on {max_workers} worker processes')
+        start = time.perf_counter()
+        shared_dir = tempfile.mkdtemp(prefix='search-')
+        try:
+            initargs = share_matrix(x_train, y_train, shared_dir, validation_size, random_state)
+            with ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=initargs) as pool:
+                results = list(pool.map(evaluate_candidate, candidates, itertools.repeat(scoring)))
+            x_val = np.load(initargs[0], mmap_mode='r')[initargs[2]:]
+            results = [measure_latency(result, x_val) for result in results]
+            del x_val
+        finally:
+            shutil.rmtree(shared_dir, ignore_errors=True)
+        results = rank_results(results)
+        best = results[0]
+        logging.info(f"Search finished in {time.perf_counter() - start:.1f}s; best {best['params']} "
+                     f"({scoring} {best['score']:.4f}, {best['latency_ms']:.2f} ms per row)")
+        return results
+    except Exception as e:
+        logging.error(f'Error occurred during the hyperparameter search: {e}')
+        raise
+
+
+def save_search_report(results: list, scoring: str, file_path: str) -> None:
+    """Save the ranked candidates to a JSON file."""
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'w') as file:
+            json.dump({'scoring': scoring, 'candidates': results}, file, indent=4)
+        logging.info(f'Search report saved to {file_path}')
+    except Exception as e:
+        logging.error(f'Unexpected error occurred while saving the search report: {e}')
+        raise
+
+
+def log_search(results: list, scoring: str, tracking_uri=TRACKING_URI, experiment_name=EXPERIMENT_NAME) -> str:
+    """
+    Log the search to MLflow: a parent run holding the best candidate and one
+    nested run per candidate, each written with a single log_batch call.
+    Returns the parent run id.
+    """
+    from mlflow.entities import Metric, Param, RunTag
+    from mlflow.tracking import MlflowClient
+
+    client = MlflowClient(tracking_uri)
+    experiment = client.get_experiment_by_name(experiment_name)
+    experiment_id = experiment.experiment_id if experiment else client.create_experiment(experiment_name)
+    timestamp = int(time.time() * 1000)
+
+    def batch(run_id, result, tags):
+        metrics = [Metric(name, float(result[name]), timestamp, 0)
+                   for name in ('score', 'latency_ms', 'batch_us_per_row', 'fit_seconds', 'n_nodes', 'rank')]
+        params = [Param(name, str(value)) for name, value in {**BASE_PARAMS, **result['params']}.items()]
+        client.log_batch(run_id, metrics=metrics, params=params, tags=[RunTag(k, str(v)) for k, v in tags.items()])
+
+    parent = client.create_run(experiment_id, run_name='hyperparameter-search')
+    parent_id = parent.info.run_id
+    try:
+        for result in results:
+            child = client.create_run(experiment_id, run_name=f"candidate-{result['rank']}",
+                                      tags={'mlflow.parentRunId': parent_id})
+            batch(child.info.run_id, result, {'scoring': scoring, 'pareto': result['pareto']})
+            client.set_terminated(child.info.run_id)
+        batch(parent_id, results[0], {'scoring': scoring, 'candidates': len(results)})
+        client.set_terminated(parent_id)
+    except Exception:
+        client.set_terminated(parent_id, status='FAILED')
+        raise
+    logging.info(f'Logged {len(results)} search candidates to MLflow run {parent_id}')
+    return parent_id
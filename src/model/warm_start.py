@@ -0,0 +1,208 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from src.logger import logging
+from src.features.build_features import TARGET_COLUMN
+from src.data.splits import load_split_indices, take_rows
+
+FOREST_STATE_FILE = 'forest_state.json'
+REGISTERED_MODEL = 'my_model_v2'
+RETIRE_POLICIES = ('oldest', 'worst', 'none')
+
+
+def load_forest_state(file_path: str):
+    """The saved forest state, or None when there is none."""
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, 'r') as file:
+        return json.load(file)
+
+
+def save_forest_state(state: dict, file_path: str) -> None:
+    try:
+        os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+        with open(file_path, 'w') as file:
+            json.dump(state, file, indent=4)
+        logging.info(f'Forest state saved to {file_path}')
+    except Exception as e:
+        logging.error(f'Error occurred while saving the forest state: {e}')
+        raise
+
+
+def forest_state(clf, partitions, random_state: int, last_run: dict) -> dict:
+    """
+    State of a freshly fitted forest: every tree is generation 0 and the
+    partitions it was trained on are recorded with their creation time, so
+    a rebuilt partition is told apart from the one the trees saw.
+    partitions is None when the data was not split partition by partition;
+    such a forest cannot be grown.
+    """
+    return {
+        'generation': 0,
+        'random_state': random_state,
+        'trees': [0] * len(clf.estimators_),
+        'partitions': None if partitions is None else {
+            partition_id: part['created'] for partition_id, part in partitions.items()
+        },
+        'last_run': last_run,
+    }
+
+
+def load_local_forest(model_path: str, state_path: str):
+    """The current models/model.pkl and its forest state, or (None, None)."""
+    import pickle
+
+    state = load_forest_state(state_path)
+    if state is None or not os.path.exists(model_path):
+        return None, None
+    with open(model_path, 'rb') as file:
+        return pickle.load(file), state
+
+
+def load_registered_forest(model_name=REGISTERED_MODEL, stage='Production', tracking_uri=None):
+    """
+    The registered model of a stage and the forest state logged inside its
+    artifact by the evaluation stage, or (None, None) when it has none.
+    """
+    import mlflow.artifacts
+    import mlflow.sklearn
+
+    dst_dir = tempfile.mkdtemp(prefix='warm-start-')
+    try:
+        local_path = mlflow.artifacts.download_artifacts(
+            artifact_uri=f'models:/{model_name}/{stage}', dst_path=dst_dir, tracking_uri=tracking_uri
+        )
+        state = load_forest_state(os.path.join(local_path, FOREST_STATE_FILE))
+        if state is None:
+            logging.warning(f'models:/{model_name}/{stage} has no {FOREST_STATE_FILE}; it cannot be grown')
+            return None, None
+        return mlflow.sklearn.load_model(local_path), state
+    finally:
+        shutil.rmtree(dst_dir, ignore_errors=True)
+
+
+def new_partitions(ranges: dict, state: dict):
+    """
+    Partitions the forest has not been trained on, in order, or None when a
+    partition it was trained on is gone or was rebuilt (its trees then hold
+    data that is no longer in the dataset, so the forest must be refit).
+    """
+    if state['partitions'] is None:
+        # Its test rows were drawn over the whole dataset, so new test rows may be ones it was trained on
+        logging.info('The forest was not trained on a partition-by-partition split')
+        return None
+    for partition_id, created in state['partitions'].items():
+        part = ranges.get(partition_id)
+        if part is None or part['created'] != created:
+            logging.info(f'Partition {partition_id} changed since the forest was trained on it')
+            return None
+    return [partition_id for partition_id in ranges if partition_id not in state['partitions']]
+
+
+def tree_scores(clf, trees, x, y) -> np.ndarray:
+    """Mean probability each tree gives the true class of the rows."""
+    x = np.asarray(x, dtype=np.float32)
+    rows = np.arange(len(x))
+    y_idx = np.searchsorted(clf.classes_, np.asarray(y))
+    return np.array([tree.predict_proba(x)[rows, y_idx].mean() for tree in trees])
+
+
+def grow_forest(clf, x_new, y_new, n_trees, random_state, n_jobs=None):
+    """
+    Fit n_trees more trees on the new rows only, with scikit-learn's warm
+    start; the existing trees are kept as they are. random_state should
+    differ per generation so the new trees do not repeat the bootstrap
+    draws of earlier ones.
+    """
+    if set(np.unique(y_new)) != set(clf.classes_):
+        raise ValueError(f'The new rows must contain every class {list(clf.classes_)} to grow the forest')
+    clf.set_params(warm_start=True, n_estimators=len(clf.estimators_) + n_trees,
+                   random_state=random_state, n_jobs=n_jobs)
+    clf.fit(x_new, y_new)
+    # Saved and logged without the warm start or the training parallelism
+    clf.set_params(warm_start=False, n_jobs=None)
+    return clf
+
+
+def retire_trees(clf, generations: list, max_trees: int, policy='oldest', x_new=None, y_new=None):
+    """
+    Drop trees of earlier generations until at most max_trees are left.
+
+    oldest retires the earliest generations first; worst retires the trees
+    that score lowest on the new rows, which none of the earlier trees were
+    fitted on; none keeps every tree. Returns the generations of the trees
+    kept and how many were retired.
+    """
+    if policy not in RETIRE_POLICIES:
+        raise ValueError(f"Unknown retirement policy '{policy}', expected one of {RETIRE_POLICIES}")
+    excess = len(clf.estimators_) - max_trees
+    if policy == 'none' or not max_trees or excess <= 0:
+        return generations, 0
+    latest = max(generations)
+    old = [i for i, generation in enumerate(generations) if generation < latest]
+    if policy == 'oldest':
+        order = sorted(old, key=lambda i: generations[i])
+    else:
+        scores = tree_scores(clf, [clf.estimators_[i] for i in old], x_new, y_new)
+        order = [old[j] for j in np.argsort(scores, kind='stable')]
+    retired = set(order[:excess])
+    kept = [i for i in range(len(generations)) if i not in retired]
+    clf.estimators_ = [clf.estimators_[i] for i in kept]
+    clf.n_estimators = len(kept)
+    return [generations[i] for i in kept], len(retired)
+
+
+def train_incremental(clf, state: dict, dataset: str, split_dir: str, ranges: dict, new_trees=20, max_trees=100,
+                      retire='oldest', n_jobs=None):
+    """
+    Grow a forest with trees fitted on the training rows of the partitions
+    it has not seen, then retire old trees by the policy. Only those rows
+    are read, so the cost follows the size of the new data. Returns the
+    model and its updated state, or (None, None) when it must be refit from
+    scratch instead.
+    """
+    try:
+        start = time.perf_counter()
+        pending = new_partitions(ranges, state)
+        if pending is None:
+            return None, None
+        if not pending:
+            logging.info('No new partitions since the last training; the forest is unchanged')
+            state['last_run'] = {'mode': 'unchanged', 'new_rows': 0, 'trees_added': 0, 'trees_retired': 0}
+            return clf, state
+
+        train_idx = np.asarray(load_split_indices(split_dir, 'train', dataset))
+        in_new = np.zeros(len(train_idx), dtype=bool)
+        for partition_id in pending:
+            in_new |= (train_idx >= ranges[partition_id]['start']) & (train_idx < ranges[partition_id]['stop'])
+        new_rows = take_rows(dataset, np.sort(train_idx[in_new]))
+        x_new, y_new = new_rows.drop(columns=[TARGET_COLUMN]), new_rows[TARGET_COLUMN]
+
+        generation = state['generation'] + 1
+        try:
+            grow_forest(clf, x_new, y_new, new_trees, state['random_state'] + generation, n_jobs)
+        except ValueError as e:
+            # Leave the partitions pending; they are trained on once more data has arrived
+            logging.warning(f'Not growing the forest on {len(new_rows)} new rows: {e}')
+            state['last_run'] = {'mode': 'unchanged', 'new_rows': 0, 'trees_added': 0, 'trees_retired': 0}
+            return clf, state
+        generations, n_retired = retire_trees(
+            clf, state['trees'] + [generation] * new_trees, max_trees, retire, x_new, y_new
+        )
+        state.update(generation=generation, trees=generations)
+        state['partitions'].update({partition_id: ranges[partition_id]['created'] for partition_id in pending})
+        state['last_run'] = {
+            'mode': 'incremental', 'new_partitions': pending, 'new_rows': int(len(new_rows)),
+            'trees_added': new_trees, 'trees_retired': n_retired, 'seconds': time.perf_counter() - start,
+        }
+        logging.info(f'Grew the forest to generation {generation} on {len(new_rows)} new rows: '
+                     f'+{new_trees} trees, {n_retired} retired ({retire}), {len(generations)} in total, '
+                     f'in {time.perf_counter() - start:.1f}s')
+        return clf, state
+    except Exception as e:
+        logging.error(f'Error occurred during incremental training: {e}')
+        raise
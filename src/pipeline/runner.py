@@ -0,0 +1,189 @@
+import argparse
+import json
+import os
+import time
+
+import yaml
+from src.logger import logging
+
+STAGES = ['data_ingestion', 'data_preprocessing', 'model_building', 'cross_validation', 'model_evaluation',
+          'model_registration']
+REPORT_PATH = 'reports/pipeline_run.json'
+
+
+def load_params(params_path: str) -> dict:
+    """Load parameters from a YAML file."""
+    try:
+        with open(params_path, 'r') as file:
+            params = yaml.safe_load(file)
+        logging.debug('Parameters retrieved from %s', params_path)
+        return params
+    except FileNotFoundError:
+        logging.error('File not found: %s', params_path)
+        raise
+    except yaml.YAMLError as e:
+        logging.error('YAML error: %s', e)
+        raise
+
+
+def _status_mb(field):
+    """VmRSS / VmHWM of this process in MB, from /proc/self/status (None off Linux)."""
+    try:
+        with open('/proc/self/status', 'r') as file:
+            for line in file:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss() -> bool:
+    """Reset the peak RSS (VmHWM) so it measures one stage; False if the kernel does not allow it."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _format_mb(value) -> str:
+    return 'n/a' if value is None else f'{value:.0f}'
+
+
+def peak_rss_mb():
+    peak = _status_mb('VmHWM')
+    if peak is not None:
+        return peak
+    try:
+        import resource
+    except ImportError:
+        # Windows has neither /proc nor the resource module
+        return None
+    # ru_maxrss is the peak of the whole process, in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class PipelineRunner:
+    """
+    Run the dvc.yaml stages in one process.
+
+    Each stage is the same run() function its `python src/...` command
+    calls, so it writes the same outputs (dvc commit then records them).
+    The frames and the model that one stage produced are also handed to the
+    stages that read its outputs in memory, so nothing is re-read, and
+    pandas, scikit-learn and MLflow are imported once. Each frame is kept
+    under the stage output it stands for: a stage whose input stage was
+    not run reads that input from disk. Every stage is timed and its peak RSS is
+    measured (the kernel's high-water mark is reset before each stage).
+    """
+
+    def __init__(self, params_path='params.yaml', stages=None, data_url=None):
+        self.params_path = params_path
+        self.data_url = data_url
+        self.stages = list(stages or STAGES)
+        unknown = [stage for stage in self.stages if stage not in STAGES]
+        if unknown:
+            raise ValueError(f'Unknown stages {unknown}, expected some of {STAGES}')
+        self.results = []
+        self._state = {}
+
+    def data_ingestion(self, params, fmt):
+        from src.data import data_ingestion
+        self._state['raw_df'], _ = data_ingestion.run(params, fmt, self.data_url or data_ingestion.DATA_URL)
+
+    def data_preprocessing(self, params, fmt):
+        from src.data import data_preprocessing
+        self._state['interim_df'], _ = data_preprocessing.run(
+            params.get('data_preprocessing', {}), fmt, self._state.pop('raw_df', None)
+        )
+
+    def model_building(self, params, fmt):
+        from src.model import model_building
+        self._state['clf'] = model_building.run(params.get('model_building', {}), fmt, self._state.get('interim_df'))
+
+    def cross_validation(self, params, fmt):
+        from src.model import cross_validation
+        cross_validation.run(params, fmt, self._state.get('interim_df'))
+
+    def model_evaluation(self, params, fmt):
+        from src.model import model_evaluation
+        model_evaluation.run(fmt, self._state.get('clf'), self._state.get('interim_df'),
+                             params.get('model_evaluation', {}))
+
+    def model_registration(self, params, fmt):
+        from src.model import register_model
+        register_model.run()
+
+    def run(self) -> list:
+        """Run the stages in order and return their results; stops at the first failed stage."""
+        from src.data.columnar import interchange_format
+
+        start = time.perf_counter()
+        params = load_params(self.params_path)
+        fmt = interchange_format(self.params_path)
+        logging.info(f'Pipeline setup (params, imports) took {time.perf_counter() - start:.2f}s')
+
+        for stage in STAGES:
+            if stage not in self.stages:
+                continue
+            peak_is_stage = reset_peak_rss()
+            stage_start = time.perf_counter()
+            result = {'stage': stage, 'status': 'ok'}
+            try:
+                getattr(self, stage)(params, fmt)
+            except Exception as e:
+                result.update(status='failed', error=str(e))
+                logging.error(f'Pipeline stage {stage} failed: {e}')
+            result.update(
+                seconds=time.perf_counter() - stage_start,
+                peak_rss_mb=peak_rss_mb(),
+                rss_mb=_status_mb('VmRSS'),
+                peak_is_stage=peak_is_stage,
+            )
+            self.results.append(result)
+            logging.info(f"Stage {stage}: {result['status']} in {result['seconds']:.2f}s, "
+                         f"peak RSS {_format_mb(result['peak_rss_mb'])} MB")
+            if result['status'] == 'failed':
+                break
+        self._state.clear()
+        logging.info(f'Pipeline finished in {time.perf_counter() - start:.2f}s')
+        return self.results
+
+    def save_report(self, file_path=REPORT_PATH):
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, 'w') as file:
+                json.dump({'stages': self.results, 'total_seconds': sum(r['seconds'] for r in self.results)},
+                          file, indent=4)
+            logging.info(f'Pipeline report saved to {file_path}')
+        except Exception as e:
+            logging.error(f'Unexpected error occurred while saving the pipeline report: {e}')
+            raise
+
+    def print_summary(self):
+        print(f"{'stage':<20} {'status':<7} {'seconds':>8} {'peak RSS MB':>12}")
+        for result in self.results:
+            print(f"{result['stage']:<20} {result['status']:<7} {result['seconds']:>8.2f} {_format_mb(result['peak_rss_mb']):>12}")
+        print(f"{'total':<20} {'':<7} {sum(r['seconds'] for r in self.results):>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the DVC pipeline stages in one process.')
+    parser.add_argument('--params', default='params.yaml')
+    parser.add_argument('--stages', default=','.join(STAGES), help='comma-separated subset of ' + ','.join(STAGES))
+    parser.add_argument('--report', default=REPORT_PATH, help='JSON file for the per-stage timings')
+    parser.add_argument('--data-url', default=None, help='raw CSV to ingest instead of the default URL')
+    args = parser.parse_args()
+
+    runner = PipelineRunner(args.params, [stage for stage in args.stages.split(',') if stage], args.data_url)
+    results = runner.run()
+    runner.save_report(args.report)
+    runner.print_summary()
+    if any(result['status'] == 'failed' for result in results):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
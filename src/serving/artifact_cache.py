@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import NamedTuple, Optional
+
+from src.logger import logging
+
+
+MANIFEST_FILE = "manifest.json"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class CacheEntry(NamedTuple):
+    model_name: str
+    version: str
+    run_id: Optional[str]
+    path: str
+    size: int
+
+
+def entry_key(model_name, version, run_id) -> str:
+    """Directory name of a cache entry: a digest of the model identity."""
+    identity = f"{model_name}\0{version}\0{run_id or ''}"
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:32]
+
+
+def file_digest(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelArtifactCache:
+    """
+    On-disk cache of downloaded model artifacts.
+
+    Entries are keyed by (model name, version, run id). Each entry directory holds
+    the artifact files plus a manifest with the size and SHA-256 of every file,
+    which is checked before an entry is served; corrupt entries are discarded.
+    When the cache grows past max_size_bytes the least recently used entries
+    are evicted. Entries are published with an atomic rename, so several
+    processes can share one cache directory.
+
+    :param verify: "full" re-hashes every file on lookup, "size" only checks sizes
+    """
+
+    def __init__(self, cache_dir, max_size_bytes=2 * 1024 ** 3, verify="full"):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.verify = verify
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _read_manifest(self, entry_dir):
+        try:
+            with open(os.path.join(entry_dir, MANIFEST_FILE), "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _is_intact(self, entry_dir, manifest) -> bool:
+        for rel_path, info in manifest["files"].items():
+            file_path = os.path.join(entry_dir, rel_path)
+            try:
+                if os.path.getsize(file_path) != info["size"]:
+                    return False
+            except OSError:
+                return False
+            if self.verify == "full" and file_digest(file_path) != info["sha256"]:
+                return False
+        return True
+
+    def _entry(self, entry_dir, manifest) -> CacheEntry:
+        return CacheEntry(
+            manifest["model_name"], manifest["version"], manifest.get("run_id"), entry_dir, manifest["size"]
+        )
+
+    def _touch(self, entry_dir):
+        try:
+            os.utime(os.path.join(entry_dir, MANIFEST_FILE))
+        except OSError:
+            pass
+
+    def get(self, model_name, version, run_id) -> Optional[CacheEntry]:
+        """Return the verified entry for this exact model identity, or None."""
+        entry_dir = os.path.join(self.cache_dir, entry_key(model_name, version, run_id))
+        manifest = self._read_manifest(entry_dir)
+        if manifest is None:
+            return None
+        if not self._is_intact(entry_dir, manifest):
+            logging.warning(f"Cached artifacts for {model_name} v{version} failed the integrity check, discarding")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return None
+        self._touch(entry_dir)
+        return self._entry(entry_dir, manifest)
+
+    def entries(self, model_name=None):
+        """All entries with a readable manifest, most recently used first."""
+        found = []
+        for name in os.listdir(self.cache_dir):
+            if name.startswith("."):
+                continue
+            entry_dir = os.path.join(self.cache_dir, name)
+            manifest = self._read_manifest(entry_dir)
+            if manifest is None or (model_name is not None and manifest["model_name"] != model_name):
+                continue
+            last_used = os.path.getmtime(os.path.join(entry_dir, MANIFEST_FILE))
+            found.append((last_used, self._entry(entry_dir, manifest)))
+        return [entry for _, entry in sorted(found, key=lambda item: item[0], reverse=True)]
+
+    def find(self, model_name, version) -> Optional[CacheEntry]:
+        """Most recently used intact entry for a version, whatever its run id (offline lookups)."""
+        for entry in self.entries(model_name):
+            if entry.version == str(version):
+                hit = self.get(entry.model_name, entry.version, entry.run_id)
+                if hit is not None:
+                    return hit
+        return None
+
+    def latest(self, model_name) -> Optional[CacheEntry]:
+        """Most recently used intact entry for a model (offline fallback)."""
+        for entry in self.entries(model_name):
+            hit = self.get(entry.model_name, entry.version, entry.run_id)
+            if hit is not None:
+                return hit
+        return None
+
+    def put(self, model_name, version, run_id, download) -> CacheEntry:
+        """
+        Populate an entry by calling download(dst_dir), which must write the
+        artifact files into dst_dir, then publish it atomically.
+        """
+        version = str(version)
+        entry_dir = os.path.join(self.cache_dir, entry_key(model_name, version, run_id))
+        staging_dir = tempfile.mkdtemp(prefix=".staging-", dir=self.cache_dir)
+        try:
+            download(staging_dir)
+
+            files, size = {}, 0
+            for root, _, names in os.walk(staging_dir):
+                for name in names:
+                    file_path = os.path.join(root, name)
+                    rel_path = os.path.relpath(file_path, staging_dir)
+                    files[rel_path] = {"size": os.path.getsize(file_path), "sha256": file_digest(file_path)}
+                    size += files[rel_path]["size"]
+
+            manifest = {
+                "model_name": model_name, "version": version, "run_id": run_id,
+                "size": size, "created": time.time(), "files": files
+            }
+            with open(os.path.join(staging_dir, MANIFEST_FILE), "w") as file:
+                json.dump(manifest, file, indent=4)
+
+            try:
+                os.rename(staging_dir, entry_dir)
+            except OSError:
+                # Another process published the same entry first; keep theirs if it is intact
+                existing = self.get(model_name, version, run_id)
+                if existing is not None:
+                    shutil.rmtree(staging_dir, ignore_errors=True)
+                    return existing
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                os.rename(staging_dir, entry_dir)
+        except Exception:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+
+        logging.info(f"Cached {model_name} v{version} ({size / 1024 ** 2:.1f} MB) in {entry_dir}")
+        self.evict(keep=entry_dir)
+        return self._entry(entry_dir, manifest)
+
+    def fetch(self, model_name, version, run_id, download) -> CacheEntry:
+        """Return a cached entry, downloading it on a miss."""
+        start_time = time.perf_counter()
+        entry = self.get(model_name, version, run_id)
+        if entry is not None:
+            logging.info(f"Found {model_name} v{version} in the artifact cache in {(time.perf_counter() - start_time) * 1000:.1f} ms")
+            return entry
+        return self.put(model_name, version, run_id, download)
+
+    def evict(self, keep=None):
+        """Remove least recently used entries until the cache fits in max_size_bytes."""
+        entries = self.entries()
+        total = sum(entry.size for entry in entries)
+        for entry in reversed(entries):
+            if total <= self.max_size_bytes:
+                break
+            if entry.path == keep:
+                continue
+            shutil.rmtree(entry.path, ignore_errors=True)
+            total -= entry.size
+            logging.info(f"Evicted {entry.model_name} v{entry.version} from the artifact cache")
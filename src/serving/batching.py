@@ -0,0 +1,161 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+import numpy as np
+from prometheus_client import Histogram
+from src.logger import logging
+
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent prediction requests into a single model call.
+
+    Callers submit small feature matrices (usually one row) from their request
+    threads. A background thread collects everything that arrives within
+    max_wait_ms of the first queued request, up to max_batch_size rows, stacks
+    it into one matrix, calls predict_fn once and hands each caller back the
+    predictions for its own rows.
+
+    Each submission may carry a context (for example the model snapshot the
+    request was encoded for); rows with different contexts are never mixed and
+    predict_fn is called as predict_fn(matrix, context).
+
+    predict() waits at most timeout seconds for its batch; a request that
+    was still queued by then is withdrawn. stop() fails every request that
+    has not been scored yet, so no caller is left waiting on a dead thread.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=2.0, timeout=5.0, registry=None):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self.batch_size = Histogram(
+            "model_batch_size_rows", "Rows scored per coalesced model.predict call",
+            buckets=BATCH_SIZE_BUCKETS, registry=registry
+        )
+        self.queue_depth = Histogram(
+            "model_batch_queue_depth", "Requests still queued when a batch is dispatched",
+            buckets=BATCH_SIZE_BUCKETS, registry=registry
+        )
+        self.queue_wait = Histogram(
+            "model_batch_queue_wait_seconds", "Time a request waited before its batch was scored",
+            buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25), registry=registry
+        )
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+            self._thread.start()
+            logging.info(f"Micro-batcher started (max_batch_size={self.max_batch_size}, max_wait={self.max_wait * 1000:g} ms)")
+        return self
+
+    def stop(self, timeout=1.0):
+        with self._lock:
+            self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+        # Nothing will score what is still queued
+        error = RuntimeError("Micro-batcher stopped before the request was scored")
+        pending = 0
+        while True:
+            try:
+                _, future, _, _ = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
+                pending += 1
+        if pending:
+            logging.warning(f"Micro-batcher stopped with {pending} queued requests; they were failed")
+
+    def submit(self, rows: np.ndarray, context=None) -> Future:
+        """Queue a (n_rows, n_features) matrix; the future resolves to its predictions."""
+        future = Future()
+        with self._lock:
+            if self._stop.is_set():
+                future.set_exception(RuntimeError("Micro-batcher is stopped"))
+                return future
+            self._queue.put((np.atleast_2d(rows), future, time.perf_counter(), context))
+        return future
+
+    def predict(self, rows: np.ndarray, context=None, timeout=None) -> np.ndarray:
+        """Predictions for rows, waiting at most timeout seconds (the batcher's timeout by default)."""
+        timeout = self.timeout if timeout is None else timeout
+        future = self.submit(rows, context)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            # Withdraw the request if it has not been picked up yet
+            future.cancel()
+            raise TimeoutError(f"Micro-batched prediction did not finish within {timeout}s")
+
+    def _collect(self, first):
+        batch, n_rows = [first], len(first[0])
+        deadline = time.perf_counter() + self.max_wait
+        while n_rows < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            n_rows += len(item[0])
+        return batch, n_rows
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            batch, _ = self._collect(first)
+            # Requests whose caller timed out were cancelled; the rest can no longer be
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            n_rows = sum(len(item[0]) for item in batch)
+            dispatched = time.perf_counter()
+            self.batch_size.observe(n_rows)
+            self.queue_depth.observe(self._queue.qsize())
+            for _, _, enqueued, _ in batch:
+                self.queue_wait.observe(dispatched - enqueued)
+
+            groups = {}
+            for item in batch:
+                groups.setdefault(id(item[3]), []).append(item)
+            for group in groups.values():
+                self._score(group)
+
+    def _score(self, group):
+        context = group[0][3]
+        try:
+            matrix = group[0][0] if len(group) == 1 else np.concatenate([item[0] for item in group])
+            predictions = np.asarray(self.predict_fn(matrix, context))
+        except Exception as e:
+            logging.error(f"Micro-batch of {sum(len(item[0]) for item in group)} rows failed: {e}")
+            for item in group:
+                item[1].set_exception(e)
+            return
+
+        start = 0
+        for rows, future, _, _ in group:
+            future.set_result(predictions[start:start + len(rows)])
+            start += len(rows)
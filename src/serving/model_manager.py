@@ -0,0 +1,122 @@
+import threading
+import time
+from typing import Any, NamedTuple
+
+import numpy as np
+from prometheus_client import Counter, Gauge
+from src.logger import logging
+
+
+class LoadedModel(NamedTuple):
+    """Immutable snapshot of everything a request needs to score with one model version."""
+    version: str
+    model: Any
+    encoder: Any
+
+
+class ModelManager:
+    """
+    Hold the active model and hot-swap it when a new registry version appears.
+
+    Requests read manager.current once and use that snapshot until they finish,
+    so swapping the reference never affects in-flight requests. New versions are
+    loaded and warmed up on a background thread, off the request path.
+
+    :param resolve_version: callable returning the version that should be active
+    :param load_version: callable taking a version and returning a LoadedModel
+    :param poll_interval: seconds between registry checks (0 disables polling)
+    """
+
+    def __init__(self, model_name, resolve_version, load_version, poll_interval=60.0, registry=None):
+        self.model_name = model_name
+        self.resolve_version = resolve_version
+        self.load_version = load_version
+        self.poll_interval = poll_interval
+        self._current = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.active_version = Gauge(
+            "model_active_version", "Registry version of the model currently serving requests",
+            ["model_name"], registry=registry
+        )
+        self.reload_count = Counter(
+            "model_reload_count", "Model reload attempts by outcome", ["model_name", "result"], registry=registry
+        )
+        self.last_reload = Gauge(
+            "model_last_reload_timestamp_seconds", "Unix time of the last successful model swap",
+            ["model_name"], registry=registry
+        )
+
+    @property
+    def current(self) -> LoadedModel:
+        return self._current
+
+    def add_swap_listener(self, listener):
+        """Register listener(old, new), called after every swap."""
+        self._listeners.append(listener)
+
+    def warm_up(self, loaded: LoadedModel):
+        """Run one prediction so lazy initialisation happens before the model takes traffic."""
+        loaded.model.predict(np.zeros((1, loaded.encoder.n_features)))
+
+    def load_initial(self) -> LoadedModel:
+        version = self.resolve_version()
+        if not version:
+            raise RuntimeError(f"❌ No model version found for '{self.model_name}' in MLflow registry!")
+        self._swap(self.load_version(version))
+        return self._current
+
+    def check_for_update(self) -> bool:
+        """Load, warm and swap in a new version if the registry points elsewhere."""
+        with self._lock:
+            try:
+                version = self.resolve_version()
+                if not version or (self._current is not None and str(version) == str(self._current.version)):
+                    return False
+
+                logging.info(f"New version {version} of '{self.model_name}' found, loading in the background...")
+                candidate = self.load_version(version)
+                self.warm_up(candidate)
+            except Exception as e:
+                self.reload_count.labels(model_name=self.model_name, result="failure").inc()
+                logging.error(f"Model reload failed, keeping version {self._current and self._current.version}: {e}")
+                return False
+
+            self._swap(candidate)
+            return True
+
+    def _swap(self, new: LoadedModel):
+        old, self._current = self._current, new
+        self.active_version.labels(model_name=self.model_name).set(float(new.version))
+        self.last_reload.labels(model_name=self.model_name).set(time.time())
+        self.reload_count.labels(model_name=self.model_name, result="success").inc()
+        logging.info(f"Model '{self.model_name}' version {new.version} is now active")
+
+        for listener in self._listeners:
+            try:
+                listener(old, new)
+            except Exception as e:
+                logging.error(f"Model swap listener failed: {e}")
+
+    def start(self):
+        """Start polling the registry in a daemon thread."""
+        if self.poll_interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+        self._thread.start()
+        logging.info(f"Watching '{self.model_name}' for new versions every {self.poll_interval:g}s")
+        return self
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            self.check_for_update()
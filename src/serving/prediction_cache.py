@@ -0,0 +1,75 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from prometheus_client import Counter, Gauge
+
+
+class PredictionCache:
+    """
+    In-process LRU cache of predictions with a time-to-live.
+
+    Keys are a digest of the canonical encoded feature row (float64 bytes, with
+    -0.0 folded into 0.0) scoped to the model version that produced the value,
+    so identical submissions skip the forest entirely. clear() is wired to
+    model swaps; the version scope keeps stale entries unreachable regardless.
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=300.0, registry=None):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = Counter("prediction_cache_hit_count", "Predictions served from the cache", registry=registry)
+        self.misses = Counter("prediction_cache_miss_count", "Predictions not found in the cache", registry=registry)
+        self.size = Gauge("prediction_cache_size", "Entries currently held in the prediction cache", registry=registry)
+        self.size.set_function(lambda: len(self._entries))
+
+    @staticmethod
+    def key(version, row: np.ndarray) -> bytes:
+        canonical = np.ascontiguousarray(row, dtype=np.float64).reshape(-1) + 0.0
+        digest = hashlib.blake2b(canonical.tobytes(), digest_size=16)
+        digest.update(str(version).encode("utf-8"))
+        return digest.digest()
+
+    def get_many(self, version, matrix: np.ndarray):
+        """Cached value for every row of matrix (None on a miss), plus the row keys."""
+        keys = [self.key(version, row) for row in matrix]
+        now = time.monotonic()
+        values = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end(key)
+                    values.append(entry[0])
+                else:
+                    if entry is not None:
+                        del self._entries[key]
+                    values.append(None)
+
+        n_hits = sum(value is not None for value in values)
+        if n_hits:
+            self.hits.inc(n_hits)
+        if n_hits < len(values):
+            self.misses.inc(len(values) - n_hits)
+        return values, keys
+
+    def put_many(self, keys, values):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._entries[key] = (value, expires)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
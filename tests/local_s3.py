@@ -0,0 +1,188 @@
+"""
+Minimal local stand-in for S3, for tests: serves <root>/<bucket>/<key> over
+the path-style S3 REST API (HEAD, GET with Range and If-Match, PUT and
+ListObjectsV2) on an ephemeral port, counts the requests it receives, and
+can fail the next requests with 503 SlowDown to exercise client retries.
+"""
+import hashlib
+import os
+import re
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+_RANGE = re.compile(r'bytes=(\d+)-(\d*)')
+
+
+def _error(code, message):
+    return (f'<?xml version="1.0" encoding="UTF-8"?>'
+            f'<Error><Code>{code}</Code><Message>{message}</Message></Error>').encode()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _object_path(self):
+        bucket, _, key = unquote(urlsplit(self.path).path).lstrip('/').partition('/')
+        return os.path.join(self.server.root, bucket, *key.split('/'))
+
+    def _send(self, status, headers, body=b''):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if 'Content-Length' not in headers:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _serve(self):
+        self.server.record(self.command, self.headers.get('Range'))
+        if self.server.take_failure():
+            self._read_body()
+            return self._send(503, {'Content-Type': 'application/xml'}, _error('SlowDown', 'Injected failure'))
+        url = urlsplit(self.path)
+        if self.command == 'GET' and 'list-type' in parse_qs(url.query):
+            return self._list(unquote(url.path).strip('/'), parse_qs(url.query))
+        if self.command == 'PUT':
+            return self._put()
+        path = self._object_path()
+        if not os.path.isfile(path):
+            return self._send(404, {'Content-Type': 'application/xml'}, _error('NoSuchKey', 'Not found'))
+        etag, size = self.server.etag(path)
+        if self.headers.get('If-Match') not in (None, etag):
+            return self._send(412, {'Content-Type': 'application/xml'}, _error('PreconditionFailed', 'ETag'))
+
+        headers = {'ETag': etag, 'Last-Modified': formatdate(os.path.getmtime(path), usegmt=True),
+                   'Accept-Ranges': 'bytes', 'Content-Type': 'text/csv'}
+        match = _RANGE.fullmatch(self.headers.get('Range') or '')
+        start, end, status = 0, size - 1, 200
+        if match is not None:
+            start, status = int(match.group(1)), 206
+            end = min(int(match.group(2)) if match.group(2) else size - 1, size - 1)
+            headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+        data = b''
+        if self.command == 'GET':
+            with open(path, 'rb') as file:
+                file.seek(start)
+                data = file.read(end - start + 1)
+        if self.command == 'HEAD':
+            headers['Content-Length'] = str(size)
+        return self._send(status, headers, data)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _put(self):
+        body = self._read_body()
+        if 'aws-chunked' in (self.headers.get('Content-Encoding') or ''):
+            body = _decode_aws_chunked(body)
+        path = self._object_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(body)
+        etag, _ = self.server.etag(path)
+        return self._send(200, {'ETag': etag})
+
+    def _list(self, bucket, query):
+        prefix = query.get('prefix', [''])[0]
+        max_keys = int(query.get('max-keys', [self.server.max_keys])[0])
+        after = query.get('continuation-token', query.get('start-after', ['']))[0]
+        bucket_dir = os.path.join(self.server.root, bucket)
+        keys = sorted(
+            os.path.relpath(os.path.join(root, name), bucket_dir).replace(os.sep, '/')
+            for root, _, names in os.walk(bucket_dir) for name in names
+        )
+        keys = [key for key in keys if key.startswith(prefix) and key > after]
+        page, truncated = keys[:max_keys], len(keys) > max_keys
+        contents = ''.join(
+            f'<Contents><Key>{escape(key)}</Key><LastModified>2024-01-01T00:00:00.000Z</LastModified>'
+            f'<ETag>{escape(self.server.etag(os.path.join(bucket_dir, *key.split("/")))[0])}</ETag>'
+            f'<Size>{os.path.getsize(os.path.join(bucket_dir, *key.split("/")))}</Size>'
+            f'<StorageClass>STANDARD</StorageClass></Contents>'
+            for key in page
+        )
+        token = f'<NextContinuationToken>{escape(page[-1])}</NextContinuationToken>' if truncated else ''
+        body = (f'<?xml version="1.0" encoding="UTF-8"?>'
+                f'<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+                f'<Name>{escape(bucket)}</Name><Prefix>{escape(prefix)}</Prefix><KeyCount>{len(page)}</KeyCount>'
+                f'<MaxKeys>{max_keys}</MaxKeys><IsTruncated>{str(truncated).lower()}</IsTruncated>'
+                f'{contents}{token}</ListBucketResult>').encode()
+        return self._send(200, {'Content-Type': 'application/xml'}, body)
+
+    do_GET = _serve
+    do_HEAD = _serve
+    do_PUT = _serve
+
+
+def _decode_aws_chunked(body):
+    """Payload of an aws-chunked body: <hex size>[;ext]\r\n<data>\r\n ... 0\r\n<trailers>."""
+    data, position = [], 0
+    while True:
+        line_end = body.index(b'\r\n', position)
+        size = int(body[position:line_end].split(b';')[0], 16)
+        if size == 0:
+            return b''.join(data)
+        data.append(body[line_end + 2:line_end + 2 + size])
+        position = line_end + 2 + size + 2
+
+
+class LocalS3Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, root, max_keys=1000):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.root = root
+        self.max_keys = max_keys
+        self.requests = []
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._etags = {}
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def endpoint_url(self):
+        return 'http://127.0.0.1:%d' % self.server_address[1]
+
+    def record(self, method, byte_range):
+        with self._lock:
+            self.requests.append((method, byte_range))
+
+    def fail_next(self, n):
+        """Answer the next n requests with 503 SlowDown."""
+        with self._lock:
+            self.failures += n
+
+    def take_failure(self):
+        with self._lock:
+            if self.failures:
+                self.failures -= 1
+                return True
+            return False
+
+    def etag(self, path):
+        """MD5 ETag and size of a file, hashed once per version."""
+        stat = os.stat(path)
+        version = (path, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if version not in self._etags:
+                digest = hashlib.md5()
+                with open(path, 'rb') as file:
+                    for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                        digest.update(chunk)
+                self._etags[version] = '"%s"' % digest.hexdigest()
+            return self._etags[version], stat.st_size
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+
+from src.serving.artifact_cache import ModelArtifactCache
+
+
+def writer(content):
+    def download(dst_dir):
+        with open(os.path.join(dst_dir, 'model.pkl'), 'wb') as file:
+            file.write(content)
+    return download
+
+
+class ModelArtifactCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ModelArtifactCache(self.tmp.name, max_size_bytes=250)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_hit_skips_download(self):
+        first = self.cache.fetch('m', '1', 'run-a', writer(b'x' * 100))
+        second = self.cache.fetch('m', '1', 'run-a', lambda dst_dir: self.fail('downloaded twice'))
+        self.assertEqual(first.path, second.path)
+        self.assertEqual(self.cache.find('m', '1').run_id, 'run-a')
+
+    def test_corrupt_entry_is_discarded(self):
+        entry = self.cache.fetch('m', '1', 'run-a', writer(b'x' * 100))
+        with open(os.path.join(entry.path, 'model.pkl'), 'wb') as file:
+            file.write(b'y' * 100)
+        self.assertIsNone(self.cache.get('m', '1', 'run-a'))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        self.cache.fetch('m', '1', 'run-a', writer(b'x' * 100))
+        self.cache.fetch('m', '2', 'run-b', writer(b'x' * 100))
+        self.cache.fetch('m', '3', 'run-c', writer(b'x' * 100))
+        self.assertEqual([entry.version for entry in self.cache.entries('m')], ['3', '2'])
+        self.assertEqual(self.cache.latest('m').version, '3')
+
+
+if __name__ == '__main__':
+    unittest.main()
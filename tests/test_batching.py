@@ -0,0 +1,69 @@
+import threading
+import unittest
+from concurrent.futures import TimeoutError
+
+import numpy as np
+from prometheus_client import CollectorRegistry
+
+from src.serving.batching import MicroBatcher
+
+
+class MicroBatcherTests(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+
+        def predict_fn(matrix, context):
+            self.calls.append(len(matrix))
+            return matrix[:, 0] * 2
+
+        self.registry = CollectorRegistry()
+        self.batcher = MicroBatcher(predict_fn, max_batch_size=64, max_wait_ms=50, registry=self.registry).start()
+
+    def tearDown(self):
+        self.batcher.stop()
+
+    def test_concurrent_requests_are_coalesced(self):
+        results = {}
+
+        def worker(i):
+            results[i] = self.batcher.predict(np.array([[i, 0.0]]), timeout=5)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sum(self.calls), 16)
+        self.assertLess(len(self.calls), 16)
+        for i in range(16):
+            np.testing.assert_array_equal(results[i], [2 * i])
+        self.assertEqual(self.registry.get_sample_value('model_batch_size_rows_sum'), 16)
+
+    def test_errors_reach_every_caller(self):
+        self.batcher.predict_fn = lambda matrix, context: 1 / 0
+        with self.assertRaises(ZeroDivisionError):
+            self.batcher.predict(np.zeros((1, 2)), timeout=5)
+
+    def test_stop_fails_queued_requests(self):
+        batcher = MicroBatcher(lambda matrix, context: matrix[:, 0], registry=CollectorRegistry())
+        future = batcher.submit(np.zeros((1, 2)))
+        batcher.stop()
+        with self.assertRaises(RuntimeError):
+            future.result(timeout=1)
+        with self.assertRaises(RuntimeError):
+            batcher.predict(np.zeros((1, 2)))
+
+    def test_predict_is_bounded_by_the_timeout(self):
+        # Never started, so nothing scores the request
+        batcher = MicroBatcher(lambda matrix, context: matrix[:, 0], timeout=0.05, registry=CollectorRegistry())
+        with self.assertRaises(TimeoutError):
+            batcher.predict(np.zeros((1, 2)))
+        batcher.start()
+        np.testing.assert_array_equal(batcher.predict(np.array([[3.0, 0.0]])), [3.0])
+        batcher.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.data.columnar import FrameWriter, data_file, read_frame, write_frame
+from src.features.build_features import apply_schema
+
+PREPROCESSED_PATH = os.path.join(os.path.dirname(__file__), '..', 'data_for_github', 'preprocessed_data.csv')
+
+
+class ColumnarTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.df = pd.read_csv(PREPROCESSED_PATH).head(500)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_round_trip_keeps_columns_and_dtypes(self):
+        for fmt in ('arrow', 'parquet', 'csv'):
+            path = data_file(self.tmp.name, 'frame', fmt)
+            write_frame(self.df, path)
+            loaded = read_frame(path)
+            pd.testing.assert_frame_equal(loaded, apply_schema(self.df), check_dtype=True)
+
+    def test_pruned_read_returns_only_requested_columns(self):
+        columns = ['FeNO_Level', 'Age', 'Has_Asthma']
+        for fmt in ('arrow', 'parquet', 'csv'):
+            path = data_file(self.tmp.name, 'frame', fmt)
+            write_frame(self.df, path)
+            self.assertEqual(list(read_frame(path, columns=columns).columns), columns)
+
+    def test_chunked_writes_match_single_write(self):
+        path = data_file(self.tmp.name, 'chunks', 'arrow')
+        with FrameWriter(path) as writer:
+            for start in range(0, len(self.df), 128):
+                writer.write(self.df.iloc[start:start + 128])
+        np.testing.assert_array_equal(read_frame(path).to_numpy(), apply_schema(self.df).to_numpy())
+
+    def test_schema_rejects_lossy_values(self):
+        bad = self.df.copy()
+        bad['Age'] = bad['Age'] + 0.5
+        with self.assertRaises(Exception):
+            write_frame(bad, data_file(self.tmp.name, 'bad', 'arrow'))
+
+    def test_compact_schema(self):
+        path = data_file(self.tmp.name, 'frame', 'arrow')
+        write_frame(self.df, path)
+        loaded = read_frame(path)
+        self.assertEqual(loaded['Gender_Male'].dtype, np.uint8)
+        self.assertEqual(loaded['Air_Pollution_Level'].dtype, np.uint8)
+        self.assertEqual(loaded['Age'].dtype, np.int16)
+        self.assertEqual(loaded['BMI'].dtype, np.float32)
+        self.assertLess(loaded.memory_usage(index=False).sum() * 3, self.df.memory_usage(index=False).sum())
+
+    def test_old_float64_files_are_read_with_the_compact_schema(self):
+        import pyarrow as pa
+        import pyarrow.ipc as ipc
+        path = data_file(self.tmp.name, 'old', 'arrow')
+        table = pa.Table.from_pandas(self.df.astype(np.float64), preserve_index=False)
+        with ipc.new_file(path, table.schema) as writer:
+            writer.write_table(table)
+        pd.testing.assert_frame_equal(read_frame(path), apply_schema(self.df))
+
+    def test_schema_rejects_out_of_range_and_missing_values(self):
+        for column, value in (('Gender_Male', 256.0), ('Number_of_ER_Visits', 40000), ('Family_History', np.nan)):
+            bad = self.df.head(3).copy()
+            bad[column] = bad[column].astype(np.float64)
+            bad.loc[bad.index[0], column] = value
+            with self.assertRaises(ValueError):
+                apply_schema(bad)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+from src.model.compiled_forest import CompiledForest
+
+
+class CompiledForestTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        cls.X = rng.normal(size=(2000, 6)) * [1, 10, 100, 1e3, 1e-3, 1]
+        cls.y = (cls.X[:, 0] + cls.X[:, 1] / 10 + rng.normal(size=2000) > 0).astype(int)
+        cls.forest = RandomForestClassifier(n_estimators=25, random_state=0).fit(cls.X, cls.y)
+        cls.compiled = CompiledForest.from_sklearn(cls.forest)
+
+    def test_matches_sklearn_bit_for_bit(self):
+        np.testing.assert_array_equal(self.compiled.predict_proba(self.X), self.forest.predict_proba(self.X))
+        np.testing.assert_array_equal(self.compiled.predict(self.X), self.forest.predict(self.X))
+
+    def test_chunking_does_not_change_results(self):
+        np.testing.assert_array_equal(
+            self.compiled.predict_proba(self.X, chunk_size=7), self.compiled.predict_proba(self.X)
+        )
+
+    def test_leaves_match_sklearn_apply(self):
+        leaves = self.compiled.apply(self.X[:50])
+        for t, estimator in enumerate(self.forest.estimators_):
+            np.testing.assert_array_equal(leaves[:, t] - self.compiled.roots[t], estimator.apply(self.X[:50]))
+
+    def test_missing_values_follow_sklearn(self):
+        X = self.X.copy()
+        X[::3, 0] = np.nan
+        forest = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, self.y)
+        np.testing.assert_array_equal(CompiledForest.from_sklearn(forest).predict_proba(X), forest.predict_proba(X))
+
+    def test_save_and_load_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'compiled_forest.npz')
+            self.compiled.save(path)
+            loaded = CompiledForest.load(path)
+        np.testing.assert_array_equal(loaded.predict_proba(self.X), self.forest.predict_proba(self.X))
+
+    def test_block_directory_is_memory_mapped(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'compiled_forest')
+            self.compiled.save(path)
+            loaded = CompiledForest.load(path)
+            # Derived tables come from the files too, so loading allocates no node-sized arrays
+            for array in (loaded.threshold, loaded.leaf_proba, loaded._children_flat, loaded._feature, loaded._is_leaf):
+                self.assertIsInstance(array, np.memmap)
+            np.testing.assert_array_equal(loaded.predict_proba(self.X), self.forest.predict_proba(self.X))
+            in_memory = CompiledForest.load(path, mmap_mode=None)
+            self.assertNotIsInstance(in_memory.leaf_proba, np.memmap)
+            np.testing.assert_array_equal(in_memory.predict(self.X), self.forest.predict(self.X))
+            del loaded
+
+    def test_saving_over_a_block_directory_replaces_it(self):
+        named = RandomForestClassifier(n_estimators=5, random_state=1).fit(
+            pd.DataFrame(self.X, columns=[f'f{i}' for i in range(6)]), self.y
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'compiled_forest')
+            CompiledForest.from_sklearn(named).save(path)
+            mapped = CompiledForest.load(path)
+            np.save(os.path.join(path, 'stray.npy'), np.zeros(3))
+
+            self.compiled.save(path)
+            loaded = CompiledForest.load(path)
+            # No feature_names.npy or stray file is left over from the earlier save
+            self.assertEqual(sorted(os.listdir(tmp)), ['compiled_forest'])
+            self.assertNotIn('feature_names.npy', os.listdir(path))
+            self.assertNotIn('stray.npy', os.listdir(path))
+            self.assertIsNone(loaded.feature_names_in_)
+            np.testing.assert_array_equal(loaded.predict_proba(self.X), self.forest.predict_proba(self.X))
+            # The forest mapped before the save still reads its own, unchanged blocks
+            np.testing.assert_array_equal(mapped.predict_proba(self.X), named.predict_proba(self.X))
+            del mapped, loaded
+
+    def test_compressed_archive_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'compiled_forest.npz')
+            self.compiled.save(path, compress=True)
+            loaded = CompiledForest.load(path)
+        np.testing.assert_array_equal(loaded.predict_proba(self.X), self.forest.predict_proba(self.X))
+
+
+if __name__ == '__main__':
+    unittest.main()
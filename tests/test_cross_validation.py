@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, roc_auc_score
+
+from src.features.build_features import TARGET_COLUMN, apply_schema
+from src.model.cross_validation import aggregate, cross_validate, log_cv
+
+PREPROCESSED_PATH = os.path.join(os.path.dirname(__file__), '..', 'data_for_github', 'preprocessed_data.csv')
+
+
+class CrossValidationTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        df = apply_schema(pd.read_csv(PREPROCESSED_PATH)).iloc[:1500]
+        cls.x = df.drop(columns=[TARGET_COLUMN])
+        cls.y = df[TARGET_COLUMN]
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache_dir = os.path.join(self.tmp.name, 'cache')
+
+    def cross_validate(self, model_params, x=None):
+        return cross_validate(self.x if x is None else x, self.y, model_params, n_folds=3, max_workers=2,
+                              cache_dir=self.cache_dir)
+
+    def test_folds_match_a_serial_fit(self):
+        results = self.cross_validate({'n_estimators': 10})
+        self.assertEqual([result['fold'] for result in results], [0, 1, 2])
+        self.assertEqual(sum(result['metrics']['rows'] for result in results), len(self.y))
+
+        fold_dir = os.path.join(self.cache_dir, 'folds', os.listdir(os.path.join(self.cache_dir, 'folds'))[0])
+        val_idx = np.load(os.path.join(fold_dir, 'fold-1.npy'))
+        train_mask = np.ones(len(self.y), dtype=bool)
+        train_mask[val_idx] = False
+        x, y = self.x.to_numpy(dtype=np.float32), self.y.to_numpy()
+        clf = RandomForestClassifier(n_estimators=10, random_state=42).fit(x[train_mask], y[train_mask])
+        metrics = results[1]['metrics']
+        self.assertEqual(metrics['accuracy'], accuracy_score(y[val_idx], clf.predict(x[val_idx])))
+        self.assertAlmostEqual(metrics['roc_auc'], roc_auc_score(y[val_idx], clf.predict_proba(x[val_idx])[:, 1]),
+                               places=2)
+
+    def test_folds_are_reused_and_results_cached_per_parameters(self):
+        first = self.cross_validate({'n_estimators': 10})
+        # Cached results come back as saved, fit times included
+        self.assertEqual(self.cross_validate({'n_estimators': 10}), first)
+
+        # New parameters: same folds, new results
+        other = self.cross_validate({'n_estimators': 10, 'max_depth': 3})
+        self.assertEqual(len(os.listdir(os.path.join(self.cache_dir, 'folds'))), 1)
+        fold_key = os.listdir(os.path.join(self.cache_dir, 'folds'))[0]
+        self.assertEqual(len(os.listdir(os.path.join(self.cache_dir, 'results', fold_key))), 2)
+        self.assertEqual([r['metrics']['rows'] for r in other], [r['metrics']['rows'] for r in first])
+
+        # Different data: new folds
+        x = self.x.copy()
+        x.iloc[0, 0] += 1
+        self.cross_validate({'n_estimators': 10}, x)
+        self.assertEqual(len(os.listdir(os.path.join(self.cache_dir, 'folds'))), 2)
+
+    def test_confidence_interval(self):
+        folds = [{'metrics': {'accuracy': value, 'rows': 10}} for value in (0.8, 0.9, 1.0)]
+        summary = aggregate(folds, confidence=0.95)
+        self.assertNotIn('rows', summary)
+        self.assertAlmostEqual(summary['accuracy']['mean'], 0.9)
+        self.assertAlmostEqual(summary['accuracy']['std'], 0.1)
+        # t(0.975, df=2) = 4.3027
+        self.assertAlmostEqual(summary['accuracy']['ci_high'] - 0.9, 4.302653 * 0.1 / np.sqrt(3), places=5)
+
+    def test_log_cv_writes_one_run(self):
+        from mlflow.tracking import MlflowClient
+
+        summary = aggregate([{'metrics': {'accuracy': value, 'rows': 10}} for value in (0.8, 0.9)])
+        # A file store, as register_model.py uses; MLflow 3 only opens one when allowed
+        uri = 'file://' + os.path.abspath(os.path.join(self.tmp.name, 'mlruns'))
+        with mock.patch.dict(os.environ, {'MLFLOW_ALLOW_FILE_STORE': 'true'}):
+            run_id = log_cv(summary, {'n_estimators': 10}, {'folds': 2}, uri, 'cv-test')
+            run = MlflowClient(uri).get_run(run_id)
+        self.assertAlmostEqual(run.data.metrics['accuracy_mean'], 0.85)
+        self.assertEqual(run.data.params['folds'], '2')
+
+
+if __name__ == '__main__':
+    unittest.main()
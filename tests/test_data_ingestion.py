@@ -0,0 +1,37 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from src.data.columnar import read_frame
+from src.data.data_ingestion import ENCODER_PATH, fit_encoder, ingest_in_chunks, load_data, run
+from src.features.build_features import apply_schema
+
+RAW_DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data2', 'raw', 'synthetic_asthma_dataset.csv')
+PREPROCESSED_PATH = os.path.join(os.path.dirname(__file__), '..', 'data_for_github', 'preprocessed_data.csv')
+
+
+class StreamingIngestionTests(unittest.TestCase):
+
+    def test_chunked_output_matches_in_memory_pipeline(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            encoder = ingest_in_chunks(RAW_DATA_PATH, tmp, chunk_size=777, fmt='csv')
+            loaded = read_frame(os.path.join(tmp, 'raw', 'preprocessed_data.csv'))
+        pd.testing.assert_frame_equal(loaded, apply_schema(pd.read_csv(PREPROCESSED_PATH)))
+        self.assertEqual(encoder.to_dict(), fit_encoder(load_data(RAW_DATA_PATH)).to_dict())
+
+    def test_chunked_arrow_output_matches_csv(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ingest_in_chunks(RAW_DATA_PATH, tmp, chunk_size=777, fmt='arrow')
+            loaded = read_frame(os.path.join(tmp, 'raw', 'preprocessed_data.arrow'))
+        pd.testing.assert_frame_equal(loaded, apply_schema(pd.read_csv(PREPROCESSED_PATH)))
+
+    def test_stage_output_cannot_be_pinned(self):
+        params = {'data_ingestion': {'chunk_size': 0, 'pinned_encoder': ENCODER_PATH}}
+        with self.assertRaises(ValueError):
+            run(params, 'csv', data_url=RAW_DATA_PATH)
+
+
+if __name__ == '__main__':
+    unittest.main()
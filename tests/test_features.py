@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.features.build_features import FeatureEncoder, apply_schema
+
+RAW_DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data2', 'raw', 'synthetic_asthma_dataset.csv')
+PREPROCESSED_PATH = os.path.join(os.path.dirname(__file__), '..', 'data_for_github', 'preprocessed_data.csv')
+
+
+class FeatureEncoderTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.raw = pd.read_csv(RAW_DATA_PATH).drop(columns=['Patient_ID', 'Asthma_Control_Level'])
+        cls.encoder = FeatureEncoder.fit(cls.raw)
+
+    def test_transform_matches_pipeline_output(self):
+        expected = apply_schema(pd.read_csv(PREPROCESSED_PATH))
+        encoded = self.encoder.transform(self.raw.copy())
+        pd.testing.assert_frame_equal(encoded, expected)
+
+    def test_records_match_frame_transform(self):
+        raw = self.raw.head(200)
+        records = raw.astype(object).where(raw.notna(), None).to_dict(orient='records')
+        matrix, row_index, errors = self.encoder.transform_records(records)
+        expected = self.encoder.transform(raw.copy())[self.encoder.feature_names].to_numpy(dtype=float)
+        self.assertEqual(errors, {})
+        self.assertEqual(row_index, list(range(len(raw))))
+        np.testing.assert_array_equal(matrix, expected)
+
+    def test_invalid_records_are_reported(self):
+        record = self.raw.iloc[0].to_dict()
+        bad_record = dict(record, Air_Pollution_Level='Unknown')
+        matrix, row_index, errors = self.encoder.transform_records([bad_record, record])
+        self.assertEqual(matrix.shape, (1, self.encoder.n_features))
+        self.assertEqual(row_index, [1])
+        self.assertIn(0, errors)
+
+    def test_save_and_load_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'encoder.json')
+            self.encoder.save(path)
+            loaded = FeatureEncoder.load(path)
+        self.assertEqual(loaded.feature_names, self.encoder.feature_names)
+        self.assertEqual(loaded.fill_values, self.encoder.fill_values)
+
+    def test_pinned_vocabulary_keeps_the_column_layout(self):
+        subset = self.raw[(self.raw['Gender'] == 'Male') & (self.raw['Smoking_Status'] != 'Current')].head(50)
+        encoded = self.encoder.transform(subset.copy())
+        self.assertEqual(list(encoded.columns), list(self.encoder.transform(self.raw.head(5).copy()).columns))
+        self.assertEqual(encoded['Gender_Male'].sum(), len(subset))
+        self.assertEqual(encoded['Gender_Female'].sum(), 0)
+
+        unknown = subset.copy()
+        unknown['Allergies'] = 'Mould'
+        encoded = self.encoder.transform(unknown)
+        self.assertEqual(encoded[[f'Allergies_{cat}' for cat in self.encoder.categories['Allergies']]].to_numpy().sum(), 0)
+
+    def test_from_counts_matches_fit(self):
+        counts = {col: self.raw[col].value_counts().to_dict() for col in self.encoder.categories}
+        self.assertEqual(FeatureEncoder.from_counts(counts).to_dict(), self.encoder.to_dict())
+
+    def test_from_counts_breaks_mode_ties_like_pandas(self):
+        raw = self.raw.head(4).copy()
+        raw['Allergies'] = ['Pollen', 'Dust', 'Pollen', 'Dust']
+        counts = {col: raw[col].value_counts().to_dict() for col in self.encoder.categories}
+        self.assertEqual(FeatureEncoder.from_counts(counts).fill_values, FeatureEncoder.fit(raw).fill_values)
+
+
+if __name__ == '__main__':
+    unittest.main()
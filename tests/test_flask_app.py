@@ -34,4 +34,42 @@ class FlaskAppTests(unittest.TestCase):
         self.assertTrue(
             b'Asthma' in response.data or b'No Asthma' in response.data,
             "Response should contain either 'Asthma' or 'No Asthma'"
-        )
\ No newline at end of file
+        )
+
+    def test_predict_batch(self):
+        record = {
+            'Age': 45,
+            'BMI': 23.4,
+            'Family_History': 1,
+            'Air_Pollution_Level': 'Moderate',
+            'Physical_Activity_Level': 'Active',
+            'Occupation_Type': 'Indoor',
+            'Allergies': 'Dust',
+            'Comorbidities': 'None',
+            'Medication_Adherence': 1,
+            'Number_of_ER_Visits': 0,
+            'Peak_Expiratory_Flow': 350.5,
+            'FeNO_Level': 15.2,
+            'Gender': 'Male',
+            'Smoking_Status': 'Never'
+        }
+        bad_record = dict(record, Air_Pollution_Level='Unknown')
+        response = self.app.post('/predict/batch', json={'records': [record, bad_record, record]})
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual(body['count'], 3)
+        self.assertEqual(body['errors'], 1)
+        self.assertIn(body['predictions'][0]['prediction'], (0, 1))
+        self.assertIn('error', body['predictions'][1])
+        self.assertEqual(body['predictions'][0], dict(body['predictions'][2], index=0))
+
+    def test_predict_batch_rejects_non_list(self):
+        response = self.app.post('/predict/batch', json={'records': 'not a list'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_metrics_include_stage_latency(self):
+        self.app.post('/predict/batch', json={'records': 'not a list'})
+        response = self.app.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'app_request_error_latency_seconds_count{endpoint="/predict/batch"', response.data)
+        self.assertIn(b'app_requests_in_flight', response.data)
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.data.columnar import read_frame
+from src.data.data_ingestion import DROP_COLUMNS, ingest_incremental
+from src.data.data_preprocessing import OUTLIER_COLUMNS, remove_outliers_incremental
+from src.data.partitions import PartitionedDataset, row_keys
+from src.features.build_features import FeatureEncoder
+
+RAW_DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data2', 'raw', 'synthetic_asthma_dataset.csv')
+
+
+class IncrementalIngestionTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.raw = pd.read_csv(RAW_DATA_PATH, dtype=str, keep_default_na=False)
+        self.day1 = os.path.join(self.tmp, 'day1.csv')
+        self.day2 = os.path.join(self.tmp, 'day2.csv')
+        self.raw.iloc[:6000].to_csv(self.day1, index=False)
+        self.raw_dir = os.path.join(self.tmp, 'data', 'raw', 'preprocessed_data')
+        self.interim_dir = os.path.join(self.tmp, 'data', 'interim', 'preprocessed_data_2')
+
+    def run_pipeline(self, inputs):
+        encoder = ingest_incremental(inputs, os.path.join(self.tmp, 'data'), chunk_size=1000)
+        outlier_filter = remove_outliers_incremental(self.raw_dir, self.interim_dir, OUTLIER_COLUMNS, chunk_size=1000)
+        return encoder, outlier_filter
+
+    def test_only_new_rows_are_processed(self):
+        encoder, outlier_filter = self.run_pipeline([self.day1])
+        first = PartitionedDataset(self.raw_dir)
+        self.assertEqual(list(first.partitions), ['part-000000'])
+
+        # Unchanged input: nothing is rewritten
+        self.run_pipeline([self.day1])
+        self.assertEqual(PartitionedDataset(self.raw_dir).partitions, first.partitions)
+
+        # A new daily file and rows appended to the first one become two new partitions
+        self.raw.iloc[8000:].to_csv(self.day2, index=False)
+        self.raw.iloc[:8000].to_csv(self.day1, index=False)
+        _, outlier_filter = self.run_pipeline([self.day1, self.day2])
+        raw = PartitionedDataset(self.raw_dir)
+        self.assertEqual(list(raw.partitions), ['part-000000', 'part-000001', 'part-000002'])
+        self.assertEqual([info['rows'] for info in raw.partitions.values()], [6000, 2000, 2000])
+        self.assertEqual(raw.partitions['part-000000'], first.partitions['part-000000'])
+
+        # Same result as a full run with the frozen encoder and bounds
+        kept = outlier_filter.report()['kept']
+        full = encoder.transform(pd.read_csv(RAW_DATA_PATH).drop(columns=DROP_COLUMNS))
+        expected = outlier_filter.transform(full)
+        interim = read_frame(self.interim_dir)
+        np.testing.assert_array_equal(interim.to_numpy(dtype=float), expected.to_numpy(dtype=float))
+        self.assertEqual(kept, len(expected))
+
+    def test_removed_rows_reingest_their_input(self):
+        self.run_pipeline([self.day1])
+        self.raw.iloc[:5000].to_csv(self.day1, index=False)
+        self.run_pipeline([self.day1])
+        raw = PartitionedDataset(self.raw_dir)
+        self.assertEqual(list(raw.partitions), ['part-000001'])
+        self.assertEqual(len(read_frame(self.raw_dir)), 5000)
+        self.assertEqual(list(PartitionedDataset(self.interim_dir).partitions), ['part-000001'])
+
+    def test_frozen_encoder_keeps_the_layout(self):
+        encoder, _ = self.run_pipeline([self.day1])
+        self.raw.iloc[8000:].to_csv(self.day2, index=False)
+        later, _ = self.run_pipeline([self.day1, self.day2])
+        self.assertEqual(later.to_dict(), encoder.to_dict())
+
+    def test_pinned_encoder_must_match_the_frozen_one(self):
+        encoder, _ = self.run_pipeline([self.day1])
+        ingest_incremental([self.day1], os.path.join(self.tmp, 'data'), chunk_size=1000, encoder=encoder)
+        fill_values = {col: 'changed' for col in encoder.fill_values}
+        pinned = FeatureEncoder(encoder.categories, fill_values)
+        with self.assertRaises(ValueError):
+            ingest_incremental([self.day1], os.path.join(self.tmp, 'data'), chunk_size=1000, encoder=pinned)
+
+    def test_duplicate_rows_get_distinct_keys(self):
+        fingerprints = np.array([7, 7, 3, 7], dtype=np.uint64)
+        self.assertEqual(len(set(row_keys(fingerprints).tolist())), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from prometheus_client import CollectorRegistry
+
+from src.serving.instrumentation import RequestMetrics
+
+
+class RequestMetricsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = CollectorRegistry()
+        self.metrics = RequestMetrics(registry=self.registry)
+
+    def sample(self, name, **labels):
+        return self.registry.get_sample_value(name, labels)
+
+    def test_stages_are_recorded_per_model_version(self):
+        timer = self.metrics.timer("/predict", 3)
+        self.assertEqual(self.sample("app_requests_in_flight", endpoint="/predict"), 1)
+        timer.mark("encode")
+        timer.mark("predict")
+        elapsed = timer.finish()
+
+        for stage in ("encode", "predict"):
+            self.assertEqual(
+                self.sample("app_stage_latency_seconds_count", endpoint="/predict", stage=stage, model_version="3"), 1
+            )
+        stage_total = sum(
+            self.sample("app_stage_latency_seconds_sum", endpoint="/predict", stage=stage, model_version="3")
+            for stage in ("encode", "predict")
+        )
+        self.assertLessEqual(stage_total, elapsed)
+        self.assertEqual(self.sample("app_requests_in_flight", endpoint="/predict"), 0)
+        self.assertIsNone(self.sample("app_request_error_latency_seconds_count", endpoint="/predict", model_version="3"))
+
+    def test_failed_request_is_recorded(self):
+        timer = self.metrics.timer("/predict/batch", "1")
+        timer.finish(failed=True)
+        self.assertEqual(
+            self.sample("app_request_error_latency_seconds_count", endpoint="/predict/batch", model_version="1"), 1
+        )
+        self.assertEqual(self.sample("app_requests_in_flight", endpoint="/predict/batch"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from sklearn import metrics as sk_metrics
+from sklearn.ensemble import RandomForestClassifier
+
+from src.data.columnar import data_file, write_frame
+from src.data.splits import load_subset, save_split
+from src.features.build_features import TARGET_COLUMN, apply_schema
+from src.model.metrics import BinaryMetrics
+from src.model.model_evaluation import evaluate_split
+
+PREPROCESSED_PATH = os.path.join(os.path.dirname(__file__), '..', 'data_for_github', 'preprocessed_data.csv')
+
+
+class BinaryMetricsTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        cls.y = rng.integers(0, 2, 5000)
+        score = np.clip(0.3 * cls.y + 0.7 * rng.random(5000), 0, 1)
+        cls.proba = np.column_stack([1 - score, score])
+        cls.pred = np.argmax(cls.proba, axis=1)
+        # The scores the histograms see: rounded down to their bin
+        cls.binned = np.minimum(np.floor(score * 1000), 999) / 1000
+
+    def accumulate(self, chunk_size):
+        evaluator = BinaryMetrics()
+        for start in range(0, len(self.y), chunk_size):
+            evaluator.update(self.y[start:start + chunk_size], self.proba[start:start + chunk_size])
+        return evaluator
+
+    def test_threshold_metrics_match_sklearn(self):
+        metrics = self.accumulate(512).metrics()
+        self.assertEqual(metrics['accuracy'], sk_metrics.accuracy_score(self.y, self.pred))
+        self.assertEqual(metrics['precision'], sk_metrics.precision_score(self.y, self.pred))
+        self.assertEqual(metrics['recall'], sk_metrics.recall_score(self.y, self.pred))
+        self.assertAlmostEqual(metrics['f1'], sk_metrics.f1_score(self.y, self.pred), places=12)
+        self.assertAlmostEqual(metrics['mcc'], sk_metrics.matthews_corrcoef(self.y, self.pred), places=12)
+        self.assertAlmostEqual(metrics['brier'], sk_metrics.brier_score_loss(self.y, self.proba[:, 1]), places=12)
+        self.assertAlmostEqual(metrics['log_loss'], sk_metrics.log_loss(self.y, self.proba), places=12)
+
+    def test_curve_areas_match_sklearn_on_binned_scores(self):
+        evaluator = self.accumulate(5000)
+        self.assertAlmostEqual(evaluator.roc_auc(), sk_metrics.roc_auc_score(self.y, self.binned), places=12)
+        self.assertAlmostEqual(evaluator.average_precision(),
+                               sk_metrics.average_precision_score(self.y, self.binned), places=12)
+        fpr, tpr, _ = sk_metrics.roc_curve(self.y, self.binned, drop_intermediate=False)
+        roc = evaluator.roc_curve()
+        np.testing.assert_allclose(roc['fpr'], fpr)
+        np.testing.assert_allclose(roc['tpr'], tpr)
+
+    def test_chunks_and_merges_give_the_same_result(self):
+        whole = self.accumulate(len(self.y))
+        merged = BinaryMetrics().update(self.y[:1000], self.proba[:1000])
+        merged.merge(BinaryMetrics().update(self.y[1000:], self.proba[1000:]))
+        for evaluator in (self.accumulate(333), merged):
+            np.testing.assert_array_equal(evaluator.confusion, whole.confusion)
+            np.testing.assert_array_equal(evaluator.positive_hist, whole.positive_hist)
+            self.assertAlmostEqual(evaluator.metrics()['log_loss'], whole.metrics()['log_loss'], places=12)
+
+    def test_calibration_curve(self):
+        curve = self.accumulate(5000).calibration()
+        self.assertEqual(sum(curve['count']), len(self.y))
+        bins = np.minimum((self.proba[:, 1] * 10).astype(int), 9)
+        for i, b in enumerate(np.unique(bins)):
+            self.assertAlmostEqual(curve['mean_predicted'][i], self.proba[bins == b, 1].mean(), places=12)
+            self.assertAlmostEqual(curve['fraction_positive'][i], self.y[bins == b].mean(), places=12)
+
+
+class EvaluateSplitTests(unittest.TestCase):
+
+    def test_chunked_evaluation_matches_the_whole_test_set(self):
+        df = apply_schema(pd.read_csv(PREPROCESSED_PATH))
+        with tempfile.TemporaryDirectory() as tmp:
+            dataset = data_file(tmp, 'interim', 'arrow')
+            write_frame(df, dataset)
+            split_dir = os.path.join(tmp, 'split')
+            save_split(dataset, split_dir, 0.2, 42)
+            train = load_subset(dataset, split_dir, 'train')
+            clf = RandomForestClassifier(n_estimators=10, random_state=0).fit(
+                train.drop(columns=[TARGET_COLUMN]), train[TARGET_COLUMN]
+            )
+            chunked = evaluate_split(clf, dataset, split_dir, chunk_size=100).metrics()
+            in_memory = evaluate_split(clf, dataset, split_dir, df=df).metrics()
+            test = load_subset(dataset, split_dir, 'test')
+
+        y_pred = clf.predict(test.drop(columns=[TARGET_COLUMN]))
+        self.assertEqual(chunked['rows'], len(test))
+        self.assertEqual(chunked['accuracy'], sk_metrics.accuracy_score(test[TARGET_COLUMN], y_pred))
+        self.assertEqual(chunked['f1'], sk_metrics.f1_score(test[TARGET_COLUMN], y_pred))
+        for name, value in in_memory.items():
+            self.assertAlmostEqual(chunked[name], value, places=12)
+
+    def test_csv_dataset_is_streamed_once(self):
+        df = apply_schema(pd.read_csv(PREPROCESSED_PATH))
+        with tempfile.TemporaryDirectory() as tmp:
+            dataset = data_file(tmp, 'interim', 'csv')
+            write_frame(df, dataset)
+            split_dir = os.path.join(tmp, 'split')
+            save_split(dataset, split_dir, 0.2, 42)
+            train = load_subset(dataset, split_dir, 'train')
+            clf = RandomForestClassifier(n_estimators=10, random_state=0).fit(
+                train.drop(columns=[TARGET_COLUMN]), train[TARGET_COLUMN]
+            )
+            with mock.patch('src.data.splits.take_rows', side_effect=AssertionError('re-read the CSV per chunk')):
+                streamed = evaluate_split(clf, dataset, split_dir, chunk_size=100)
+            in_memory = evaluate_split(clf, dataset, split_dir, df=df)
+
+        self.assertEqual(streamed.n_rows, in_memory.n_rows)
+        np.testing.assert_array_equal(streamed.confusion, in_memory.confusion)
+        np.testing.assert_array_equal(streamed.positive_hist, in_memory.positive_hist)
+        for name, value in in_memory.metrics().items():
+            self.assertAlmostEqual(streamed.metrics()[name], value, places=12)
+
+
+if __name__ == '__main__':
+    unittest.main()
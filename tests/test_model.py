@@ -15,4 +15,17 @@ if os.path.exists(pkl_file_path):
         # Handle exceptions during file loading
         print(f"Error loading the .pkl file: {e}")
 else:
-    print(f"File not found: {pkl_file_path}. Please check the path and try again.")
\ No newline at end of file
+    print(f"File not found: {pkl_file_path}. Please check the path and try again.")
+# The compact forest the app serves: .npy blocks that are memory-mapped, not unpickled
+compiled_dir_path = '../models/compiled_forest'
+
+if os.path.isdir(compiled_dir_path):
+    print(f"Directory found: {compiled_dir_path}")
+    try:
+        from src.model.compiled_forest import CompiledForest
+        compiled = CompiledForest.load(compiled_dir_path)
+        print(f"Compiled forest memory-mapped: {compiled.n_trees} trees, {compiled.n_nodes} nodes.")
+    except Exception as e:
+        print(f"Error loading the compiled forest: {e}")
+else:
+    print(f"Directory not found: {compiled_dir_path}. Please check the path and try again.")
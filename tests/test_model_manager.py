@@ -0,0 +1,63 @@
+import unittest
+
+import numpy as np
+from prometheus_client import CollectorRegistry
+
+from src.features.build_features import FeatureEncoder
+from src.serving.model_manager import LoadedModel, ModelManager
+
+
+class ConstantModel:
+
+    def __init__(self, value):
+        self.value = value
+
+    def predict(self, data):
+        return np.full(len(data), self.value)
+
+
+class ModelManagerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.registry_version = '1'
+        self.registry = CollectorRegistry()
+        self.manager = ModelManager(
+            'test_model',
+            resolve_version=lambda: self.registry_version,
+            load_version=self.load_version,
+            poll_interval=0,
+            registry=self.registry
+        )
+
+    def load_version(self, version):
+        if version == 'broken':
+            raise IOError('artifact missing')
+        return LoadedModel(version=version, model=ConstantModel(int(version)), encoder=FeatureEncoder.default())
+
+    def test_new_version_is_swapped_in(self):
+        swaps = []
+        self.manager.add_swap_listener(lambda old, new: swaps.append((old.version, new.version)))
+        in_flight = self.manager.load_initial()
+
+        self.assertFalse(self.manager.check_for_update())
+        self.registry_version = '2'
+        self.assertTrue(self.manager.check_for_update())
+
+        self.assertEqual(self.manager.current.version, '2')
+        self.assertEqual(in_flight.model.predict(np.zeros((1, 1)))[0], 1)
+        self.assertEqual(swaps, [('1', '2')])
+        self.assertEqual(self.registry.get_sample_value('model_active_version', {'model_name': 'test_model'}), 2.0)
+
+    def test_failed_reload_keeps_current_model(self):
+        self.manager.load_initial()
+        self.registry_version = 'broken'
+        self.assertFalse(self.manager.check_for_update())
+        self.assertEqual(self.manager.current.version, '1')
+        self.assertEqual(
+            self.registry.get_sample_value('model_reload_count_total', {'model_name': 'test_model', 'result': 'failure'}),
+            1.0
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.data.outliers import OutlierFilter, QuantileSketch
+
+
+class QuantileSketchTests(unittest.TestCase):
+
+    def test_small_inputs_match_pandas_exactly(self):
+        values = np.random.default_rng(0).normal(size=150)
+        np.testing.assert_array_equal(
+            QuantileSketch().update(values).quantile([0.25, 0.5, 0.75]),
+            pd.Series(values).quantile([0.25, 0.5, 0.75]).to_numpy()
+        )
+
+    def test_merged_chunk_sketches_have_bounded_rank_error(self):
+        values = np.random.default_rng(1).lognormal(size=200_000)
+        sketch = QuantileSketch(k=200, seed=0)
+        for i, chunk in enumerate(np.array_split(values, 8)):
+            sketch.merge(QuantileSketch(k=200, seed=i).update(chunk))
+
+        self.assertEqual(sketch.n, len(values))
+        self.assertLess(sketch.n_retained, 2000)
+        ordered = np.sort(values)
+        for q in (0.01, 0.25, 0.5, 0.75, 0.99):
+            rank = np.searchsorted(ordered, sketch.quantile(q)) / len(values)
+            self.assertLess(abs(rank - q), 0.01)
+
+    def test_missing_values_are_ignored(self):
+        sketch = QuantileSketch().update([1.0, np.nan, 3.0])
+        self.assertEqual(sketch.n, 2)
+        self.assertEqual(sketch.quantile(0.5), 2.0)
+
+
+class OutlierFilterTests(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        self.df = pd.DataFrame({
+            'a': rng.normal(50, 10, size=2000),
+            'b': rng.exponential(20, size=2000),
+            'c': rng.integers(0, 5, size=2000),
+        })
+
+    def test_result_does_not_depend_on_column_order(self):
+        forward = OutlierFilter(['a', 'b']).fit(self.df).transform(self.df)
+        backward = OutlierFilter(['b', 'a']).fit(self.df).transform(self.df)
+        pd.testing.assert_frame_equal(forward, backward)
+
+    def test_bounds_and_report(self):
+        outlier_filter = OutlierFilter(['a', 'b'], lower_limit=10).fit(self.df)
+        q1, q3 = self.df['b'].quantile([0.25, 0.75])
+        self.assertEqual(outlier_filter.bounds['b'], (10, q3 + 1.5 * (q3 - q1)))
+
+        kept = outlier_filter.transform(self.df)
+        report = outlier_filter.report()
+        self.assertEqual(report['kept'], len(kept))
+        self.assertEqual(report['dropped'], len(self.df) - len(kept))
+        expected_dropped = int(((self.df['b'] < 10) | (self.df['b'] > outlier_filter.bounds['b'][1])).sum())
+        self.assertEqual(report['columns']['b']['dropped'], expected_dropped)
+        self.assertEqual(report['columns']['b']['kept'], len(self.df) - expected_dropped)
+
+    def test_chunked_bounds_are_close_to_exact(self):
+        exact = OutlierFilter(['a', 'b']).fit(self.df)
+        chunks = (self.df.iloc[i:i + 300] for i in range(0, len(self.df), 300))
+        approximate = OutlierFilter(['a', 'b']).fit_chunks(chunks)
+        for col in ('a', 'b'):
+            np.testing.assert_allclose(approximate.bounds[col], exact.bounds[col], rtol=0.05, atol=1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
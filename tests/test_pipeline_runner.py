@@ -0,0 +1,97 @@
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from src.data import data_ingestion, data_preprocessing
+from src.data.columnar import read_frame
+from src.model import model_building
+from src.pipeline.runner import PipelineRunner
+
+RAW_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data2', 'raw', 'synthetic_asthma_dataset.csv'))
+STAGES = ['data_ingestion', 'data_preprocessing', 'model_building']
+PARAMS = {
+    'data_ingestion': {'chunk_size': 0, 'pinned_encoder': '', 'incremental': False, 'inputs': []},
+    'data_preprocessing': {'chunk_size': 0},
+    'model_building': {'test_size': 0.2, 'random_state': 42, 'stratify': False},
+    'interchange': {'format': 'arrow'},
+}
+
+
+class PipelineRunnerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.tmp)
+        os.makedirs('models')
+        pd.read_csv(RAW_DATA_PATH).iloc[:2000].to_csv('raw.csv', index=False)
+        with open('params.yaml', 'w') as file:
+            yaml.safe_dump(PARAMS, file)
+
+    def test_in_memory_run_matches_separate_stages(self):
+        runner = PipelineRunner(stages=STAGES, data_url='raw.csv')
+        results = runner.run()
+        self.assertEqual([result['status'] for result in results], ['ok'] * 3)
+        interim = read_frame('data/interim/preprocessed_data_2.arrow')
+        split = {subset: np.load(f'splited_data/split/{subset}.npy') for subset in ('train', 'test')}
+        with open('models/model.pkl', 'rb') as file:
+            clf = pickle.load(file)
+
+        # The stages one after the other, each reading what the previous one wrote
+        shutil.rmtree('data')
+        shutil.rmtree('splited_data')
+        data_ingestion.run(PARAMS, 'arrow', 'raw.csv')
+        data_preprocessing.run(PARAMS['data_preprocessing'], 'arrow')
+        separate = model_building.run(PARAMS['model_building'], 'arrow')
+
+        pd.testing.assert_frame_equal(read_frame('data/interim/preprocessed_data_2.arrow'), interim)
+        for subset, indices in split.items():
+            np.testing.assert_array_equal(np.load(f'splited_data/split/{subset}.npy'), indices)
+        x = interim.drop(columns=['Has_Asthma'])
+        np.testing.assert_array_equal(separate.predict_proba(x), clf.predict_proba(x))
+
+    def test_frames_are_only_handed_to_the_stages_that_read_them(self):
+        PipelineRunner(stages=STAGES[:2], data_url='raw.csv').run()
+        interim = read_frame('data/interim/preprocessed_data_2.arrow')
+
+        # Without preprocessing in the run, training reads the filtered interim data, not the ingested frame
+        results = PipelineRunner(stages=['data_ingestion', 'model_building'], data_url='raw.csv').run()
+        self.assertEqual([result['status'] for result in results], ['ok'] * 2)
+        n_split = sum(len(np.load(f'splited_data/split/{subset}.npy')) for subset in ('train', 'test'))
+        self.assertEqual(n_split, len(interim))
+        self.assertLess(len(interim), 2000)
+
+    def test_stage_stats_are_reported(self):
+        runner = PipelineRunner(stages=STAGES[:2], data_url='raw.csv')
+        runner.run()
+        runner.save_report('reports/pipeline_run.json')
+        with open('reports/pipeline_run.json') as file:
+            report = json.load(file)
+        self.assertEqual([stage['stage'] for stage in report['stages']], STAGES[:2])
+        for stage in report['stages']:
+            self.assertGreater(stage['seconds'], 0)
+            self.assertGreater(stage['peak_rss_mb'], 0)
+        self.assertAlmostEqual(report['total_seconds'], sum(stage['seconds'] for stage in report['stages']))
+
+    def test_stops_at_the_first_failed_stage(self):
+        runner = PipelineRunner(stages=STAGES, data_url='missing.csv')
+        results = runner.run()
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['status'], 'failed')
+        self.assertFalse(os.path.exists('models/model.pkl'))
+
+    def test_unknown_stage_is_rejected(self):
+        with self.assertRaises(ValueError):
+            PipelineRunner(stages=['data_ingestion', 'train'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import time
+import unittest
+
+import numpy as np
+from prometheus_client import CollectorRegistry
+
+from src.serving.prediction_cache import PredictionCache
+
+
+class PredictionCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = CollectorRegistry()
+        self.cache = PredictionCache(max_entries=2, ttl_seconds=60, registry=self.registry)
+        self.rows = np.array([[1.0, 0.0], [2.0, -0.0], [3.0, 1.0]])
+
+    def test_hits_are_scoped_to_the_model_version(self):
+        values, keys = self.cache.get_many('1', self.rows[:2])
+        self.assertEqual(values, [None, None])
+        self.cache.put_many(keys, [0, 1])
+
+        self.assertEqual(self.cache.get_many('1', np.array([[2.0, 0.0]]))[0], [1])
+        self.assertEqual(self.cache.get_many('2', self.rows[:1])[0], [None])
+        self.assertEqual(self.registry.get_sample_value('prediction_cache_hit_count_total'), 1)
+        self.assertEqual(self.registry.get_sample_value('prediction_cache_miss_count_total'), 3)
+
+    def test_least_recently_used_rows_are_evicted(self):
+        _, keys = self.cache.get_many('1', self.rows)
+        self.cache.put_many(keys, [0, 1, 0])
+        self.assertEqual(self.cache.get_many('1', self.rows)[0], [None, 1, 0])
+        self.assertEqual(self.registry.get_sample_value('prediction_cache_size'), 2)
+
+    def test_expired_entries_are_not_served(self):
+        self.cache.ttl = 0.01
+        _, keys = self.cache.get_many('1', self.rows[:1])
+        self.cache.put_many(keys, [1])
+        time.sleep(0.02)
+        self.assertEqual(self.cache.get_many('1', self.rows[:1])[0], [None])
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
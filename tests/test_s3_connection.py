@@ -0,0 +1,156 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+from src.connection.s3_connection import part_ranges, s3_operations, shared_client, transfer_summary
+from tests.local_s3 import LocalS3Server
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'local_s3', 'synthetic_asthma_dataset.csv')
+BUCKET = 'asthma-data'
+KEY = 'raw/synthetic_asthma_dataset.csv'
+
+
+class S3OperationsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.object_path = os.path.join(self.tmp, 'bucket', BUCKET, *KEY.split('/'))
+        os.makedirs(os.path.dirname(self.object_path))
+        shutil.copy(DATA_PATH, self.object_path)
+        self.server = LocalS3Server(os.path.join(self.tmp, 'bucket')).start()
+        self.addCleanup(self.server.stop)
+        self.expected = pd.read_csv(DATA_PATH)
+
+    def client(self, cache_dir=None, part_size=64 * 1024):
+        s3 = s3_operations(BUCKET, 'test', 'test', endpoint_url=self.server.endpoint_url,
+                           cache_dir=cache_dir, part_size=part_size, max_workers=4)
+        self.addCleanup(s3.close)
+        return s3
+
+    def ranged_gets(self):
+        return [r for method, r in self.server.requests if method == 'GET' and r]
+
+    def test_part_ranges_cover_the_object(self):
+        self.assertEqual(part_ranges(10, 4), [(0, 3), (4, 7), (8, 9)])
+        self.assertEqual(part_ranges(8, 4), [(0, 3), (4, 7)])
+        self.assertEqual(part_ranges(0, 4), [])
+
+    def test_streamed_fetch_matches_local_read(self):
+        df = self.client().fetch_file_from_s3(KEY)
+        pd.testing.assert_frame_equal(df, self.expected)
+        size = os.path.getsize(DATA_PATH)
+        self.assertEqual(len(self.ranged_gets()), len(part_ranges(size, 64 * 1024)))
+
+    def test_cached_fetch_downloads_once_until_the_object_changes(self):
+        cache_dir = os.path.join(self.tmp, 'cache')
+        s3 = self.client(cache_dir)
+        pd.testing.assert_frame_equal(s3.fetch_file_from_s3(KEY), self.expected)
+        downloads = len(self.ranged_gets())
+        self.assertGreater(downloads, 1)
+
+        pd.testing.assert_frame_equal(s3.fetch_file_from_s3(KEY), self.expected)
+        self.assertEqual(len(self.ranged_gets()), downloads)
+
+        # A new version of the object has a new ETag and is downloaded again
+        changed = self.expected.iloc[:100]
+        changed.to_csv(self.object_path, index=False)
+        pd.testing.assert_frame_equal(s3.fetch_file_from_s3(KEY), changed)
+        self.assertGreater(len(self.ranged_gets()), downloads)
+
+    def test_download_file_writes_parts_in_place(self):
+        local_path = os.path.join(self.tmp, 'out', 'data.csv')
+        self.client(part_size=100 * 1000).download_file(KEY, local_path)
+        with open(local_path, 'rb') as file, open(DATA_PATH, 'rb') as expected:
+            self.assertEqual(file.read(), expected.read())
+        self.assertEqual([name for name in os.listdir(os.path.dirname(local_path))], ['data.csv'])
+
+    def test_missing_object_returns_none(self):
+        self.assertIsNone(self.client().fetch_file_from_s3('raw/missing.csv'))
+
+    def test_closing_shuts_down_the_thread_pools(self):
+        with s3_operations(BUCKET, 'test', 'test', endpoint_url=self.server.endpoint_url, cache_dir=None) as s3:
+            pd.testing.assert_frame_equal(s3.fetch_file_from_s3(KEY), self.expected)
+        for executor in (s3._executor, s3._object_executor):
+            with self.assertRaises(RuntimeError):
+                executor.submit(print)
+
+
+class BulkS3OperationsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.server = LocalS3Server(os.path.join(self.tmp, 'bucket'), max_keys=3).start()
+        self.addCleanup(self.server.stop)
+        self.data = pd.read_csv(DATA_PATH)
+        self.shards = {}
+        export_dir = os.path.join(self.tmp, 'export')
+        os.makedirs(export_dir)
+        for day in range(5):
+            path = os.path.join(export_dir, f'day-{day}.csv')
+            self.data.iloc[day * 2000:(day + 1) * 2000].to_csv(path, index=False)
+            self.shards[path] = f'exports/2024-01-0{day + 1}/part.csv'
+        with open(os.path.join(export_dir, 'README.txt'), 'w') as file:
+            file.write('not data')
+
+    def client(self, **kwargs):
+        s3 = s3_operations(BUCKET, 'test', 'test', endpoint_url=self.server.endpoint_url,
+                           cache_dir=None, max_workers=2, max_concurrency=3, **kwargs)
+        self.addCleanup(s3.close)
+        return s3
+
+    def test_upload_list_and_fetch_shards(self):
+        s3 = self.client()
+        transfers = s3.upload_many(self.shards)
+        self.assertEqual(sorted(transfer.key for transfer in transfers), sorted(self.shards.values()))
+        self.assertTrue(all(transfer.bytes > 0 and transfer.error is None for transfer in transfers))
+
+        # Five objects are listed over two pages of at most three keys
+        listed = s3.list_objects('exports/', '*.csv')
+        self.assertEqual([item['key'] for item in listed], sorted(self.shards.values()))
+
+        df = s3.fetch_prefix('exports/')
+        pd.testing.assert_frame_equal(df, self.data.iloc[:10000].reset_index(drop=True))
+        summary = transfer_summary(s3.last_transfers)
+        self.assertEqual(summary['objects'], 5)
+        self.assertEqual(summary['failed'], 0)
+        self.assertEqual(summary['bytes'], sum(os.path.getsize(path) for path in self.shards))
+
+    def test_unordered_stream_yields_every_object(self):
+        s3 = self.client()
+        s3.upload_many(self.shards)
+        frames = {transfer.key: df for transfer, df in s3.iter_frames(sorted(self.shards.values()), ordered=False)}
+        self.assertEqual(sorted(frames), sorted(self.shards.values()))
+        self.assertEqual(sum(len(df) for df in frames.values()), 10000)
+
+    def test_upload_directory_keeps_relative_paths(self):
+        s3 = self.client()
+        s3.upload_directory(os.path.join(self.tmp, 'export'), 'raw/', '*.csv')
+        self.assertEqual([item['key'] for item in s3.list_objects('raw/')],
+                         [f'raw/day-{day}.csv' for day in range(5)])
+
+    def test_retries_are_counted(self):
+        s3 = self.client()
+        s3.upload_many(self.shards)
+        self.server.fail_next(1)
+        df = s3.fetch_many(['exports/2024-01-01/part.csv'])
+        self.assertEqual(len(df), 2000)
+        self.assertEqual(transfer_summary(s3.last_transfers)['retries'], 1)
+
+    def test_missing_object_fails_the_bulk_fetch(self):
+        s3 = self.client()
+        s3.upload_many(self.shards)
+        with self.assertRaises(Exception):
+            s3.fetch_many(['exports/2024-01-01/part.csv', 'exports/missing.csv'])
+
+    def test_instances_share_one_client(self):
+        self.assertIs(self.client().s3_client, self.client().s3_client)
+        self.assertIs(shared_client('a', 'b', 'us-east-1', None, 4), shared_client('a', 'b', 'us-east-1', None, 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
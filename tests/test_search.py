@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+
+from src.features.build_features import TARGET_COLUMN, apply_schema
+from src.model.model_building import training_model
+from src.model.search import expand_grid, log_search, rank_results, search_hyperparameters, share_matrix
+
+PREPROCESSED_PATH = os.path.join(os.path.dirname(__file__), '..', 'data_for_github', 'preprocessed_data.csv')
+
+
+class SearchTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        df = apply_schema(pd.read_csv(PREPROCESSED_PATH)).iloc[:1500]
+        cls.x = df.drop(columns=[TARGET_COLUMN])
+        cls.y = df[TARGET_COLUMN]
+
+    def test_expand_grid(self):
+        candidates = expand_grid({'n_estimators': [10, 20], 'max_depth': [None, 4], 'min_samples_leaf': 2})
+        self.assertEqual(len(candidates), 4)
+        self.assertIn({'max_depth': None, 'min_samples_leaf': 2, 'n_estimators': 20}, candidates)
+
+    def test_rank_by_score_then_latency(self):
+        results = rank_results([
+            {'params': {'a': 1}, 'score': 0.90, 'latency_ms': 0.1},
+            {'params': {'a': 2}, 'score': 0.95, 'latency_ms': 0.5},
+            {'params': {'a': 3}, 'score': 0.95, 'latency_ms': 0.3},
+            {'params': {'a': 4}, 'score': 0.85, 'latency_ms': 0.2},
+        ])
+        self.assertEqual([r['params']['a'] for r in results], [3, 2, 1, 4])
+        self.assertEqual([r['latency_rank'] for r in results], [3, 4, 1, 2])
+        self.assertEqual([r['pareto'] for r in results], [True, False, True, False])
+
+    def test_search_scores_match_a_serial_fit(self):
+        grid = {'n_estimators': [5, 10], 'max_depth': [3, None]}
+        results = search_hyperparameters(self.x, self.y, grid, validation_size=0.25, max_workers=2)
+        self.assertEqual(len(results), 4)
+        self.assertEqual([r['rank'] for r in results], [1, 2, 3, 4])
+        self.assertEqual(sorted(r['latency_rank'] for r in results), [1, 2, 3, 4])
+        for result in results:
+            self.assertNotIn('compiled', result)
+            self.assertGreater(result['latency_ms'], 0)
+            self.assertGreater(result['n_nodes'], 0)
+
+        # Same fitting and validation rows as the workers memory-mapped
+        with tempfile.TemporaryDirectory() as tmp:
+            x_path, y_path, n_fit = share_matrix(self.x, self.y, tmp, 0.25, 42)
+            x, y = np.load(x_path), np.load(y_path)
+        best = results[0]
+        clf = RandomForestClassifier(random_state=42, **best['params']).fit(x[:n_fit], y[:n_fit])
+        self.assertEqual(roc_auc_score(y[n_fit:], clf.predict_proba(x[n_fit:])[:, 1]), best['score'])
+
+    def test_parallel_training_builds_the_same_forest(self):
+        serial = training_model(self.x, self.y, n_jobs=1, n_estimators=10)
+        parallel = training_model(self.x, self.y, n_jobs=2, n_estimators=10)
+        np.testing.assert_array_equal(serial.predict_proba(self.x), parallel.predict_proba(self.x))
+        # The training parallelism is not saved with the model
+        self.assertIsNone(parallel.n_jobs)
+
+    def test_log_search_writes_one_run_per_candidate(self):
+        from mlflow.tracking import MlflowClient
+
+        results = rank_results([
+            {'params': {'max_depth': depth}, 'score': 0.9 + depth / 100, 'latency_ms': depth / 10,
+             'batch_us_per_row': 1.0, 'fit_seconds': 0.1, 'n_nodes': 100}
+            for depth in (2, 4, 8)
+        ])
+        # A file store, as register_model.py uses; MLflow 3 only opens one when allowed
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.dict(os.environ, {'MLFLOW_ALLOW_FILE_STORE': 'true'}):
+            uri = 'file://' + os.path.abspath(tmp)
+            parent_id = log_search(results, 'roc_auc', uri, 'search-test')
+            client = MlflowClient(uri)
+            experiment = client.get_experiment_by_name('search-test')
+            children = client.search_runs([experiment.experiment_id],
+                                          filter_string=f"tags.mlflow.parentRunId = '{parent_id}'")
+            self.assertEqual(len(children), 3)
+            self.assertEqual(sorted(run.data.params['max_depth'] for run in children), ['2', '4', '8'])
+            parent = client.get_run(parent_id)
+            self.assertEqual(parent.data.params['max_depth'], '8')
+            self.assertEqual(parent.data.metrics['rank'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
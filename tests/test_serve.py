@@ -0,0 +1,49 @@
+import os
+import unittest
+
+from asthama_app.serve import Launcher, bind_socket, default_workers, memory_mb
+
+
+class BrokenService:
+    """A service whose workers die before they start serving."""
+
+    def start_background_services(self):
+        raise RuntimeError("no model")
+
+
+class ServeTests(unittest.TestCase):
+
+    def test_default_workers_matches_available_cores(self):
+        self.assertGreaterEqual(default_workers(), 1)
+        if hasattr(os, "sched_getaffinity"):
+            self.assertEqual(default_workers(), len(os.sched_getaffinity(0)))
+
+    @unittest.skipUnless(os.path.exists("/proc/self/smaps_rollup"), "needs /proc smaps_rollup")
+    def test_memory_of_this_process(self):
+        usage = memory_mb(os.getpid())
+        self.assertGreater(usage["rss"], 0)
+        self.assertLessEqual(usage["pss"], usage["rss"])
+        self.assertLessEqual(usage["private"], usage["rss"])
+
+    def test_listening_socket_is_inherited_by_workers(self):
+        sock = bind_socket("127.0.0.1", 0)
+        try:
+            self.assertTrue(sock.get_inheritable())
+        finally:
+            sock.close()
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs fork()")
+    def test_worker_that_dies_during_startup_is_reaped(self):
+        launcher = Launcher("127.0.0.1", 0, 1)
+        launcher.service = BrokenService()
+        launcher.sock = bind_socket("127.0.0.1", 0)
+        try:
+            with self.assertRaises(RuntimeError):
+                launcher.spawn(0)
+        finally:
+            launcher.sock.close()
+        self.assertEqual(launcher.workers, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+from src.data.columnar import data_file, write_frame
+from src.data.splits import SPLIT_META_FILE, load_split_indices, load_subset, save_split
+from src.features.build_features import TARGET_COLUMN, apply_schema
+
+PREPROCESSED_PATH = os.path.join(os.path.dirname(__file__), '..', 'data_for_github', 'preprocessed_data.csv')
+
+
+class IndexSplitTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.df = apply_schema(pd.read_csv(PREPROCESSED_PATH))
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.dataset = data_file(self.tmp.name, 'interim', 'arrow')
+        write_frame(self.df, self.dataset)
+        self.split_dir = os.path.join(self.tmp.name, 'split')
+
+    def test_same_rows_as_splitting_the_frame(self):
+        save_split(self.dataset, self.split_dir, 0.2, 42)
+        x = self.df.drop(columns=[TARGET_COLUMN])
+        x_train, x_test, y_train, y_test = train_test_split(x, self.df[TARGET_COLUMN], test_size=0.2, random_state=42)
+
+        train = load_subset(self.dataset, self.split_dir, 'train')
+        test = load_subset(self.dataset, self.split_dir, 'test')
+        pd.testing.assert_frame_equal(train.drop(columns=[TARGET_COLUMN]), x_train.reset_index(drop=True))
+        pd.testing.assert_series_equal(test[TARGET_COLUMN], y_test.reset_index(drop=True))
+
+    def test_only_indices_are_stored(self):
+        meta = save_split(self.dataset, self.split_dir, 0.2, 42)
+        self.assertEqual(sorted(os.listdir(self.split_dir)), [SPLIT_META_FILE, 'test.npy', 'train.npy'])
+        train = load_split_indices(self.split_dir, 'train')
+        test = load_split_indices(self.split_dir, 'test')
+        self.assertIsInstance(train, np.memmap)
+        self.assertEqual(len(train) + len(test), len(self.df))
+        self.assertEqual(len(np.intersect1d(train, test)), 0)
+        self.assertEqual(meta['test_rows'], len(test))
+
+    def test_stratified_split_keeps_the_positive_rate(self):
+        meta = save_split(self.dataset, self.split_dir, 0.2, 7, stratify=True)
+        rate = self.df[TARGET_COLUMN].mean()
+        self.assertAlmostEqual(meta['test_positive_rate'], rate, delta=1 / meta['test_rows'])
+        with open(os.path.join(self.split_dir, SPLIT_META_FILE)) as file:
+            self.assertTrue(json.load(file)['stratify'])
+
+    def test_column_pruned_subset(self):
+        save_split(self.dataset, self.split_dir, 0.2, 42)
+        test = load_subset(self.dataset, self.split_dir, 'test', columns=['Age', TARGET_COLUMN])
+        indices = load_split_indices(self.split_dir, 'test')
+        pd.testing.assert_frame_equal(test, self.df[['Age', TARGET_COLUMN]].iloc[indices].reset_index(drop=True))
+
+    def test_csv_dataset(self):
+        dataset = data_file(self.tmp.name, 'interim', 'csv')
+        write_frame(self.df, dataset)
+        save_split(dataset, self.split_dir, 0.2, 42)
+        test = load_subset(dataset, self.split_dir, 'test')
+        indices = load_split_indices(self.split_dir, 'test', dataset)
+        pd.testing.assert_frame_equal(test, self.df.iloc[indices].reset_index(drop=True))
+
+    def test_split_of_another_dataset_version_is_rejected(self):
+        save_split(self.dataset, self.split_dir, 0.2, 42)
+        write_frame(self.df.iloc[:-10], self.dataset)
+        with self.assertRaises(ValueError):
+            load_subset(self.dataset, self.split_dir, 'train')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import copy
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+
+from src.data import data_ingestion, data_preprocessing
+from src.data.splits import load_split_meta, load_subset
+from src.features.build_features import TARGET_COLUMN
+from src.model import model_building
+from src.model.warm_start import retire_trees
+
+RAW_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data2', 'raw', 'synthetic_asthma_dataset.csv'))
+DATASET = 'data/interim/preprocessed_data_2'
+PARAMS = {
+    'data_ingestion': {'chunk_size': 1000, 'pinned_encoder': '', 'incremental': True, 'inputs': ['day1.csv']},
+    'data_preprocessing': {'chunk_size': 1000},
+    'model_building': {
+        'test_size': 0.2, 'random_state': 42, 'stratify': True, 'n_estimators': 100, 'n_jobs': 2,
+        'incremental': {'enabled': True, 'base': 'local', 'new_trees': 20, 'max_trees': 100, 'retire': 'oldest'},
+    },
+}
+
+
+class WarmStartTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.tmp)
+        os.makedirs('models')
+        self.raw = pd.read_csv(RAW_DATA_PATH, dtype=str, keep_default_na=False)
+        self.raw.iloc[:8000].to_csv('day1.csv', index=False)
+        self.params = copy.deepcopy(PARAMS)
+
+    def run_pipeline(self):
+        data_ingestion.run(self.params, 'arrow')
+        data_preprocessing.run(self.params['data_preprocessing'], 'arrow')
+        clf = model_building.run(self.params['model_building'], 'arrow')
+        with open('models/forest_state.json', 'r') as file:
+            return clf, json.load(file)
+
+    def test_new_partition_grows_the_forest(self):
+        first, state = self.run_pipeline()
+        self.assertEqual(state['last_run']['mode'], 'full')
+        old_trees = list(first.estimators_)
+
+        self.raw.iloc[8000:].to_csv('day2.csv', index=False)
+        self.params['data_ingestion']['inputs'] = ['day1.csv', 'day2.csv']
+        grown, state = self.run_pipeline()
+        self.assertEqual(state['last_run']['mode'], 'incremental')
+        self.assertEqual(state['last_run']['new_partitions'], ['part-000001'])
+        self.assertEqual(len(grown.estimators_), 100)
+        self.assertEqual(state['trees'], [0] * 80 + [1] * 20)
+        self.assertIsNone(grown.n_jobs)
+        self.assertFalse(grown.warm_start)
+        # The 20 oldest trees made room; the others are the very same trees
+        for kept, old in zip(grown.estimators_[:80], old_trees[20:]):
+            np.testing.assert_array_equal(kept.tree_.threshold, old.tree_.threshold)
+
+        # Only the training rows of the new partition were fitted on
+        meta = load_split_meta(model_building.SPLIT_DIR)
+        new_range = meta['partitions']['part-000001']
+        train_idx = np.load(os.path.join(model_building.SPLIT_DIR, 'train.npy'))
+        self.assertEqual(state['last_run']['new_rows'],
+                         int(((train_idx >= new_range['start']) & (train_idx < new_range['stop'])).sum()))
+
+        # About as good on the test rows as refitting every tree on all the training rows
+        train = load_subset(DATASET, model_building.SPLIT_DIR, 'train')
+        test = load_subset(DATASET, model_building.SPLIT_DIR, 'test')
+        full = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=2).fit(
+            train.drop(columns=[TARGET_COLUMN]), train[TARGET_COLUMN]
+        )
+        x_test, y_test = test.drop(columns=[TARGET_COLUMN]), test[TARGET_COLUMN]
+        grown_auc = roc_auc_score(y_test, grown.predict_proba(x_test)[:, 1])
+        full_auc = roc_auc_score(y_test, full.predict_proba(x_test)[:, 1])
+        self.assertGreater(grown_auc, full_auc - 0.02)
+
+    def test_old_rows_keep_their_side_of_the_split(self):
+        self.run_pipeline()
+        first_test = np.load(os.path.join(model_building.SPLIT_DIR, 'test.npy'))
+        self.raw.iloc[8000:].to_csv('day2.csv', index=False)
+        self.params['data_ingestion']['inputs'] = ['day1.csv', 'day2.csv']
+        self.run_pipeline()
+        test = np.load(os.path.join(model_building.SPLIT_DIR, 'test.npy'))
+        first_rows = load_split_meta(model_building.SPLIT_DIR)['partitions']['part-000000']['stop']
+        np.testing.assert_array_equal(test[test < first_rows], first_test)
+
+    def test_unchanged_data_keeps_the_model(self):
+        self.run_pipeline()
+        clf, state = self.run_pipeline()
+        self.assertEqual(state['last_run']['mode'], 'unchanged')
+        self.assertEqual(state['generation'], 0)
+
+    def test_rebuilt_partition_refits(self):
+        self.run_pipeline()
+        # Rows removed from day1 rebuild its partition
+        self.raw.iloc[:7000].to_csv('day1.csv', index=False)
+        _, state = self.run_pipeline()
+        self.assertEqual(state['last_run']['mode'], 'full')
+        self.assertEqual(list(state['partitions']), ['part-000001'])
+
+    def test_retirement_policies(self):
+        x = np.random.default_rng(0).normal(size=(400, 3))
+        y = (x[:, 0] > 0).astype(int)
+        clf = RandomForestClassifier(n_estimators=6, max_depth=2, random_state=0).fit(x, y)
+        # Make the first three trees useless: they only ever see the last feature
+        noise = RandomForestClassifier(n_estimators=3, max_depth=2, random_state=1).fit(x[:, [2, 2, 2]], y)
+        clf.estimators_[:3] = noise.estimators_
+        generations = [0, 0, 0, 1, 1, 2]
+
+        kept, n_retired = retire_trees(copy.deepcopy(clf), generations, 4, 'oldest')
+        self.assertEqual((kept, n_retired), ([0, 1, 1, 2], 2))
+        worst = copy.deepcopy(clf)
+        kept, _ = retire_trees(worst, generations, 3, 'worst', x, y)
+        self.assertEqual([tree.random_state for tree in worst.estimators_],
+                         [tree.random_state for tree in clf.estimators_[3:]])
+        self.assertEqual(worst.n_estimators, 3)
+        kept, n_retired = retire_trees(copy.deepcopy(clf), generations, 3, 'none')
+        self.assertEqual((kept, n_retired), (generations, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()